@@ -0,0 +1,366 @@
+"""
+Headless OpenAI-compatible API for OMI.
+A small asyncio HTTP/1.1 server (keep-alive, no extra dependencies) exposing
+POST /v1/chat/completions (JSON or SSE streaming), GET /v1/models and GET /health.
+Requests get the Modelfile SYSTEM prompt, memory injection and a token-budgeted
+window (context_manager.py), and go to the active model profile's model and
+options (model_profiles.py) unless --model overrides the model. A last user message starting with "search " runs the
+web search first, like the terminal client does.
+Generations go through the fair scheduler (bounded concurrency, per-client
+queues); a full queue answers 503 instead of piling up, and slow clients
+throttle generation through a bounded per-stream buffer.
+
+    python api_server.py --host 0.0.0.0 --port 8000
+    curl -N localhost:8000/v1/chat/completions -d '{"stream": true, "messages": [{"role": "user", "content": "hi"}]}'
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import threading
+import time
+
+from context_manager import ContextManager
+from memory_index import MemoryIndex
+from model_profiles import get_profiles
+from modelfile import system_prompt
+from ollama_backend import Cancelled, ChatRequest, KEEP_ALIVE, KeepAlive, get_backend
+from scheduler import RateLimited, get_scheduler
+
+# --- CONFIG ---
+HOST = os.environ.get("OMI_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("OMI_API_PORT", "8000"))
+API_KEY = os.environ.get("OMI_API_KEY", "")     # empty = no auth
+MAX_PENDING = 32            # queued generations before answering 503
+RATE_LIMIT = int(os.environ.get("OMI_API_RATE_LIMIT", "0"))     # per client per minute, 0 = off
+STREAM_BUFFER = 64          # chunks buffered per stream before generation waits for the client
+MAX_BODY = 4 * 1024 * 1024
+IDLE_TIMEOUT = 60.0         # keep-alive connections with no new request are closed
+SEARCH_PREFIX = "search "
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 429: "Too Many Requests",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def text_content(content):
+    # OpenAI content can be a string or a list of parts
+    if isinstance(content, list):
+        return "".join(str(p.get("text", "")) for p in content if isinstance(p, dict))
+    return content if isinstance(content, str) else ""
+
+
+def ollama_options(body):
+    options = {}
+    for name, key in (("temperature", "temperature"), ("top_p", "top_p"), ("seed", "seed"),
+                      ("max_tokens", "num_predict"), ("max_completion_tokens", "num_predict"),
+                      ("frequency_penalty", "frequency_penalty"), ("presence_penalty", "presence_penalty")):
+        if body.get(name) is not None:
+            options[key] = body[name]
+    if body.get("stop"):
+        options["stop"] = [body["stop"]] if isinstance(body["stop"], str) else body["stop"]
+    return options
+
+
+class OMIServer:
+    def __init__(self, model=None, max_concurrent=None, max_pending=MAX_PENDING,
+                 api_key=API_KEY):
+        self.model_override = model     # None = the active profile's model
+        self.profiles = get_profiles()
+        self.max_pending = max_pending
+        self.api_key = api_key
+        self.system = system_prompt()
+        self.backend = get_backend()
+        self.memory = MemoryIndex()
+        # The process-wide scheduler, shared with background jobs (summaries, warmup)
+        self.scheduler = get_scheduler()
+        if max_concurrent:
+            self.scheduler.max_concurrent = max_concurrent
+        # Threads block on a scheduler slot, so room for every queued request
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.scheduler.max_concurrent + max_pending, thread_name_prefix="api-gen"
+        )
+        self.keep_alive = None
+        self._ids = itertools.count(1)
+
+    @property
+    def model(self):
+        # Read per request, so a profile switch applies to the next one
+        return self.model_override or self.profiles.active().model
+
+    # --- HTTP plumbing ---
+    async def handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if peer else "unknown"
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                keep_open = await self.handle_request(request_line, reader, writer, client)
+                if not keep_open:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, request_line, reader):
+        try:
+            method, path, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length")
+        if length > MAX_BODY:
+            raise HTTPError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], version, headers, body
+
+    async def handle_request(self, request_line, reader, writer, client):
+        # -> whether the connection can take another request
+        keep_open = False
+        try:
+            method, path, version, headers, body = await self.read_request(request_line, reader)
+            keep_open = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            if self.api_key and headers.get("authorization") != f"Bearer {self.api_key}":
+                raise HTTPError(401, "invalid API key")
+            if path == "/health":
+                await self.send_json(writer, 200, dict(self.scheduler.stats(), ok=True,
+                                                       jobs=self.scheduler.report()), keep_open)
+            elif path == "/v1/models":
+                await self.send_json(writer, 200, {"object": "list", "data": [
+                    {"id": self.model, "object": "model", "created": 0, "owned_by": "omi"}]}, keep_open)
+            elif path == "/v1/chat/completions":
+                if method != "POST":
+                    raise HTTPError(405, "use POST")
+                try:
+                    data = json.loads(body or b"{}")
+                except ValueError:
+                    raise HTTPError(400, "body is not valid JSON")
+                if not isinstance(data, dict):
+                    raise HTTPError(400, "body must be a JSON object")
+                user = data.get("user")
+                await self.chat_completions(writer, data, user if isinstance(user, str) and user else client,
+                                            keep_open)
+            else:
+                raise HTTPError(404, f"no route for {path}")
+        except HTTPError as e:
+            await self.send_json(writer, e.status, {"error": {"message": str(e), "type": "invalid_request_error"
+                                                              if e.status < 500 else "server_error"}},
+                                 keep_open, e.headers)
+        return keep_open
+
+    def head(self, status, headers):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status, data, keep_open, extra_headers=None):
+        payload = json.dumps(data).encode()
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(payload)),
+                   "Connection": "keep-alive" if keep_open else "close"}
+        headers.update(extra_headers or {})
+        writer.write(self.head(status, headers) + payload)
+        await writer.drain()
+
+    async def send_chunk(self, writer, data):
+        # One HTTP chunk; drain() is where a slow client pushes back
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    # --- Chat ---
+    def build_messages(self, messages, profile):
+        # Modelfile SYSTEM + the client's own system text, memory and a window within the profile's num_ctx
+        system_parts = [self.system] if self.system else []
+        history = []
+        for m in messages:
+            content = text_content(m.get("content"))
+            if m.get("role") == "system":
+                system_parts.append(content)
+            elif m.get("role") in ("user", "assistant"):
+                history.append({"role": m["role"], "content": content})
+        if not history or history[-1]["role"] != "user":
+            raise HTTPError(400, "the last message must be from the user")
+
+        prompt = history[-1]["content"]
+        if prompt.lower().startswith(SEARCH_PREFIX):
+            import web_search
+            query = prompt[len(SEARCH_PREFIX):].strip()
+            results = web_search.get_results(query)
+            history[-1] = {"role": "user", "content": f"I searched for '{query}'. Here are the results:\n"
+                                                      f"{results}\n\nPlease summarize these findings."}
+
+        pinned = [{"role": "system", "content": "\n\n".join(system_parts)}] if system_parts else []
+        context = ContextManager(num_ctx=profile.num_ctx, pinned=pinned, summarizer=None,
+                                 retriever=self.memory.snippets)
+        return context.build(history)
+
+    def generate(self, client, messages, options, queue, loop, abandoned):
+        # Runs on an executor thread: the backend waits for a scheduler slot, then streams into `queue`.
+        # Every put blocks while the queue is full, so a slow reader slows generation down.
+        # `abandoned` is set once the client is gone; that gives up the place / stops the model.
+        request = None
+
+        def put(item):
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    return future.result(0.5)
+                except concurrent.futures.TimeoutError:
+                    if abandoned.is_set():
+                        future.cancel()
+                        if request is not None:
+                            request.cancel()
+                        return
+
+        def still_wanted(position):
+            if abandoned.is_set():
+                raise Cancelled()
+
+        def on_done(request, final, error):
+            put(("error", error) if error is not None else ("done", final))
+
+        try:
+            if RATE_LIMIT:
+                self.scheduler.check_rate(client, RATE_LIMIT, 60.0)
+            # Profile options first, so the keep-alive's loaded model is reused; client options on top
+            profile = self.profiles.active()
+            built = self.build_messages(messages, profile)
+            request = ChatRequest(built, on_chunk=lambda text: put(("chunk", text)), on_done=on_done,
+                                  model=self.model_override or profile.model,
+                                  options=dict(profile.options(), **options),
+                                  keep_alive=KEEP_ALIVE, source="api", session=client, on_wait=still_wanted)
+            self.backend.run(request)
+        except Exception as e:
+            put(("error", e))
+
+    async def chat_completions(self, writer, data, client, keep_open):
+        if not isinstance(data.get("messages"), list) or not data["messages"]:
+            raise HTTPError(400, "messages is required")
+        if not all(isinstance(m, dict) for m in data["messages"]):
+            raise HTTPError(400, "every message must be an object")
+        if self.scheduler.stats()["queued"] >= self.max_pending:
+            raise HTTPError(503, "server busy, try again shortly", {"Retry-After": "2"})
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(STREAM_BUFFER)
+        abandoned = threading.Event()
+        loop.run_in_executor(self.executor, self.generate, client, data["messages"],
+                             ollama_options(data), queue, loop, abandoned)
+
+        completion_id = f"chatcmpl-omi{next(self._ids)}"
+        created = int(time.time())
+        stream = bool(data.get("stream"))
+        stream_options = data.get("stream_options")
+        include_usage = stream and isinstance(stream_options, dict) and stream_options.get("include_usage")
+        started = False
+        text = []
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "error":
+                    if started:
+                        # Too late for a status code, tell the client in-band
+                        await self.send_chunk(writer, self.sse({"error": {"message": str(value)}}))
+                        break
+                    if isinstance(value, RateLimited):
+                        raise HTTPError(429, str(value), {"Retry-After": str(int(value.retry_after) + 1)})
+                    raise value if isinstance(value, HTTPError) else HTTPError(500, f"generation failed: {value}")
+                if stream and not started:
+                    started = True
+                    writer.write(self.head(200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                                 "Transfer-Encoding": "chunked",
+                                                 "Connection": "keep-alive" if keep_open else "close"}))
+                    await self.send_chunk(writer, self.sse(self.delta(completion_id, created, {"role": "assistant"})))
+                if kind == "chunk":
+                    if stream:
+                        await self.send_chunk(writer, self.sse(self.delta(completion_id, created, {"content": value})))
+                    else:
+                        text.append(value)
+                    continue
+                # done
+                final = value
+                reason = "length" if (final or {}).get("done_reason") == "length" else "stop"
+                usage = self.usage(final)
+                if not stream:
+                    await self.send_json(writer, 200, {
+                        "id": completion_id, "object": "chat.completion", "created": created, "model": self.model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(text)},
+                                     "finish_reason": reason}],
+                        "usage": usage,
+                    }, keep_open)
+                    return
+                await self.send_chunk(writer, self.sse(self.delta(completion_id, created, {}, reason)))
+                if include_usage:
+                    await self.send_chunk(writer, self.sse(dict(self.delta(completion_id, created, {}),
+                                                                choices=[], usage=usage)))
+                break
+            await self.send_chunk(writer, b"data: [DONE]\n\n")
+            await self.send_chunk(writer, b"")
+        finally:
+            # Client went away (or we bailed out): stop generating right away
+            abandoned.set()
+
+    def sse(self, data):
+        return f"data: {json.dumps(data)}\n\n".encode()
+
+    def delta(self, completion_id, created, delta, finish_reason=None):
+        return {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": self.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+    def usage(self, final):
+        final = final or {}
+        prompt, completion = final.get("prompt_eval_count") or 0, final.get("eval_count") or 0
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    # --- Lifecycle ---
+    async def serve(self, host=HOST, port=PORT):
+        profile = self.profiles.active()
+        self.keep_alive = KeepAlive(self.backend, self.model, profile.options(), self.system).start()
+        self.profiles.on_switch(lambda p: self.keep_alive.retarget(self.model_override or p.model, p.options()))
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"OMI API listening on http://{host}:{port}/v1 (model {self.model}, "
+              f"{self.scheduler.max_concurrent} concurrent, {self.max_pending} queued max)")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible API server for OMI")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--model", help="Ollama model tag (default: the active model profile's)")
+    parser.add_argument("--max-concurrent", type=int, help="generations at once (default OMI_MAX_CONCURRENT)")
+    args = parser.parse_args()
+    server = OMIServer(args.model, args.max_concurrent)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory per message for long sessions: the old native window bookkeeping (a
+dict per message, the whole log concatenated into one string, [html, text]
+transcript rows) against message_store.MessageStore, whose transcript rows hold
+no HTML (it is rebuilt from the store when a row is rendered). The legacy rows
+get the escaped message text as their HTML, a lower bound for the old
+QTextDocument.toHtml() copy. Measured with tracemalloc; no model involved, the
+mock options are ignored.
+
+    python bench/bench_memory.py --messages 1000,5000,20000
+"""
+
+import html
+import time
+import tracemalloc
+
+import harness
+
+USER_TEXT = "how do I fix the pacman keyring error on arch? "
+REPLY_TEXT = ("Run `pacman -Sy archlinux-keyring` first, then `pacman-key --refresh-keys`. "
+              "If the clock is wrong the signatures look expired, so check `timedatectl` too.\n\n")
+
+
+def conversation(count):
+    # Fresh strings per message, like text coming off the network
+    for i in range(count):
+        if i % 2 == 0:
+            yield "user", f"{i} " + USER_TEXT * 2
+        else:
+            yield "assistant", f"{i} " + REPLY_TEXT * 8
+
+
+def legacy(messages):
+    # What omi_native kept before: self.messages, full_history_text, TranscriptModel.rows
+    state = {"messages": [], "history": "", "rows": []}
+    for role, content in messages:
+        state["messages"].append({"role": role, "content": content})
+        state["history"] += f"{'OM' if role == 'user' else 'OMI'}: {content}\n\n"
+        state["rows"].append([f"<p>{html.escape(content)}</p>", content])
+    return state
+
+
+def compact(messages):
+    # TranscriptModel only counts its rows now
+    from message_store import MessageStore
+    store = MessageStore()
+    for role, content in messages:
+        store.append(role, content)
+    return store
+
+
+def measure(build, count):
+    # -> (bytes held by the structure minus the message text itself, seconds to build)
+    texts = list(conversation(count))
+    text_bytes = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    state = build(texts)
+    seconds = time.perf_counter() - start
+    held = tracemalloc.get_traced_memory()[0] - text_bytes
+    del state
+    return held, seconds
+
+
+def main():
+    p = harness.parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--messages", default="1000,5000", help="comma separated session lengths")
+    args = p.parse_args()
+
+    result = {}
+    tracemalloc.start()
+    for count in (int(n) for n in args.messages.split(",")):
+        for name, build in (("legacy", legacy), ("store", compact)):
+            held, seconds = measure(build, count)
+            result[f"{name}_{count}_bytes_per_msg"] = round(held / count, 1)
+            result[f"{name}_{count}_build_s"] = seconds
+    tracemalloc.stop()
+    harness.report("memory", result, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark the PyQt6 window (omi_native.py) against the mock server, headless.
+Measures per prompt: time to first rendered text, rendered tokens/s and
+event-loop lag while streaming (how late a 5 ms timer fires), plus peak RSS.
+Also reports how the stream coalescer batched the chunks (ChunkCoalescer.stats)
+and the arc reactor's frame budget over the turns (ArcReactorWidget.frame_stats).
+
+    python bench/bench_native.py --rate 120 --tokens 800 --turns 5
+"""
+
+import os
+import time
+
+import harness
+
+PROMPT = "Explain how the arc reactor works, with a code example."
+PROBE_INTERVAL_MS = 5
+
+
+class LagProbe:
+    # A repeating timer that records how late each tick is: a blocked UI thread shows up here
+    def __init__(self, QTimer):
+        self.timer = QTimer()
+        self.timer.setInterval(PROBE_INTERVAL_MS)
+        self.timer.timeout.connect(self.tick)
+        self.lags = []
+        self.last = None
+
+    def start(self):
+        self.lags = []
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        now = time.perf_counter()
+        self.lags.append(max(0.0, (now - self.last) * 1000 - PROBE_INTERVAL_MS))
+        self.last = now
+
+
+def main():
+    args = harness.parser(__doc__.strip().splitlines()[0]).parse_args()
+    mock = harness.setup(args)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    from PyQt6.QtCore import QEventLoop, QTimer
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication([])
+
+    def wait_until(predicate, timeout):
+        loop = QEventLoop()
+        poll = QTimer()
+        poll.timeout.connect(lambda: predicate() and loop.quit())
+        poll.start(5)
+        QTimer.singleShot(int(timeout * 1000), loop.quit)
+        loop.exec()
+        poll.stop()
+        return predicate()
+
+    start = time.perf_counter()
+    import omi_native
+    window = omi_native.OMIWindow()
+    window.show()
+    window.finish_startup()
+    startup = time.perf_counter() - start
+    wait_until(lambda: window.model_warm, 30)
+
+    # Time every render the window does
+    renders = []
+    update = window.update_ai_response
+
+    def timed_update(chunk):
+        update(chunk)
+        renders.append(time.perf_counter())
+    window.update_ai_response = timed_update
+
+    probe = LagProbe(QTimer)
+    window.arc_reactor.reset_frame_stats()
+    first_render, rates, lags = [], [], []
+    chunks, flushes = 0, 0
+    for turn in range(args.turns):
+        renders.clear()
+        window.input_field.setText(f"{PROMPT} ({turn + 1})")
+        probe.start()
+        sent = time.perf_counter()
+        window.send_message()
+        if not wait_until(lambda: not window.is_generating, 120):
+            raise SystemExit("generation did not finish, is the mock server reachable?")
+        probe.stop()
+        if renders:
+            first_render.append((renders[0] - sent) * 1000)
+            streamed = renders[-1] - renders[0]
+            if streamed > 0:
+                rates.append(args.tokens / streamed)
+        lags.extend(probe.lags)
+        # One coalescer per reply
+        coalesced = window.coalescer.stats()
+        chunks += coalesced["chunks_received"]
+        flushes += coalesced["flushes"]
+
+    frames = window.arc_reactor.frame_stats()
+    window.close()
+    app.processEvents()     # let the close and pending worker signals go through before the mock stops
+    mock.stop()
+    harness.report("native", {
+        "turns": args.turns,
+        "startup_ms": startup * 1000,
+        "first_render_ms_avg": sum(first_render) / max(1, len(first_render)),
+        "first_render_ms_max": max(first_render, default=0.0),
+        "rendered_tokens_per_s": sum(rates) / max(1, len(rates)),
+        "mock_tokens_per_s": args.rate,
+        "renders_last_turn": len(renders),
+        "loop_lag_ms_p95": harness.percentile(lags, 95),
+        "loop_lag_ms_max": max(lags, default=0.0),
+        "chunks_received": chunks,
+        "flushes": flushes,
+        "chunks_per_flush": chunks / max(1, flushes),
+        "flush_interval_ms": window.coalescer.interval_ms,
+        "reactor_fps": frames["fps"],
+        "reactor_paint_ms_avg": frames["avg_paint_ms"],
+        "reactor_paint_ms_max": frames["max_paint_ms"],
+        "reactor_frames_over_budget": frames["over_budget"],
+        "reactor_ticks_skipped": frames["ticks_skipped"],
+        "process_cpu_percent": frames["process_cpu_percent"],
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
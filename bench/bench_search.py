@@ -0,0 +1,73 @@
+"""
+Benchmark the terminal 'search <topic>' flow from start.py, offline.
+Search providers are replaced by fakes with fixed latencies whose result URLs
+point at the mock server's /page/ endpoint, so the fan-out deadline, the search
+cache and page fetching all run for real. The summarize step streams from the
+mock the same prompt start.py builds (through the backend instead of
+open-interpreter, which is not needed to time the pipeline).
+
+    python bench/bench_search.py --delays 0.3,0.8,6 --fetch-pages 2
+"""
+
+import time
+
+import harness
+
+QUERY = "arch linux pacman keyring error"
+
+
+def fake_provider(name, delay, base_url):
+    def fetch(query, num_results=3):
+        time.sleep(delay)
+        return [{"title": f"{name} result {i}", "url": f"{base_url}/page/{name}-{i}",
+                 "summary": f"{name} says something about {query}."} for i in range(num_results)]
+    return fetch
+
+
+def main():
+    p = harness.parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--delays", default="0.3,0.8,6", help="comma separated fake provider latencies (s)")
+    p.add_argument("--fetch-pages", type=int, default=2)
+    args = p.parse_args()
+    mock = harness.setup(args)
+
+    import web_search
+    from ollama_backend import get_backend
+
+    delays = [float(d) for d in args.delays.split(",") if d]
+    web_search.PROVIDERS.clear()
+    for i, delay in enumerate(delays):
+        web_search.PROVIDERS[f"fake{i}"] = fake_provider(f"fake{i}", delay, mock.url)
+
+    searches, first_token, turn_times = [], [], []
+    for turn in range(args.turns):
+        # Turn 1 is cold, the rest hit the search cache
+        start = time.perf_counter()
+        search_data = web_search.get_results(QUERY, fetch_pages=args.fetch_pages)
+        searched = time.perf_counter()
+        searches.append((searched - start) * 1000)
+
+        prompt = f"I searched for '{QUERY}'. Here are the results:\n{search_data}\n\nPlease summarize these findings."
+        first = None
+        for chunk in get_backend().stream_chat([{"role": "user", "content": prompt}], model="OMI"):
+            if first is None and chunk.get("message", {}).get("content"):
+                first = time.perf_counter()
+        turn_times.append(time.perf_counter() - start)
+        if first:
+            first_token.append((first - searched) * 1000)
+
+    mock.stop()
+    harness.report("search", {
+        "turns": args.turns,
+        "providers": len(delays),
+        "deadline_s": web_search.DEADLINE,
+        "search_ms_cold": searches[0] if searches else 0.0,
+        "search_ms_warm_avg": sum(searches[1:]) / max(1, len(searches) - 1),
+        "prompt_chars": len(prompt) if searches else 0,
+        "first_token_ms_avg": sum(first_token) / max(1, len(first_token)),
+        "turn_s_avg": sum(turn_times) / max(1, len(turn_times)),
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark the Streamlit app (omi_app.py) against the mock server with
+streamlit's AppTest runner, no browser needed.
+Measures per prompt: time until the script gets the first chunk, total script
+time (the streaming loop incl. all placeholder updates) and the cost of a plain
+rerun as the history grows, plus peak RSS. Also checks that the rerun renders
+the page exactly as it stood when streaming ended (same markdown elements).
+
+    python bench/bench_streamlit.py --rate 120 --turns 10
+"""
+
+import os
+import time
+
+import harness
+
+PROMPT = "Explain how the arc reactor works, with a code example."
+
+
+def main():
+    args = harness.parser(__doc__.strip().splitlines()[0]).parse_args()
+    mock = harness.setup(args)
+
+    from streamlit.testing.v1 import AppTest
+    import ollama_backend
+
+    # Note when the app's streaming loop receives its first chunk
+    first_chunks = []
+    stream_chat = ollama_backend.OllamaBackend.stream_chat
+
+    def timed_stream_chat(self, *a, **kw):
+        first = True
+        for chunk in stream_chat(self, *a, **kw):
+            if first:
+                first_chunks.append(time.perf_counter())
+                first = False
+            yield chunk
+    ollama_backend.OllamaBackend.stream_chat = timed_stream_chat
+
+    at = AppTest.from_file(os.path.join(harness.ROOT, "omi_app.py"), default_timeout=300)
+    start = time.perf_counter()
+    at.run()
+    startup = time.perf_counter() - start
+
+    first_chunk, turn_times, rerun_times = [], [], []
+    mismatched = 0
+    for turn in range(args.turns):
+        first_chunks.clear()
+        sent = time.perf_counter()
+        at.chat_input[0].set_value(f"{PROMPT} ({turn + 1})").run()
+        turn_times.append(time.perf_counter() - sent)
+        if at.exception:
+            raise SystemExit(f"app raised: {at.exception[0].message}")
+        if first_chunks:
+            first_chunk.append((first_chunks[0] - sent) * 1000)
+        streamed = [m.value for m in at.markdown]
+
+        # A rerun with nothing new to say: pure history rendering cost
+        rerun = time.perf_counter()
+        at.run()
+        rerun_times.append((time.perf_counter() - rerun) * 1000)
+        if [m.value for m in at.markdown] != streamed:
+            mismatched += 1
+
+    mock.stop()
+    harness.report("streamlit", {
+        "turns": args.turns,
+        "first_run_ms": startup * 1000,
+        "first_chunk_ms_avg": sum(first_chunk) / max(1, len(first_chunk)),
+        "turn_s_avg": sum(turn_times) / max(1, len(turn_times)),
+        "script_tokens_per_s": args.tokens * len(turn_times) / max(1e-9, sum(turn_times)),
+        "mock_tokens_per_s": args.rate,
+        "rerun_ms_first": rerun_times[0] if rerun_times else 0.0,
+        "rerun_ms_last": rerun_times[-1] if rerun_times else 0.0,
+        "rerender_matches_stream": mismatched == 0,
+    }, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark the map-reduce summarization pipeline (summarize_pipeline.py)
+against the mock server with a synthetic oversized search payload.
+Reports the per-stage timings, chunk count and reduce depth.
+
+    python bench/bench_summarize.py --results 20 --parallel 4 --rate 200
+"""
+
+import time
+
+import harness
+
+TOPIC = "arch linux pacman keyring error"
+PARAGRAPH = ("Running pacman-key --refresh-keys fixes most keyring errors, but an outdated "
+             "archlinux-keyring package has to be upgraded first with pacman -Sy archlinux-keyring. ")
+
+
+def material(results, paragraphs):
+    text = ""
+    for i in range(1, results + 1):
+        text += f"\n--- RESULT {i} ---\nTitle: Result {i}\nLink:  https://example.com/{i}\n"
+        text += "Summary: " + "\n\n".join(PARAGRAPH * 3 for _ in range(paragraphs)) + "\n"
+    return text
+
+
+def main():
+    p = harness.parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--results", type=int, default=20, help="fake search results")
+    p.add_argument("--paragraphs", type=int, default=4, help="paragraphs per result")
+    p.add_argument("--parallel", type=int, default=2, help="concurrent map calls")
+    args = p.parse_args()
+    mock = harness.setup(args)
+
+    from context_manager import estimate_tokens
+    from scheduler import get_scheduler
+    from summarize_pipeline import SummaryPipeline
+
+    # Let the scheduler run as many generations as the pipeline asks for
+    get_scheduler().max_concurrent = args.parallel
+    text = material(args.results, args.paragraphs)
+    pipeline = SummaryPipeline(parallel=args.parallel)
+    runs = []
+    for _ in range(args.turns):
+        start = time.perf_counter()
+        answer = "".join(pipeline.run(TOPIC, text))
+        runs.append(time.perf_counter() - start)
+
+    mock.stop()
+    result = {
+        "turns": args.turns,
+        "material_tokens": estimate_tokens(text),
+        "chunks": pipeline.counts.get("chunks", 0),
+        "reduce_levels": pipeline.counts.get("reduce_levels", 0),
+        "parallel": args.parallel,
+        "answer_chars": len(answer),
+        "failed_calls": len(pipeline.errors),
+        "total_s_avg": sum(runs) / len(runs),
+    }
+    result.update({f"{name}_s": seconds for name, seconds in pipeline.timings.items() if name != "total"})
+    harness.report("summarize", result, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Run the model profile auto-tuner (model_profiles.AutoTuner) against the mock
+server with a simulated num_thread / num_batch speed curve and check that it
+lands on the curve's best setting. --rate is ignored, the curve sets the speed.
+
+    python bench/bench_tune.py --cores 6 --threads 3,6,12 --batch 128,256,512
+"""
+
+import time
+
+import harness
+from mock_ollama import CurveConfig
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main():
+    p = harness.parser(__doc__.strip().splitlines()[0])
+    p.add_argument("--cores", type=int, default=6, help="simulated physical cores")
+    p.add_argument("--threads", type=_int_list, default=[3, 6, 12])
+    p.add_argument("--batch", type=_int_list, default=[128, 256, 512])
+    p.add_argument("--runs", type=int, default=1, help="measured requests per candidate")
+    args = p.parse_args()
+    config = CurveConfig(args.rate, args.chunk, args.latency, args.tokens, cores=args.cores)
+    mock = harness.setup(args, config)
+
+    from model_profiles import AutoTuner, default_profile
+
+    tuner = AutoTuner(default_profile(), runs=args.runs, tokens=min(args.tokens, 64))
+    candidates = tuner.candidates(args.threads, args.batch)
+    start = time.perf_counter()
+    best, results = tuner.run(candidates)
+    seconds = time.perf_counter() - start
+    mock.stop()
+
+    expected = max(candidates, key=config.eval_rate)
+    result = {
+        "candidates": len(candidates),
+        "failed": sum(1 for r in results if "tok_s" not in r),
+        "best": " ".join(f"{k}={v}" for k, v in best["options"].items()) if best else "none",
+        "expected": " ".join(f"{k}={v}" for k, v in expected.items()),
+        "found_best": bool(best) and best["options"] == expected,
+        "best_tok_s": best["tok_s"] if best else 0.0,
+        "expected_tok_s": float(config.eval_rate(expected)),
+        "tune_s": seconds,
+    }
+    harness.report("tune", result, args.json)
+
+
+if __name__ == "__main__":
+    main()
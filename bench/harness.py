@@ -0,0 +1,69 @@
+"""
+Shared plumbing for the benchmarks: command line options for the mock server,
+an isolated environment (temp HOME so ~/.omi is never touched, OLLAMA_HOST
+pointing at the mock) and report printing.
+Call setup() before importing any OMI module, the backend reads OLLAMA_HOST
+at import time.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from mock_ollama import MockConfig, MockOllama
+
+
+def parser(description):
+    p = argparse.ArgumentParser(description=description)
+    p.add_argument("--rate", type=float, default=60.0, help="mock decode tokens/s")
+    p.add_argument("--chunk", type=int, default=1, help="mock tokens per stream chunk")
+    p.add_argument("--latency", type=float, default=0.2, help="mock seconds before the first token")
+    p.add_argument("--tokens", type=int, default=400, help="mock reply length in tokens")
+    p.add_argument("--turns", type=int, default=3, help="prompts to send")
+    p.add_argument("--json", action="store_true", help="print one JSON line instead of a table")
+    return p
+
+
+def setup(args, config=None):
+    # -> running MockOllama. Everything the app writes goes to a throwaway HOME.
+    home = tempfile.mkdtemp(prefix="omi-bench-")
+    os.environ["HOME"] = home
+    config = config or MockConfig(args.rate, args.chunk, args.latency, args.tokens)
+    mock = MockOllama(config).start()
+    os.environ["OLLAMA_HOST"] = mock.url
+    return mock
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def report(name, result, as_json=False):
+    result = dict(result, bench=name, peak_rss_mb=round(peak_rss_mb(), 1))
+    if as_json:
+        print(json.dumps(result))
+        return result
+    print(f"=== {name} ===")
+    for key, value in result.items():
+        if key == "bench":
+            continue
+        if isinstance(value, float):
+            value = f"{value:.2f}"
+        print(f"  {key:<28} {value}")
+    return result
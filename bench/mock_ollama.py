@@ -0,0 +1,268 @@
+"""
+Mock Ollama server for the benchmarks.
+Speaks enough of the Ollama HTTP API (/api/chat, /api/generate, /api/embed,
+/api/tags, /api/version) to stand in for the real thing, with a configurable
+token rate, chunk size, first-token latency and response length.
+It also serves dummy HTML under /page/<name> for the page fetcher.
+
+    python bench/mock_ollama.py --port 11434 --rate 80 --tokens 600
+"""
+
+import argparse
+import hashlib
+import math
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A reply with the block types the renderer cares about (paragraphs, lists, code),
+# including GFM-only bits: a list right under a paragraph, a 2-space nested list, strikethrough
+REPLY_TEXT = (
+    "Here is a quick overview of the topic:\n"
+    "- first point about the thing\n  - a nested detail under it\n"
+    "- second point with ~~less~~ more detail\n- third point\n\n"
+    "```python\ndef example(x):\n    return x * 2\n```\n\n"
+    "And a closing paragraph that wraps the answer up with a few more words .\n\n"
+)
+# One token per word, leading indentation kept; joined back they give REPLY_TEXT exactly
+REPLY_WORDS = re.findall(r"[^\S\n]*\S+|\n|[^\S\n]+", REPLY_TEXT)
+
+PAGE_HTML = (
+    "<html><head><title>Page {name}</title><script>var tracking = 1;</script></head><body>"
+    # Unclosed <li> / <p> inside skipped regions are valid HTML and must not swallow the article
+    "<header><p>Tagline of the site that nobody needs in a prompt</header>"
+    "<nav><ul><li>Home<li>About<li>Contact</ul></nav><article><h1>Page {name}</h1>"
+    + "<p>This paragraph is filler article text about the search topic, long enough to chunk.</p>" * 60
+    + "</article><footer>Copyright</footer></body></html>"
+)
+
+
+class MockConfig:
+    def __init__(self, tokens_per_s=60.0, chunk_tokens=1, latency=0.2, response_tokens=400,
+                 prompt_eval_rate=800.0, load_time=0.0):
+        self.tokens_per_s = tokens_per_s        # decode speed
+        self.chunk_tokens = chunk_tokens        # tokens per NDJSON line
+        self.latency = latency                  # fixed delay before prompt eval
+        self.response_tokens = response_tokens  # reply length unless num_predict is smaller
+        self.prompt_eval_rate = prompt_eval_rate
+        self.load_time = load_time              # extra delay the first time a model is used
+
+    def eval_rate(self, options):
+        # Decode tokens/s for a request. Overridden to simulate speed curves.
+        return self.tokens_per_s
+
+
+class CurveConfig(MockConfig):
+    # Decode speed shaped like a CPU box: grows with num_thread up to the physical
+    # cores, then drops (extra threads fight over the same cores), and falls off
+    # slightly either side of the best num_batch. For the auto-tuner benchmark.
+    def __init__(self, *args, cores=6, per_thread=10.0, oversubscribe_penalty=0.15, best_batch=256, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cores = cores
+        self.per_thread = per_thread
+        self.oversubscribe_penalty = oversubscribe_penalty
+        self.best_batch = best_batch
+
+    def eval_rate(self, options):
+        threads = options.get("num_thread") or self.cores
+        rate = self.per_thread * min(threads, self.cores)
+        if threads > self.cores:
+            rate *= max(0.2, 1 - self.oversubscribe_penalty * (threads - self.cores))
+        batch = options.get("num_batch") or 512
+        return rate * max(0.5, 1 - 0.1 * abs(math.log2(batch / self.best_batch)))
+
+
+def reply_tokens(count):
+    return [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(count)]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so connection reuse is measurable
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- plumbing ---
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def write_line(self, data):
+        line = (json.dumps(data) + "\n").encode()
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    def end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    # --- endpoints ---
+    def do_GET(self):
+        if self.path == "/api/version":
+            self.send_json({"version": "0.0.0-mock"})
+        elif self.path == "/api/tags":
+            self.send_json({"models": [{"name": name} for name in sorted(self.server.loaded)]})
+        elif self.path.startswith("/page/"):
+            # Stand-in web page for the search benchmark's page fetching
+            body = PAGE_HTML.format(name=self.path[6:]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        self.server.requests += 1
+        try:
+            data = self.read_json()
+        except ValueError:
+            return self.send_json({"error": "bad json"}, 400)
+        if self.path == "/api/chat":
+            prompt = "".join(str(m.get("content", "")) for m in data.get("messages", []))
+            self.generate(data, prompt, lambda text: {"message": {"role": "assistant", "content": text}})
+        elif self.path == "/api/generate":
+            if not data.get("prompt"):
+                self.load_model(data.get("model"))
+                return self.send_json({"model": data.get("model"), "response": "", "done": True,
+                                       "done_reason": "load"})
+            self.generate(data, data["prompt"], lambda text: {"response": text})
+        elif self.path == "/api/embed":
+            texts = data.get("input")
+            texts = [texts] if isinstance(texts, str) else texts
+            self.send_json({"model": data.get("model"), "embeddings": [self.embedding(t) for t in texts]})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def load_model(self, model):
+        config = self.server.config
+        load = 0.0
+        if model not in self.server.loaded:
+            load = config.load_time
+            time.sleep(load)
+            self.server.loaded.add(model)
+        return load
+
+    def embedding(self, text):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [(b - 128) / 128.0 for b in digest[:32]]
+
+    def generate(self, data, prompt, wrap):
+        config = self.server.config
+        options = data.get("options") or {}
+        start = time.perf_counter()
+        load = self.load_model(data.get("model"))
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        prompt_eval = prompt_tokens / config.prompt_eval_rate
+        time.sleep(config.latency + prompt_eval)
+
+        count = config.response_tokens
+        if options.get("num_predict") is not None and options["num_predict"] >= 0:
+            count = min(count, options["num_predict"])
+        tokens = reply_tokens(count)
+        interval = config.chunk_tokens / max(0.1, config.eval_rate(options))
+
+        stream = data.get("stream", True)
+        eval_start = time.perf_counter()
+        text = ""
+        try:
+            if stream:
+                self.start_stream()
+            next_at = time.perf_counter()
+            for i in range(0, len(tokens), config.chunk_tokens):
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                piece = "".join(tokens[i:i + config.chunk_tokens])
+                text += piece
+                if stream:
+                    self.write_line(dict(wrap(piece), model=data.get("model"), done=False))
+            eval_time = time.perf_counter() - eval_start
+            final = dict(
+                wrap("" if stream else text), model=data.get("model"), done=True, done_reason="stop",
+                total_duration=int((time.perf_counter() - start) * 1e9),
+                load_duration=int(load * 1e9),
+                prompt_eval_count=prompt_tokens,
+                prompt_eval_duration=int(prompt_eval * 1e9),
+                eval_count=len(tokens),
+                eval_duration=int(eval_time * 1e9),
+            )
+            if stream:
+                self.write_line(final)
+                self.end_stream()
+            else:
+                self.send_json(final)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled: stop "generating" like the real server does
+            self.server.cancelled += 1
+            self.close_connection = True
+
+
+class MockOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), MockHandler)
+        self.config = config or MockConfig()
+        self.loaded = set()
+        self.requests = 0
+        self.cancelled = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--rate", type=float, default=60.0, help="decode tokens/s")
+    parser.add_argument("--chunk", type=int, default=1, help="tokens per stream chunk")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before prompt eval")
+    parser.add_argument("--tokens", type=int, default=400, help="reply length in tokens")
+    parser.add_argument("--curve-cores", type=int, help="simulate a num_thread / num_batch speed curve")
+    args = parser.parse_args()
+    if args.curve_cores:
+        config = CurveConfig(args.rate, args.chunk, args.latency, args.tokens, cores=args.curve_cores)
+    else:
+        config = MockConfig(args.rate, args.chunk, args.latency, args.tokens)
+    server = MockOllama(config, port=args.port)
+    print(f"Mock Ollama on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Run every benchmark in its own process (so peak RSS is per front end) with the
+same mock server settings and print one summary table.
+
+    python bench/run_all.py --rate 80 --tokens 600 --turns 5
+    python bench/run_all.py --only native,search --save results.jsonl
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHES = {
+    "native": "bench_native.py",
+    "streamlit": "bench_streamlit.py",
+    "search": "bench_search.py",
+    "summarize": "bench_summarize.py",
+    "memory": "bench_memory.py",
+    "tune": "bench_tune.py",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all OMI benchmarks")
+    parser.add_argument("--only", default=",".join(BENCHES), help="comma separated subset")
+    parser.add_argument("--save", help="append the results to this JSONL file")
+    args, passthrough = parser.parse_known_args()
+
+    results = []
+    for name in args.only.split(","):
+        cmd = [sys.executable, os.path.join(BENCH_DIR, BENCHES[name]), "--json"] + passthrough
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith("{")]
+        if proc.returncode or not lines:
+            print(f"{name}: failed\n{proc.stderr.strip()[-2000:]}", file=sys.stderr)
+            continue
+        results.append(json.loads(lines[-1]))
+
+    for result in results:
+        print(f"=== {result['bench']} ===")
+        for key, value in result.items():
+            if key != "bench":
+                print(f"  {key:<28} {value:.2f}" if isinstance(value, float) else f"  {key:<28} {value}")
+
+    if args.save:
+        with open(args.save, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
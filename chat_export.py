@@ -0,0 +1,275 @@
+"""
+Streaming conversation export: Markdown, JSONL, self-contained HTML and the
+plain text log. Messages are written one at a time as they are read (from the
+chat store with a cursor, or from a front end's message list), so memory stays
+flat however big the archive is. ExportJob runs an export on a background
+thread and reports progress; the CLI bulk-exports every stored session.
+
+    python chat_export.py --format html --out exports/
+    python chat_export.py --session 12 --format md --out exports/
+"""
+
+import argparse
+import html
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from chat_store import DB_PATH
+
+# --- CONFIG ---
+NAMES = {"user": "OM", "assistant": "OMI"}
+PROGRESS_INTERVAL = 0.1     # seconds between progress callbacks
+
+HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ background: #000; color: #00ff88; font-family: 'Segoe UI', sans-serif; max-width: 900px; margin: 2em auto; }}
+h1 {{ color: #ff0000; font-size: 1.3em; }}
+.msg {{ margin: 1em 0; padding: 0.8em 1em; border-radius: 8px; background: #0a0a0a; border: 1px solid #1a1a1a; }}
+.user {{ border-color: #ff0000; }}
+.who {{ font-weight: bold; font-size: 0.8em; margin-bottom: 0.4em; color: #ff4444; }}
+.when {{ float: right; color: #555; font-weight: normal; }}
+.text {{ white-space: pre-wrap; word-wrap: break-word; }}
+</style></head><body>
+<h1>{title}</h1>
+"""
+HTML_TAIL = "</body></html>\n"
+
+
+# --- Writers ---
+# begin(title) once, message(...) per message, end() once. Nothing is buffered.
+class TextWriter:
+    extension = "txt"
+    mime = "text/plain"
+
+    def __init__(self, out, session=None):
+        self.out = out
+        self.session = session
+
+    def begin(self, title):
+        pass
+
+    def message(self, role, content, created=None):
+        self.out.write(f"{NAMES.get(role, role)}: {content}\n\n")
+
+    def end(self):
+        pass
+
+
+class MarkdownWriter(TextWriter):
+    extension = "md"
+    mime = "text/markdown"
+
+    def begin(self, title):
+        if title:
+            self.out.write(f"# {title}\n\n")
+
+    def message(self, role, content, created=None):
+        when = f" · {time.strftime('%Y-%m-%d %H:%M', time.localtime(created))}" if created else ""
+        self.out.write(f"### {NAMES.get(role, role)}{when}\n\n{content}\n\n")
+
+
+class JsonlWriter(TextWriter):
+    extension = "jsonl"
+    mime = "application/jsonl"
+
+    def message(self, role, content, created=None):
+        record = {"role": role, "content": content, "created": created}
+        if self.session is not None:
+            record["session"] = self.session
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class HtmlWriter(TextWriter):
+    # One file, inline CSS, no scripts or external assets
+    extension = "html"
+    mime = "text/html"
+
+    def begin(self, title):
+        self.out.write(HTML_HEAD.format(title=html.escape(title or "OMI chat")))
+
+    def message(self, role, content, created=None):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(created)) if created else ""
+        self.out.write(
+            f'<div class="msg {html.escape(role)}"><div class="who">{html.escape(NAMES.get(role, role))}'
+            f'<span class="when">{when}</span></div><div class="text">{html.escape(content)}</div></div>\n'
+        )
+
+    def end(self):
+        self.out.write(HTML_TAIL)
+
+
+FORMATS = {"md": MarkdownWriter, "jsonl": JsonlWriter, "html": HtmlWriter, "txt": TextWriter}
+
+
+def write_conversation(out, messages, fmt="md", title="", session=None, on_message=None):
+    # messages: iterable of (role, content, created). Returns the number written.
+    writer = FORMATS[fmt](out, session)
+    writer.begin(title)
+    count = 0
+    for role, content, created in messages:
+        writer.message(role, content, created)
+        count += 1
+        if on_message is not None:
+            on_message()
+    writer.end()
+    return count
+
+
+# --- Sources ---
+def connect(path=DB_PATH):
+    # Separate read-only connection: WAL lets it read while the app keeps writing
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+
+def stored_sessions(conn, ids=None):
+    # -> [(id, title, created, message_count)], oldest first
+    query = "SELECT id, title, created, message_count FROM sessions WHERE message_count > 0"
+    if ids:
+        query += f" AND id IN ({','.join('?' * len(ids))})"
+    return conn.execute(query + " ORDER BY id", list(ids or ())).fetchall()
+
+
+def stored_messages(conn, session_id):
+    # Cursor over one session: rows are stepped through, never loaded all at once
+    return conn.execute(
+        "SELECT role, content, created FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+    )
+
+
+# --- Background jobs ---
+class Cancelled(Exception):
+    pass
+
+
+class ExportJob:
+    # Runs `work(job)` on its own thread. work calls job.step() once per message;
+    # on_progress(done, total) is throttled, on_done(job, error) fires once at the end.
+    def __init__(self, work, total=0, on_progress=None, on_done=None):
+        self.work = work
+        self.total = total
+        self.done = 0
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self._reported = 0.0
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def step(self):
+        if self.cancelled:
+            raise Cancelled()
+        self.done += 1
+        now = time.monotonic()
+        if self.on_progress is not None and now - self._reported >= PROGRESS_INTERVAL:
+            self._reported = now
+            self.on_progress(self.done, self.total)
+
+    def _run(self):
+        try:
+            self.result = self.work(self)
+        except Exception as e:
+            self.error = e
+        if self.on_progress is not None and self.error is None:
+            self.on_progress(self.done, self.total)
+        if self.on_done is not None:
+            self.on_done(self, self.error)
+
+
+def export_messages(path, messages, fmt, title="", total=0, on_progress=None, on_done=None):
+    # One conversation (e.g. a front end's in-memory history) to one file
+    def work(job):
+        with open(path, "w", encoding="utf-8") as out:
+            write_conversation(out, messages, fmt, title, on_message=job.step)
+        return path
+    return ExportJob(work, total, on_progress, on_done).start()
+
+
+def export_session(path, session_id, fmt, tail=(), first_seq=0, db_path=DB_PATH, on_progress=None, on_done=None):
+    # One stored session to one file, read from the store rather than from what a
+    # front end has paged in. `tail` is the front end's own copy of the newest
+    # messages ((role, content, created), the first one at seq `first_seq`); only
+    # those the store doesn't have yet (appends still queued) are written after it.
+    conn = connect(db_path)
+    conn.execute("BEGIN")   # one snapshot: the count and the cursor agree
+    rows = stored_sessions(conn, [session_id])
+    title, stored = (rows[0][1], rows[0][3]) if rows else ("", 0)
+
+    def messages(job):
+        yield from stored_messages(conn, session_id)
+        for seq, message in enumerate(tail, first_seq):
+            if seq >= stored:
+                job.total += 1
+                yield message
+
+    def work(job):
+        try:
+            with open(path, "w", encoding="utf-8") as out:
+                write_conversation(out, messages(job), fmt, title or "OMI chat", session=session_id,
+                                   on_message=job.step)
+        finally:
+            conn.close()
+        return path
+    return ExportJob(work, stored, on_progress, on_done).start()
+
+
+def export_sessions(out_dir, fmt, ids=None, db_path=DB_PATH, on_progress=None, on_done=None):
+    # Every stored session (or just `ids`), one file each: session_<id>.<ext>
+    conn = connect(db_path)
+    sessions = stored_sessions(conn, ids)
+    extension = FORMATS[fmt].extension
+
+    def work(job):
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        try:
+            for session_id, title, _, _ in sessions:
+                path = os.path.join(out_dir, f"session_{session_id}.{extension}")
+                with open(path, "w", encoding="utf-8") as out:
+                    write_conversation(out, stored_messages(conn, session_id), fmt, title,
+                                       session=session_id, on_message=job.step)
+                paths.append(path)
+        finally:
+            conn.close()
+        return paths
+    return ExportJob(work, sum(s[3] for s in sessions), on_progress, on_done).start()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Export stored OMI chats")
+    p.add_argument("--format", choices=list(FORMATS), default="md")
+    p.add_argument("--out", default="omi_export", help="output directory")
+    p.add_argument("--session", type=int, action="append", help="only this session id (repeatable)")
+    p.add_argument("--db", default=DB_PATH, help="chat store database")
+    args = p.parse_args()
+    if not os.path.exists(args.db):
+        sys.exit(f"No chat store at {args.db}")
+
+    def progress(done, total):
+        print(f"\r  {done}/{total} messages", end="", file=sys.stderr, flush=True)
+
+    job = export_sessions(args.out, args.format, args.session, args.db, on_progress=progress)
+    job.join()
+    print(file=sys.stderr)
+    if job.error is not None:
+        sys.exit(f"Export failed: {job.error}")
+    print(f"Exported {len(job.result or [])} sessions to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
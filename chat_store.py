@@ -0,0 +1,156 @@
+"""
+Persistent conversation store.
+Append-only SQLite in WAL mode. Every read and write runs on one background
+thread, so the UI never waits on the disk. Results come back via callbacks
+(called on the store thread - Qt code should bounce them through a signal).
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DB_PATH = os.path.join(os.path.expanduser("~"), ".omi", "chats.db")
+PAGE_SIZE = 50
+TITLE_LENGTH = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS messages_by_session ON messages(session_id, seq);
+CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions(updated);
+"""
+
+
+class StoredSession:
+    # Handle for a session. `id` is filled in by the store thread, and since jobs
+    # run in order, appends queued right after new_session() already see it.
+    def __init__(self, session_id=None, count=0):
+        self.id = session_id
+        self.count = count
+
+
+class ChatStore:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="chat-store", daemon=True)
+        self._thread.start()
+
+    # --- Store thread ---
+    def _connect(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            func, args, callback = job
+            try:
+                result = func(conn, *args)
+            except Exception as e:
+                print(f"Store error: {e}")
+                continue
+            if callback:
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"Store callback error: {e}")
+        conn.close()
+
+    def _submit(self, func, *args, callback=None):
+        self._queue.put((func, args, callback))
+
+    # --- Writes ---
+    def new_session(self, title=""):
+        session = StoredSession()
+        self._submit(self._create_session, session, title)
+        return session
+
+    def _create_session(self, conn, session, title):
+        now = time.time()
+        with conn:
+            cur = conn.execute("INSERT INTO sessions (title, created, updated) VALUES (?, ?, ?)",
+                               (title, now, now))
+        session.id = cur.lastrowid
+
+    def append(self, session, role, content):
+        # seq is handed out here (caller thread) so ordering never depends on timing
+        seq = session.count
+        session.count += 1
+        self._submit(self._append, session, seq, role, content, time.time())
+
+    def _append(self, conn, session, seq, role, content, created):
+        with conn:
+            conn.execute(
+                "INSERT INTO messages (session_id, seq, role, content, created) VALUES (?, ?, ?, ?, ?)",
+                (session.id, seq, role, content, created),
+            )
+            conn.execute(
+                "UPDATE sessions SET updated = ?, message_count = message_count + 1, "
+                "title = CASE WHEN title = '' AND ? = 'user' THEN ? ELSE title END WHERE id = ?",
+                (created, role, content[:TITLE_LENGTH].replace("\n", " "), session.id),
+            )
+
+    # --- Reads ---
+    def list_sessions(self, callback, limit=100, offset=0):
+        # -> [(id, title, updated, message_count)], newest first. Never touches messages.
+        self._submit(self._list_sessions, limit, offset, callback=callback)
+
+    def _list_sessions(self, conn, limit, offset):
+        return conn.execute(
+            "SELECT id, title, updated, message_count FROM sessions "
+            "WHERE message_count > 0 ORDER BY updated DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+
+    def latest_session(self, callback):
+        # -> StoredSession to keep appending to, or None
+        self._submit(self._latest_session, callback=callback)
+
+    def _latest_session(self, conn):
+        rows = self._list_sessions(conn, 1, 0)
+        if not rows:
+            return None
+        return StoredSession(rows[0][0], rows[0][3])
+
+    def load_page(self, session_id, before_seq, callback, limit=PAGE_SIZE):
+        # -> [(seq, role, content)] in chat order, the `limit` messages before `before_seq`
+        self._submit(self._load_page, session_id, before_seq, limit, callback=callback)
+
+    def _load_page(self, conn, session_id, before_seq, limit):
+        rows = conn.execute(
+            "SELECT seq, role, content FROM messages WHERE session_id = ? AND seq < ? "
+            "ORDER BY seq DESC LIMIT ?",
+            (session_id, before_seq, limit),
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    def close(self, timeout=5.0):
+        # Lets queued writes finish first
+        self._queue.put(None)
+        self._thread.join(timeout)
@@ -0,0 +1,180 @@
+"""
+Token-budgeted chat context.
+Keeps what we send to Ollama inside num_ctx: pinned messages always go first,
+then relevant memory snippets (if a retriever is set), then as many recent
+turns as fit. Turns that fall out of the window are folded into a running
+summary on a background thread.
+"""
+
+import re
+import threading
+
+# --- CONFIG ---
+NUM_CTX = 4096          # passed to Ollama as options.num_ctx
+REPLY_RESERVE = 1024    # tokens kept free for the answer
+MESSAGE_OVERHEAD = 4    # ChatML tags around every message
+
+WORD = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    # No tokenizer round trip: ~4 chars per token, words+punctuation as a floor
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = str(text)
+    return max(len(text) // 4, int(len(WORD.findall(text)) * 0.75))
+
+
+def estimate_message(message):
+    return estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD
+
+
+def default_message(role, content):
+    return {"role": role, "content": content}
+
+
+def ollama_summarizer(previous_summary, messages, profile_options=True):
+    from model_profiles import get_profiles
+    from ollama_backend import get_backend
+    from scheduler import BACKGROUND
+    transcript = "\n".join(f"{m['role']}: {m.get('content', '')}" for m in messages)
+    prompt = (
+        "Update the running summary of this conversation. Keep names, facts, decisions "
+        "and open questions, drop small talk. Answer with the summary only.\n\n"
+        f"Current summary:\n{previous_summary or '(empty)'}\n\nNew messages:\n{transcript}"
+    )
+    # Same model and options as the chat itself, so summarizing never reloads the model.
+    # profile_options=False for front ends whose chat runs on the Modelfile defaults (start.py).
+    profile = get_profiles().active()
+    options = profile.options() if profile_options else None
+    response = get_backend().chat([{"role": "user", "content": prompt}], model=profile.model,
+                                  options=options, priority=BACKGROUND)
+    return response["message"]["content"].strip()
+
+
+class ContextManager:
+    def __init__(self, num_ctx=NUM_CTX, reserve=REPLY_RESERVE, pinned=None, pin_first=0,
+                 summarizer=ollama_summarizer, message_factory=default_message, retriever=None):
+        self.num_ctx = num_ctx
+        self.reserve = reserve
+        self.budget = num_ctx - reserve
+        self.pinned = list(pinned or [])   # always sent, e.g. a system prompt
+        self.pin_first = pin_first         # also keep the first N history messages
+        self.summarizer = summarizer       # None disables summarization
+        self.message_factory = message_factory
+        self.retriever = retriever         # retriever(query) -> [snippet], e.g. MemoryIndex.snippets
+
+        self.summary = ""
+        self.summarized_upto = pin_first   # history[:summarized_upto] is in the summary
+        self.last_window_start = 0
+        self._generation = 0               # bumped on reset so stale summaries are dropped
+        self._lock = threading.Lock()
+        self._summary_thread = None
+
+    def options(self):
+        return {"num_ctx": self.num_ctx}
+
+    def set_num_ctx(self, num_ctx):
+        # Model profile switch: the next build() fills the new window
+        self.num_ctx = num_ctx
+        self.budget = num_ctx - self.reserve
+
+    def summary_message(self):
+        with self._lock:
+            summary = self.summary
+        if not summary:
+            return None
+        return self.message_factory("user", f"(Summary of our earlier conversation: {summary})")
+
+    def memory_message(self, query):
+        if self.retriever is None or not query:
+            return None
+        try:
+            snippets = self.retriever(query)
+        except Exception as e:
+            print(f"Memory lookup error: {e}")
+            return None
+        if not snippets:
+            return None
+        return self.message_factory("user", "(Things you remember that may be relevant:\n- "
+                                    + "\n- ".join(snippets) + ")")
+
+    def build(self, messages, pending="", speculative=False):
+        # Returns the messages to actually send for this turn.
+        # `pending` is a prompt the caller is about to add itself (counted, not returned).
+        # A speculative build (the prompt may never be sent) changes no state and
+        # starts no summary.
+        head = self.pinned + list(messages[:self.pin_first])
+        used = sum(estimate_message(m) for m in head) + estimate_tokens(pending)
+
+        summary = self.summary_message()
+        if summary:
+            used += estimate_message(summary)
+
+        # Memory is looked up for the newest prompt only
+        query = pending
+        if not query and messages and messages[-1].get("role") == "user":
+            query = messages[-1].get("content")
+        memory = self.memory_message(query)
+        if memory:
+            used += estimate_message(memory)
+
+        # Walk back from the newest message until the budget is spent.
+        # The newest message always goes, even if it alone is over budget.
+        start = len(messages)
+        while start > self.pin_first:
+            cost = estimate_message(messages[start - 1])
+            if used + cost > self.budget and start < len(messages):
+                break
+            used += cost
+            start -= 1
+
+        # Don't open the window on a dangling assistant reply
+        if start < len(messages) - 1 and messages[start].get("role") == "assistant":
+            start += 1
+
+        if not speculative:
+            self.last_window_start = start
+            self.schedule_summary(messages, start)
+
+        extra = [m for m in (summary, memory) if m]
+        window = head + extra + list(messages[start:])
+        return window
+
+    def schedule_summary(self, messages, evicted_end):
+        if self.summarizer is None or evicted_end <= self.summarized_upto:
+            return
+        if self._summary_thread is not None and self._summary_thread.is_alive():
+            return  # picked up again on the next turn
+        evicted = list(messages[self.summarized_upto:evicted_end])
+        self._summary_thread = threading.Thread(
+            target=self._summarize, args=(evicted, evicted_end, self._generation), daemon=True
+        )
+        self._summary_thread.start()
+
+    def _summarize(self, evicted, evicted_end, generation):
+        try:
+            summary = self.summarizer(self.summary, evicted)
+        except Exception as e:
+            print(f"Summary error: {e}")
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.summary = summary
+            self.summarized_upto = evicted_end
+
+    def history_prepended(self, count):
+        # Older messages were loaded in front of the history: shift our indexes.
+        # They count as already summarized - they predate this session.
+        with self._lock:
+            self.summarized_upto += count
+            self.last_window_start += count
+
+    def reset(self):
+        with self._lock:
+            self._generation += 1
+            self.summary = ""
+            self.summarized_upto = self.pin_first
+            self.last_window_start = 0
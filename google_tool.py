@@ -1,21 +1,27 @@
 from googlesearch import search
+from search_cache import get_cache
 import sys
 
-def get_results(query):
+def fetch_results(query, num_results=3):
+    # advanced=True gets the title and description automatically
+    results = list(search(query, num_results=num_results, advanced=True))
+    return [{"title": r.title, "url": r.url, "summary": r.description} for r in results]
+
+def get_results(query, num_results=3):
     print(f"\n🔎 System: Googling '{query}'...")
     output = ""
     try:
-        # advanced=True gets the title and description automatically
-        results = list(search(query, num_results=3, advanced=True))
+        # Repeated queries come from the on-disk cache (see search_cache.py)
+        results = get_cache().get_or_fetch("google", query, num_results, fetch_results)
         
         if not results:
             return "System: No results found."
 
         for i, r in enumerate(results, 1):
             output += f"\n--- RESULT {i} ---\n"
-            output += f"Title: {r.title}\n"
-            output += f"Link:  {r.url}\n"
-            output += f"Summary: {r.description}\n"
+            output += f"Title: {r['title']}\n"
+            output += f"Link:  {r['url']}\n"
+            output += f"Summary: {r['summary']}\n"
             
     except Exception as e:
         return f"System: Search failed. Error: {e}"
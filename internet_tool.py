@@ -1,20 +1,26 @@
 from duckduckgo_search import DDGS
+from search_cache import get_cache
 
-def search(query):
+def fetch_results(query, num_results=3):
+    #Get results (wt-wt = no region, safe search off)
+    results = DDGS().text(keywords=query, region='wt-wt', max_results=num_results) or []
+    return [{"title": r.get('title'), "url": r.get('href'), "summary": r.get('body')} for r in results]
+
+def search(query, num_results=3):
     print(f"\n🔎 System: Searching DuckDuckGo for '{query}'...")
     output = ""
     try:
-        #Get results (wt-wt = no region, safe search off)
-        results = DDGS().text(keywords=query, region='wt-wt', max_results=3)
+        # Repeated queries come from the on-disk cache (see search_cache.py)
+        results = get_cache().get_or_fetch("duckduckgo", query, num_results, fetch_results)
         
         if not results:
             return "System: No results found."
 
         for i, r in enumerate(results, 1):
             output += f"\n--- RESULT {i} ---\n"
-            output += f"Title: {r.get('title')}\n"
-            output += f"Link:  {r.get('href')}\n"
-            output += f"Summary: {r.get('body')}\n"
+            output += f"Title: {r['title']}\n"
+            output += f"Link:  {r['url']}\n"
+            output += f"Summary: {r['summary']}\n"
             
     except Exception as e:
         return f"System: Search failed. Error: {e}"
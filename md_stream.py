@@ -0,0 +1,113 @@
+"""
+Incremental markdown for streamed replies.
+Splits the incoming text into finished blocks (paragraphs, fenced code, lists,
+headings) so each block is rendered exactly once. Only the open tail block is
+re-rendered on every chunk, which keeps the per-chunk cost flat.
+"""
+
+import re
+
+LIST_ITEM = re.compile(r"^\s*([-*+]|\d+[.)])\s")
+FENCE = re.compile(r"^\s*(`{3,}|~{3,})")
+HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+
+
+class MarkdownStream:
+    def __init__(self):
+        self.partial_line = ""
+        self.open_lines = []
+        self.kind = None          # 'para', 'list', 'fence' or None
+        self.fence = ""
+        self.pending_blank = False
+
+    def feed(self, text):
+        # Returns the list of blocks that were completed by this chunk
+        done = []
+        lines = (self.partial_line + text).split("\n")
+        self.partial_line = lines.pop()
+        for line in lines:
+            self._add_line(line, done)
+        return done
+
+    def close(self):
+        # End of stream: everything left over becomes a finished block
+        done = []
+        if self.partial_line:
+            self._add_line(self.partial_line, done)
+            self.partial_line = ""
+        self._commit(done)
+        return done
+
+    def tail(self):
+        # Source of the still-open block, closed off so it renders sensibly
+        lines = self.open_lines + ([self.partial_line] if self.partial_line else [])
+        src = "\n".join(lines)
+        if self.kind == "fence" and src:
+            src += "\n" + self.fence
+        return src
+
+    def _commit(self, done):
+        if self.open_lines and any(l.strip() for l in self.open_lines):
+            done.append("\n".join(self.open_lines).rstrip("\n"))
+        self.open_lines = []
+        self.kind = None
+        self.pending_blank = False
+
+    def _start(self, kind, line):
+        self.kind = kind
+        self.open_lines = [line]
+        self.pending_blank = False
+
+    def _add_line(self, line, done):
+        stripped = line.strip()
+
+        # Inside a code fence nothing else matters until it closes
+        if self.kind == "fence":
+            self.open_lines.append(line)
+            if stripped.startswith(self.fence) and not stripped[len(self.fence):].strip():
+                self._commit(done)
+            return
+
+        fence = FENCE.match(line)
+        if fence:
+            self._commit(done)
+            self.fence = fence.group(1)
+            self._start("fence", line)
+            return
+
+        if not stripped:
+            # Lists survive blank lines (loose lists), everything else ends here
+            if self.kind == "list":
+                self.open_lines.append(line)
+                self.pending_blank = True
+            else:
+                self._commit(done)
+            return
+
+        if HEADING.match(line):
+            self._commit(done)
+            self._start("para", line)
+            self._commit(done)
+            return
+
+        if LIST_ITEM.match(line):
+            if self.kind != "list":
+                self._commit(done)
+                self._start("list", line)
+            else:
+                self.open_lines.append(line)
+                self.pending_blank = False
+            return
+
+        if self.kind == "list":
+            # Indented or lazy continuation stays in the list
+            if line[:1].isspace() or not self.pending_blank:
+                self.open_lines.append(line)
+                self.pending_blank = False
+                return
+            self._commit(done)
+
+        if self.kind == "para":
+            self.open_lines.append(line)
+        else:
+            self._start("para", line)
@@ -0,0 +1,260 @@
+"""
+Retrieval index over memory.md and archived conversations.
+BM25 over memory facts and past (user, assistant) turns, optionally fused with
+cosine similarity over embeddings from the local Ollama embedding endpoint.
+The index is updated incrementally: memory.md is re-read only when it changes,
+and only messages newer than the last indexed one are pulled from the store.
+Only the top-k snippets get injected into a turn, so prompts stay bounded.
+Reading the store and embedding run on a background thread; search() only ever
+touches the in-memory index, so it is safe to call from a UI thread. Turns of
+the conversation that is open right now are left out (they are in the window).
+"""
+
+import concurrent.futures
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+
+from chat_store import DB_PATH
+
+# --- CONFIG ---
+MEMORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory.md")
+TOP_K = 3
+MAX_SNIPPET_CHARS = 600
+EMBED_MODEL = os.environ.get("OMI_EMBED_MODEL", "")   # e.g. nomic-embed-text; empty = BM25 only
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+QUERY_CACHE_SIZE = 32       # embedded queries kept for the next search
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = {"the", "a", "an", "and", "or", "of", "to", "in", "on", "is", "are", "was", "it",
+             "i", "you", "me", "my", "for", "with", "that", "this", "be", "do", "what", "how"}
+
+# numpy is optional and only imported when embeddings are actually used
+np = None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            return False
+    return True
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class MemoryIndex:
+    def __init__(self, memory_path=MEMORY_PATH, db_path=DB_PATH, embed_model=EMBED_MODEL):
+        self.memory_path = memory_path
+        self.db_path = db_path
+        self.embed_model = embed_model
+
+        self.docs = []          # [source, text, length, session_id] per doc; text None = removed
+        self.postings = {}      # term -> {doc_id: tf}
+        self.total_length = 0
+        self.live_docs = 0
+        self.vectors = []       # embedding per doc (None if missing)
+
+        self.memory_mtime = None
+        self.memory_doc_ids = []
+        self.last_message_id = 0
+        self.pending_user = {}  # session_id -> last user message not yet paired
+        self.active_session = None      # StoredSession whose turns are not returned
+        self.query_vectors = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-index")
+        self._refresh_pending = False
+        self.refresh_async()
+
+    # --- Building ---
+    def add(self, source, text, session_id=None):
+        terms = Counter(tokenize(text))
+        doc_id = len(self.docs)
+        length = sum(terms.values())
+        self.docs.append([source, text, length, session_id])
+        self.vectors.append(None)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.total_length += length
+        self.live_docs += 1
+        return doc_id
+
+    def remove(self, doc_id):
+        source, text, length, session_id = self.docs[doc_id]
+        if text is None:
+            return
+        for term in set(tokenize(text)):
+            self.postings.get(term, {}).pop(doc_id, None)
+        self.docs[doc_id] = [source, None, 0, session_id]
+        self.vectors[doc_id] = None
+        self.total_length -= length
+        self.live_docs -= 1
+
+    def refresh_async(self):
+        # Pick up memory.md edits / new messages in the background, one refresh at a time
+        with self._lock:
+            if self._refresh_pending:
+                return
+            self._refresh_pending = True
+        self._executor.submit(self._refresh_job)
+
+    def _refresh_job(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Memory index: refresh failed ({e})")
+        finally:
+            with self._lock:
+                self._refresh_pending = False
+
+    def refresh(self):
+        # Disk reads and embedding calls happen outside the lock, searches never wait on them
+        facts = self.read_memory()
+        rows = self.read_conversations()
+        with self._lock:
+            if facts is not None:
+                for doc_id in self.memory_doc_ids:
+                    self.remove(doc_id)
+                self.memory_doc_ids = [self.add("memory", fact) for fact in facts]
+            self.index_conversations(rows)
+        if self.embed_model and not load_numpy():
+            print("Memory index: numpy is not installed, using BM25 only")
+            self.embed_model = ""
+        if self.embed_model:
+            self.embed_missing()
+
+    def read_memory(self):
+        # -> facts, or None when memory.md is missing / unchanged
+        try:
+            mtime = os.path.getmtime(self.memory_path)
+        except OSError:
+            return None
+        if mtime == self.memory_mtime:
+            return None
+        self.memory_mtime = mtime
+        with open(self.memory_path, "r", encoding="utf-8") as f:
+            # One fact per line
+            return [line.strip(" -*\t") for line in f if line.strip(" -*\t\n")]
+
+    def read_conversations(self):
+        if not os.path.exists(self.db_path):
+            return []
+        try:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            rows = conn.execute(
+                "SELECT id, session_id, role, content FROM messages WHERE id > ? ORDER BY id",
+                (self.last_message_id,),
+            ).fetchall()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"Memory index: could not read chat store ({e})")
+            return []
+        if rows:
+            self.last_message_id = rows[-1][0]
+        return rows
+
+    def index_conversations(self, rows):
+        for _, session_id, role, content in rows:
+            if role == "user":
+                self.pending_user[session_id] = content
+            elif session_id in self.pending_user:
+                question = self.pending_user.pop(session_id)
+                self.add("chat", f"User: {question}\nOMI: {content}"[:MAX_SNIPPET_CHARS * 2], session_id)
+
+    def embed_texts(self, texts):
+        from ollama_backend import get_backend
+        vectors = []
+        for vector in get_backend().embed(texts, self.embed_model):
+            v = np.asarray(vector, dtype=np.float32)
+            vectors.append(v / (np.linalg.norm(v) or 1.0))
+        return vectors
+
+    def embed_missing(self):
+        with self._lock:
+            missing = [i for i, doc in enumerate(self.docs) if doc[1] is not None and self.vectors[i] is None]
+            texts = {i: self.docs[i][1] for i in missing}
+        for start in range(0, len(missing), 32):
+            batch = missing[start:start + 32]
+            try:
+                vectors = self.embed_texts([texts[i] for i in batch])
+            except Exception as e:
+                print(f"Memory index: embeddings unavailable ({e}), using BM25 only")
+                self.embed_model = ""
+                return
+            with self._lock:
+                for i, vector in zip(batch, vectors):
+                    if self.docs[i][1] is not None:
+                        self.vectors[i] = vector
+
+    def embed_query(self, query):
+        try:
+            vector = self.embed_texts([query])[0]
+        except Exception as e:
+            print(f"Memory index: embedding search failed ({e})")
+            return
+        with self._lock:
+            self.query_vectors[query] = vector
+            while len(self.query_vectors) > QUERY_CACHE_SIZE:
+                self.query_vectors.popitem(last=False)
+
+    # --- Searching ---
+    def bm25(self, query):
+        scores = Counter()
+        if not self.live_docs:
+            return scores
+        avg_length = self.total_length / self.live_docs
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (self.live_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                length = self.docs[doc_id][2]
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / norm
+        return scores
+
+    def cosine(self, q):
+        ids = [i for i, v in enumerate(self.vectors) if v is not None]
+        if not ids:
+            return Counter()
+        sims = np.stack([self.vectors[i] for i in ids]) @ q
+        return Counter({ids[j]: float(sims[j]) for j in np.argsort(-sims)[:TOP_K * 4]})
+
+    def search(self, query, k=TOP_K):
+        # -> [(source, text)] best first. Never blocks on disk or HTTP: the query is
+        # embedded in the background and fused in from the next search on (the
+        # speculative builds while typing usually get it there before Enter).
+        self.refresh_async()
+        with self._lock:
+            rankings = [self.bm25(query)]
+            if self.embed_model:
+                q = self.query_vectors.get(query)
+                if q is not None:
+                    self.query_vectors.move_to_end(query)
+                    rankings.append(self.cosine(q))
+                else:
+                    self._executor.submit(self.embed_query, query)
+            # The open conversation is already in the window
+            active = self.active_session.id if self.active_session is not None else None
+            # Reciprocal rank fusion (a no-op reorder when there is only BM25)
+            fused = Counter()
+            for scores in rankings:
+                ranked = [d for d, _ in scores.most_common() if active is None or self.docs[d][3] != active]
+                for rank, doc_id in enumerate(ranked[:k * 4]):
+                    fused[doc_id] += 1.0 / (RRF_K + rank + 1)
+            return [(self.docs[i][0], self.docs[i][1][:MAX_SNIPPET_CHARS]) for i, _ in fused.most_common(k)]
+
+    def snippets(self, query, k=TOP_K):
+        # Retriever for ContextManager: plain strings
+        return [text for _, text in self.search(query, k)]
@@ -0,0 +1,116 @@
+"""
+Append-only message store for one conversation.
+Each message is a small __slots__ record (role + arena indexes); the text itself
+is kept exactly once, in the store's arena. The context window, the transcript
+view, copy and export all read from here instead of keeping their own copies.
+Indexing returns {"role", "content"} dicts built on access, so the store can be
+passed wherever a list of chat messages is expected (ContextManager.build).
+"""
+
+import sys
+import time
+from collections.abc import Sequence
+
+
+class Message:
+    __slots__ = ("role", "content", "shown", "time")
+
+    def __init__(self, role, content, shown=-1):
+        self.role = sys.intern(role)    # a handful of distinct strings, shared
+        self.content = content          # arena index of what the model sees
+        self.shown = shown              # arena index of what the transcript shows, -1 = same
+        self.time = time.time()
+
+
+class MessageStore(Sequence):
+    def __init__(self):
+        self.records = []
+        self.arena = []     # message text, append-only
+
+    def _put(self, text):
+        self.arena.append(text)
+        return len(self.arena) - 1
+
+    # --- Writing ---
+    def append(self, role, content, shown=None):
+        # shown: transcript text when it differs from what the model sees
+        record = Message(role, self._put(content), -1 if shown is None else self._put(shown))
+        self.records.append(record)
+        return len(self.records) - 1
+
+    def prepend(self, messages):
+        # Older history paged in at the front: [(role, content)] in chat order
+        records = [Message(role, self._put(content)) for role, content in messages]
+        self.records[0:0] = records
+        return len(records)
+
+    def amend_last(self, content):
+        # A pending prompt gets its final text (e.g. search results around the query).
+        # The transcript keeps showing the original text.
+        record = self.records[-1]
+        if record.shown < 0:
+            record.shown = record.content
+        else:
+            self.arena[record.content] = ""     # superseded, free the text
+        record.content = self._put(content)
+
+    def clear(self):
+        self.records = []
+        self.arena = []
+
+    # --- Reading ---
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._as_dict(r) for r in self.records[index]]
+        return self._as_dict(self.records[index])
+
+    def _as_dict(self, record):
+        return {"role": record.role, "content": self.arena[record.content]}
+
+    def role(self, index):
+        return self.records[index].role
+
+    def content(self, index):
+        return self.arena[self.records[index].content]
+
+    def shown(self, index):
+        record = self.records[index]
+        return self.arena[record.shown if record.shown >= 0 else record.content]
+
+    def plus(self, role, content):
+        # The history with one more message, without adding it (speculative builds)
+        return _Extended(self, {"role": role, "content": content})
+
+    def items(self):
+        # (role, transcript text, time) per message. The record list is copied now
+        # (pointers only), so another thread can walk it while the UI keeps adding.
+        records, arena = list(self.records), self.arena
+        return ((r.role, arena[r.shown if r.shown >= 0 else r.content], r.time) for r in records)
+
+    def nbytes(self):
+        # Rough footprint: records, index lists and text (shared role strings not counted)
+        size = sys.getsizeof(self.records) + sys.getsizeof(self.arena)
+        size += sum(sys.getsizeof(r) for r in self.records)
+        size += sum(sys.getsizeof(text) for text in self.arena)
+        return size
+
+
+class _Extended(Sequence):
+    def __init__(self, store, extra):
+        self.store = store
+        self.extra = extra
+
+    def __len__(self):
+        return len(self.store) + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index == len(self.store):
+            return self.extra
+        return self.store[index]
@@ -0,0 +1,330 @@
+"""
+Model profiles: which Ollama model to talk to and with which options
+(num_ctx, num_thread, num_batch, sampling). Profiles live in
+~/.omi/profiles.json; the built-in "omi" profile mirrors the repo's Modelfile.
+Switching is done at runtime: front ends read the active profile per request
+and switch listeners are told, nothing restarts. A profile built on another
+GGUF (e.g. a different quantization) gets a generated Modelfile and
+`ollama create`. The auto-tuner benchmarks candidate num_thread / num_batch
+settings through the backend and keeps the fastest for this machine.
+
+    python model_profiles.py list
+    python model_profiles.py add omi-q8 --from ./Dolphin3.0-Llama3.1-8B.Q8_0.gguf --num-ctx 8192
+    python model_profiles.py create omi-q8
+    python model_profiles.py use omi-q8
+    python model_profiles.py tune omi --threads 4,6,8 --batch 256,512
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import threading
+import time
+
+from context_manager import NUM_CTX
+from modelfile import MODELFILE_PATH, load_modelfile, render_modelfile
+
+# --- CONFIG ---
+PROFILES_PATH = os.path.join(os.path.expanduser("~"), ".omi", "profiles.json")
+MODELFILE_DIR = os.path.join(os.path.expanduser("~"), ".omi", "modelfiles")
+DEFAULT_PROFILE = "omi"
+TUNE_PROMPT = "Explain in a few sentences how a package manager resolves dependencies."
+TUNE_TOKENS = 64            # num_predict per measured request
+TUNE_RUNS = 2               # measured requests per candidate, after one load / warmup request
+
+
+class Profile:
+    def __init__(self, name, model, base=None, parameters=None, tuned=None):
+        self.name = name
+        self.model = model                  # Ollama model tag requests go to
+        self.base = base                    # FROM for a generated Modelfile (GGUF path or model)
+        self.parameters = dict(parameters or {})
+        self.tuned = tuned                  # last auto-tune result, see AutoTuner
+
+    @property
+    def num_ctx(self):
+        return self.parameters.get("num_ctx", NUM_CTX)
+
+    def options(self):
+        # Per-request options: the same values the generated Modelfile bakes in,
+        # so API callers and `ollama run` get identical behaviour
+        return dict(self.parameters)
+
+    def modelfile(self, template_path=MODELFILE_PATH):
+        # Template and system prompt always come from the repo's Modelfile
+        spec = load_modelfile(template_path)
+        spec["from"] = self.base or spec["from"]
+        spec["parameters"] = dict(spec["parameters"], **self.parameters)
+        return render_modelfile(spec)
+
+    def as_dict(self):
+        return {"model": self.model, "base": self.base, "parameters": self.parameters, "tuned": self.tuned}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        return cls(name, data["model"], data.get("base"), data.get("parameters"), data.get("tuned"))
+
+    def describe(self):
+        params = " ".join(f"{k}={v}" for k, v in self.parameters.items() if k != "stop")
+        tuned = f" · tuned {self.tuned['tok_s']:.1f} tok/s" if self.tuned else ""
+        return f"{self.name}: {self.model} ({params}){tuned}"
+
+
+def default_profile():
+    # The model the repo's Modelfile builds (`ollama create OMI -f Modelfile`)
+    spec = load_modelfile()
+    return Profile(DEFAULT_PROFILE, "OMI", spec["from"], dict(spec["parameters"], num_ctx=NUM_CTX))
+
+
+class ProfileManager:
+    def __init__(self, path=PROFILES_PATH):
+        self.path = path
+        self.profiles = {}
+        self.active_name = DEFAULT_PROFILE
+        self.listeners = []
+        self._lock = threading.Lock()
+        self.load()
+
+    # --- Storage ---
+    def load(self):
+        data = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self.profiles = {name: Profile.from_dict(name, p) for name, p in data.get("profiles", {}).items()}
+        self.profiles.setdefault(DEFAULT_PROFILE, default_profile())
+        self.active_name = data.get("active", DEFAULT_PROFILE)
+        if self.active_name not in self.profiles:
+            self.active_name = DEFAULT_PROFILE
+
+    def save(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        data = {"active": self.active_name, "profiles": {n: p.as_dict() for n, p in self.profiles.items()}}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.path)
+
+    # --- Profiles ---
+    def names(self):
+        return list(self.profiles)
+
+    def get(self, name):
+        if name not in self.profiles:
+            raise KeyError(f"no profile named '{name}' (have: {', '.join(self.profiles)})")
+        return self.profiles[name]
+
+    def active(self):
+        with self._lock:
+            return self.profiles[self.active_name]
+
+    def add(self, profile):
+        with self._lock:
+            self.profiles[profile.name] = profile
+            self.save()
+        if profile.name == self.active_name:
+            self._notify(profile)
+        return profile
+
+    def remove(self, name):
+        if name == DEFAULT_PROFILE:
+            raise ValueError("the default profile cannot be removed")
+        with self._lock:
+            self.profiles.pop(name, None)
+            if self.active_name == name:
+                self.active_name = DEFAULT_PROFILE
+            self.save()
+
+    def switch(self, name):
+        profile = self.get(name)
+        with self._lock:
+            self.active_name = name
+            self.save()
+        self._notify(profile)
+        return profile
+
+    def on_switch(self, callback):
+        # callback(profile) whenever the active profile (or its options) changes.
+        # Called on the switching thread - Qt code should bounce it through a signal.
+        self.listeners.append(callback)
+
+    def _notify(self, profile):
+        for callback in list(self.listeners):
+            try:
+                callback(profile)
+            except Exception as e:
+                print(f"Profile listener error: {e}")
+
+    # --- Ollama side ---
+    def write_modelfile(self, name):
+        profile = self.get(name)
+        os.makedirs(MODELFILE_DIR, exist_ok=True)
+        path = os.path.join(MODELFILE_DIR, f"{name}.Modelfile")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profile.modelfile())
+        return path
+
+    def create(self, name):
+        # `ollama create` reads the GGUF from disk and uploads it, which the HTTP API
+        # cannot do for a local path - so this needs the ollama CLI next to the server
+        path = self.write_modelfile(name)
+        if shutil.which("ollama") is None:
+            raise RuntimeError(f"ollama CLI not found; run: ollama create {self.get(name).model} -f {path}")
+        subprocess.run(["ollama", "create", self.get(name).model, "-f", path], check=True)
+        return path
+
+    def tune(self, name, threads=None, batches=None, backend=None, on_result=None):
+        # Benchmarks the candidates and stores the fastest settings in the profile
+        profile = self.get(name)
+        tuner = AutoTuner(profile, backend)
+        best, results = tuner.run(tuner.candidates(threads, batches), on_result)
+        if best is None:
+            raise RuntimeError("no candidate setting produced a measurement")
+        profile.parameters.update(best["options"])
+        profile.tuned = {"tok_s": best["tok_s"], "when": time.time(), "results": results}
+        return self.add(profile), best
+
+
+class AutoTuner:
+    def __init__(self, profile, backend=None, runs=TUNE_RUNS, tokens=TUNE_TOKENS, prompt=TUNE_PROMPT):
+        if backend is None:
+            from ollama_backend import get_backend
+            backend = get_backend()
+        self.profile = profile
+        self.backend = backend
+        self.runs = max(1, runs)
+        self.tokens = tokens
+        self.prompt = prompt
+
+    def candidates(self, threads=None, batches=None):
+        # Grid of option overrides. Default threads: half the logical CPUs (≈ physical
+        # cores) and all of them; default batches: around Ollama's default of 512.
+        cpus = os.cpu_count() or 4
+        threads = threads or sorted({max(1, cpus // 2), cpus})
+        batches = batches or [256, 512]
+        return [{"num_thread": t, "num_batch": b} for t in threads for b in batches]
+
+    def request(self, options):
+        from ollama_backend import ChatRequest
+        from scheduler import TOOL
+        # Always a live request: a response cache hit would measure nothing
+        options = dict(self.profile.options(), **options, num_predict=self.tokens)
+        request = ChatRequest([{"role": "user", "content": self.prompt}], model=self.profile.model,
+                              options=options, source="autotune", priority=TOOL, use_cache=False)
+        self.backend.run(request)
+        return request.metrics
+
+    def measure(self, options):
+        # First request loads the model with these options (timed, not scored)
+        load = self.request(options)
+        if load.error:
+            return {"options": options, "error": load.error}
+        rates, prompt_rates = [], []
+        for _ in range(self.runs):
+            metrics = self.request(options)
+            if metrics.error or metrics.cached or metrics.decode_rate is None:
+                continue
+            rates.append(metrics.decode_rate)
+            if metrics.prompt_rate:
+                prompt_rates.append(metrics.prompt_rate)
+        if not rates:
+            return {"options": options, "error": "no measurement"}
+        return {
+            "options": options,
+            "tok_s": statistics.median(rates),
+            "prompt_tok_s": statistics.median(prompt_rates) if prompt_rates else None,
+            "load_s": load.wall,
+        }
+
+    def run(self, candidates, on_result=None):
+        # -> (best result or None, all results). Best = highest decode tokens/s.
+        results = []
+        for options in candidates:
+            result = self.measure(options)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        scored = [r for r in results if "tok_s" in r]
+        best = max(scored, key=lambda r: r["tok_s"]) if scored else None
+        return best, results
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_profiles():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ProfileManager()
+        return _manager
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Manage OMI model profiles")
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    for command in ("show", "use", "create", "remove", "modelfile"):
+        sub.add_parser(command).add_argument("name")
+    add = sub.add_parser("add")
+    add.add_argument("name")
+    add.add_argument("--model", help="Ollama model tag (default: OMI-<name>)")
+    add.add_argument("--from", dest="base", help="GGUF path or base model for the generated Modelfile")
+    add.add_argument("--num-ctx", type=int)
+    add.add_argument("--num-thread", type=int)
+    add.add_argument("--num-batch", type=int)
+    add.add_argument("--temperature", type=float)
+    tune = sub.add_parser("tune")
+    tune.add_argument("name")
+    tune.add_argument("--threads", type=_int_list, help="comma separated num_thread candidates")
+    tune.add_argument("--batch", type=_int_list, help="comma separated num_batch candidates")
+    args = p.parse_args()
+
+    manager = get_profiles()
+    if args.command == "list":
+        for name in manager.names():
+            marker = "*" if name == manager.active_name else " "
+            print(f"{marker} {manager.get(name).describe()}")
+    elif args.command == "show":
+        print(json.dumps(manager.get(args.name).as_dict(), indent=2))
+    elif args.command == "modelfile":
+        print(manager.get(args.name).modelfile(), end="")
+    elif args.command == "use":
+        print(f"Active: {manager.switch(args.name).describe()}")
+    elif args.command == "remove":
+        manager.remove(args.name)
+    elif args.command == "create":
+        print(f"Created {manager.get(args.name).model} from {manager.create(args.name)}")
+    elif args.command == "add":
+        # New profiles start from the default one's parameters
+        parameters = dict(manager.get(DEFAULT_PROFILE).parameters)
+        for key in ("num_ctx", "num_thread", "num_batch", "temperature"):
+            if getattr(args, key) is not None:
+                parameters[key] = getattr(args, key)
+        profile = Profile(args.name, args.model or f"OMI-{args.name}", args.base, parameters)
+        print(manager.add(profile).describe())
+    elif args.command == "tune":
+        def show(result):
+            options = " ".join(f"{k}={v}" for k, v in result["options"].items())
+            if "tok_s" in result:
+                print(f"  {options:<30} {result['tok_s']:.1f} tok/s (load {result['load_s']:.1f}s)")
+            else:
+                print(f"  {options:<30} failed: {result['error']}")
+        profile, best = manager.tune(args.name, args.threads, args.batch, on_result=show)
+        print(f"Best: {best['tok_s']:.1f} tok/s -> {profile.describe()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Minimal Modelfile reader / writer.
+Pulls FROM, TEMPLATE, SYSTEM and PARAMETER lines out of an Ollama Modelfile so
+code that talks to the model directly (e.g. the API server) can reuse the same
+system prompt and defaults instead of keeping a copy. render_modelfile() goes
+the other way, for generated model profiles (see model_profiles.py).
+"""
+
+import os
+
+# --- CONFIG ---
+MODELFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Modelfile")
+
+
+def _value(text):
+    # A number if it looks like one, otherwise the string without quotes
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        return text[1:-1]
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_modelfile(text):
+    # -> {"from": str, "template": str, "system": str, "parameters": {name: value or [values]}}
+    result = {"from": None, "template": None, "system": None, "parameters": {}}
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        i += 1
+        if not line or line.startswith("#"):
+            continue
+        command, _, rest = line.partition(" ")
+        command = command.upper()
+        rest = rest.strip()
+        # Triple-quoted values can span lines
+        if rest.startswith('"""'):
+            body = rest[3:]
+            while '"""' not in body and i < len(lines):
+                body += "\n" + lines[i]
+                i += 1
+            rest = body.split('"""', 1)[0]
+        if command == "FROM":
+            result["from"] = rest
+        elif command == "TEMPLATE":
+            result["template"] = rest
+        elif command == "SYSTEM":
+            result["system"] = rest.strip()
+        elif command == "PARAMETER":
+            name, _, value = rest.partition(" ")
+            value = _value(value)
+            params = result["parameters"]
+            # Repeatable parameters (stop) collect into a list
+            if name in params:
+                params[name] = (params[name] if isinstance(params[name], list) else [params[name]]) + [value]
+            else:
+                params[name] = value
+    return result
+
+
+def _render_value(value):
+    if isinstance(value, str) and (not value or any(c.isspace() or c in '"<>|' for c in value)):
+        return '"' + value.replace('"', '\\"') + '"'
+    return str(value)
+
+
+def render_modelfile(spec):
+    # Inverse of parse_modelfile: {"from", "template", "system", "parameters"} -> Modelfile text
+    lines = [f"FROM {spec['from']}", ""]
+    if spec.get("template"):
+        lines += [f'TEMPLATE """{spec["template"]}"""', ""]
+    for name, value in spec.get("parameters", {}).items():
+        for item in value if isinstance(value, list) else [value]:
+            lines.append(f"PARAMETER {name} {_render_value(item)}")
+    if spec.get("system"):
+        lines += ["", f'SYSTEM """\n{spec["system"]}\n"""']
+    return "\n".join(lines) + "\n"
+
+
+def load_modelfile(path=MODELFILE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return parse_modelfile(f.read())
+    except OSError:
+        return parse_modelfile("")
+
+
+def system_prompt(path=MODELFILE_PATH):
+    return load_modelfile(path)["system"] or ""
@@ -0,0 +1,373 @@
+"""
+Long-lived Ollama backend.
+One pooled HTTP client for the whole process, a worker thread with a request
+queue, and cancellation that closes the HTTP stream immediately (Ollama stops
+generating as soon as the connection drops).
+Every generation waits for a slot in the process-wide scheduler (scheduler.py),
+so background work yields to whatever the user is waiting for.
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+import httpx
+
+from request_metrics import RequestMetrics, get_metrics_log
+from response_cache import get_response_cache
+from scheduler import BACKGROUND, INTERACTIVE, Preempted, get_scheduler
+
+# --- CONFIG ---
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+if not OLLAMA_HOST.startswith("http"):
+    OLLAMA_HOST = "http://" + OLLAMA_HOST
+DEFAULT_MODEL = "OMI"
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 600.0    # prompt eval of a long context can be slow on CPU
+KEEP_ALIVE = os.environ.get("OMI_KEEP_ALIVE", "30m")   # how long Ollama keeps the model loaded
+KEEP_ALIVE_PING = 240   # seconds between keep-alive pings
+
+
+class Cancelled(Exception):
+    pass
+
+
+class ChatRequest:
+    _ids = itertools.count(1)
+
+    def __init__(self, messages, on_chunk=None, on_done=None, model=DEFAULT_MODEL, options=None,
+                 keep_alive=None, source="", priority=INTERACTIVE, session=None, on_wait=None,
+                 use_cache=True, record_metrics=True):
+        self.id = next(self._ids)
+        self.messages = messages
+        self.model = model
+        self.options = options
+        self.keep_alive = keep_alive
+        self.priority = priority    # scheduler class, see scheduler.py
+        self.session = session      # fairness key between users
+        self.on_wait = on_wait      # on_wait(position) while queued behind other jobs
+        self.use_cache = use_cache  # False for internal requests (warmup, prefill, tuning)
+        self.record_metrics = record_metrics    # False keeps it out of the metrics log
+        self.on_chunk = on_chunk    # on_chunk(text), called on the worker thread
+        self.on_done = on_done      # on_done(request, final_chunk, error)
+        self.cancelled = False
+        self.metrics = RequestMetrics(model, source, messages)   # clock starts at submit, queue wait included
+        self._response = None
+        self._lock = threading.Lock()
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+            cancelled = self.cancelled
+        if cancelled:
+            response.close()
+            raise Cancelled()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            response = self._response
+        if response is not None:
+            # Unblocks the reader thread right away, no waiting for the next token
+            try:
+                response.close()
+            except Exception:
+                pass
+
+
+class OllamaBackend:
+    def __init__(self, host=OLLAMA_HOST, model=DEFAULT_MODEL):
+        self.host = host
+        self.model = model
+        self.client = httpx.Client(
+            base_url=host,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+        )
+
+    def payload(self, messages, model, options, keep_alive, stream):
+        data = {"model": model or self.model, "messages": messages, "stream": stream}
+        if options:
+            data["options"] = options
+        if keep_alive is not None:
+            data["keep_alive"] = keep_alive
+        return data
+
+    def stream_chat(self, messages, model=None, options=None, keep_alive=None, request=None,
+                    priority=INTERACTIVE, session=None, on_wait=None, use_cache=True):
+        # Yields the raw NDJSON chunks from /api/chat. The last one has done=True and the stats.
+        # Deterministic requests may be replayed from the response cache (response_cache.py);
+        # internal requests that exist for their side effect on the server pass use_cache=False.
+        model = model or self.model
+        if not use_cache:
+            yield from self._stream_live(messages, model, options, keep_alive, request, priority, session, on_wait)
+            return
+        cache = get_response_cache()
+        key, entry = cache.lookup(model, messages, options)
+        if entry is not None:
+            for chunk in cache.replay(entry, model):
+                if request is not None and request.cancelled:
+                    raise Cancelled()
+                yield chunk
+            return
+
+        parts = []
+        for chunk in self._stream_live(messages, model, options, keep_alive, request, priority, session, on_wait):
+            if key is not None:
+                parts.append(chunk.get("message", {}).get("content", ""))
+                if chunk.get("done"):
+                    cache.store(key, "".join(parts), chunk)
+            yield chunk
+
+    def _stream_live(self, messages, model, options, keep_alive, request, priority, session, on_wait):
+        # The real request: waits for a scheduler slot first; a preempted stream raises Preempted.
+        data = self.payload(messages, model, options, keep_alive, True)
+        held = {}
+        with get_scheduler().slot(session, priority, "chat", on_wait,
+                                  on_preempt=lambda: self._close(held)) as ticket:
+            if request is not None:
+                request.metrics.queue_s = ticket.queue_wait
+            try:
+                with self.client.stream("POST", "/api/chat", json=data) as response:
+                    held["response"] = response
+                    if ticket.preempted:
+                        raise Preempted()
+                    if request is not None:
+                        request.attach(response)
+                    if response.status_code != 200:
+                        response.read()
+                        raise RuntimeError(self.error_text(response))
+                    for line in response.iter_lines():
+                        if request is not None and request.cancelled:
+                            raise Cancelled()
+                        if ticket.preempted:
+                            raise Preempted()
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if "error" in chunk:
+                            raise RuntimeError(chunk["error"])
+                        yield chunk
+            except Exception:
+                if ticket.preempted:
+                    raise Preempted()
+                raise
+
+    def chat(self, messages, model=None, options=None, keep_alive=None, priority=INTERACTIVE, session=None,
+             use_cache=True):
+        # Non-streaming call, returns the final response dict (same shape as stream=false).
+        # Streams under the hood so a preempted job stops at the next token; it then
+        # queues again and starts over.
+        while True:
+            parts = []
+            final = {}
+            try:
+                for chunk in self.stream_chat(messages, model, options, keep_alive,
+                                              priority=priority, session=session, use_cache=use_cache):
+                    parts.append(chunk.get("message", {}).get("content", ""))
+                    if chunk.get("done"):
+                        final = chunk
+            except Preempted:
+                continue
+            final["message"] = {"role": "assistant", "content": "".join(parts)}
+            return final
+
+    def _close(self, held):
+        # Preemption: dropping the connection makes Ollama stop generating
+        response = held.get("response")
+        if response is not None:
+            response.close()
+
+    def embed(self, texts, model):
+        # /api/embed -> one vector per input text
+        response = self.client.post("/api/embed", json={"model": model, "input": texts})
+        if response.status_code != 200:
+            raise RuntimeError(self.error_text(response))
+        return response.json()["embeddings"]
+
+    def warmup(self, model=None, system=None, options=None, keep_alive=KEEP_ALIVE):
+        # Loads the model and runs the fixed prompt prefix (Modelfile SYSTEM or `system`)
+        # through prompt eval once, so the first real message starts on a hot KV cache.
+        # `options` must match what chat requests send, a different num_ctx means a reload.
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": "."})
+        warm_options = dict(options or {})
+        warm_options["num_predict"] = 1
+        return self.chat(messages, model, warm_options, keep_alive, priority=BACKGROUND, use_cache=False)
+
+    def ping(self, model=None, options=None, keep_alive=KEEP_ALIVE):
+        # An empty /api/generate only (re)loads the model and resets its unload timer
+        data = {"model": model or self.model, "keep_alive": keep_alive}
+        if options:
+            data["options"] = options
+        response = self.client.post("/api/generate", json=data)
+        if response.status_code != 200:
+            raise RuntimeError(self.error_text(response))
+
+    def error_text(self, response):
+        try:
+            return response.json().get("error", response.text)
+        except ValueError:
+            return f"HTTP {response.status_code}: {response.text}"
+
+    def stream_request(self, request):
+        # stream_chat() for a ChatRequest whose chunks the caller consumes itself
+        return self.stream_chat(request.messages, request.model, request.options, request.keep_alive,
+                                request, request.priority, request.session, request.on_wait, request.use_cache)
+
+    def run(self, request):
+        # Runs a ChatRequest to completion on the calling thread
+        final = None
+        error = None
+        try:
+            for chunk in self.stream_request(request):
+                content = chunk.get("message", {}).get("content", "")
+                request.metrics.chunk(content)
+                if content and request.on_chunk and not request.cancelled:
+                    request.on_chunk(content)
+                if chunk.get("done"):
+                    final = chunk
+        except Exception as e:
+            # A closed stream after cancel() is expected, not an error
+            if not request.cancelled:
+                error = e
+        request.metrics.finish(final, error, request.cancelled)
+        if request.record_metrics:
+            get_metrics_log().record(request.metrics)
+        if request.on_done:
+            request.on_done(request, final, error)
+        return final
+
+    def close(self):
+        self.client.close()
+
+
+class BackendWorker:
+    # One thread that runs queued ChatRequests in order against a shared backend
+    def __init__(self, backend):
+        self.backend = backend
+        self.current = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="ollama-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, request, preempt=False):
+        if preempt:
+            self.cancel_all()
+        self._queue.put(request)
+        return request
+
+    def cancel_current(self):
+        with self._lock:
+            current = self.current
+        if current is not None:
+            current.cancel()
+
+    def cancel_all(self):
+        # Drop everything queued, then stop whatever is running
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.cancel()
+                if request.on_done:
+                    request.on_done(request, None, None)
+        self.cancel_current()
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                break
+            if request.cancelled:
+                if request.on_done:
+                    request.on_done(request, None, None)
+                continue
+            with self._lock:
+                self.current = request
+            try:
+                self.backend.run(request)
+            finally:
+                with self._lock:
+                    self.current = None
+
+    def stop(self):
+        self.cancel_all()
+        self._queue.put(None)
+
+
+class KeepAlive:
+    # Warms the model up in the background, then pings it so it never gets unloaded
+    def __init__(self, backend, model=None, options=None, system=None, interval=KEEP_ALIVE_PING,
+                 on_warm=None):
+        self.backend = backend
+        self.model = model
+        self.options = options
+        self.system = system
+        self.interval = interval
+        self.on_warm = on_warm      # on_warm(ok, seconds), called on the keep-alive thread
+        self.warm = False
+        self.warmup_seconds = None
+        self._stopped = False
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ollama-keepalive", daemon=True)
+            self._thread.start()
+        return self
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        self.warm = False
+        try:
+            self.backend.warmup(self.model, self.system, self.options)
+            self.warm = True
+        except Exception as e:
+            print(f"Warmup failed: {e}")
+        self.warmup_seconds = time.perf_counter() - start
+        if self.on_warm:
+            self.on_warm(self.warm, self.warmup_seconds)
+
+    def _run(self):
+        # Warm up, then ping until stopped or pointed at another model / options
+        while not self._stopped:
+            self._wake.clear()
+            self._warm_up()
+            while not self._wake.wait(self.interval):
+                try:
+                    self.backend.ping(self.model, self.options)
+                    self.warm = True
+                except Exception:
+                    self.warm = False
+
+    def retarget(self, model, options=None):
+        # Profile switch: warm the new model / options up right away, then keep those loaded
+        self.model = model
+        self.options = options
+        self.warm = False
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    # Process-wide backend, so every caller shares the same connection pool
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = OllamaBackend()
+        return _backend
@@ -4,8 +4,23 @@ OMI AI Desktop App
 """
 
 import streamlit as st
-import ollama
 import time
+import tempfile
+import uuid
+from chat_export import FORMATS, write_conversation
+from md_stream import MarkdownStream
+from context_manager import ContextManager
+from memory_index import MemoryIndex
+from model_profiles import get_profiles
+from ollama_backend import ChatRequest, KeepAlive, KEEP_ALIVE, get_backend
+from request_metrics import get_metrics_log
+from stream_coalescer import ChunkCoalescer
+from scheduler import RateLimited, get_scheduler
+
+# --- RENDERING ---
+HISTORY_VISIBLE = 20        # messages rendered on each rerun, older ones sit behind a button
+HISTORY_PAGE = 20           # how many more each click reveals
+STREAM_INTERVAL_MS = 100    # placeholder updates while streaming (~10 per second)
 
 # --- CONFIGURATION & THEME ---
 st.set_page_config(
@@ -49,36 +64,97 @@ st.markdown("""
 st.title("OMI - Arch Linux Assistant")
 st.caption("Uncensored Local AI • Powered by Ollama")
 
+# --- MODEL WARMUP ---
+# Once per server process: load the model in the background and keep it loaded.
+# The model profile is process-wide too; a switch re-targets the keep-alive.
+@st.cache_resource
+def start_keep_alive():
+    profiles = get_profiles()
+    profile = profiles.active()
+    keep_alive = KeepAlive(get_backend(), profile.model, profile.options()).start()
+    profiles.on_switch(lambda p: keep_alive.retarget(p.model, p.options()))
+    return keep_alive
+
+keep_alive = start_keep_alive()
+
+# One retrieval index over memory.md + archived chats, shared by all sessions
+@st.cache_resource
+def memory_index():
+    return MemoryIndex()
+
+def show_metrics(slot, metrics):
+    slot.caption("**Last response**  \n" + metrics.details().replace("\n", "  \n"))
+
 # --- SESSION STATE (Memory) ---
 if "messages" not in st.session_state:
     st.session_state["messages"] = []
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+if "history_shown" not in st.session_state:
+    st.session_state["history_shown"] = HISTORY_VISIBLE
+if "context" not in st.session_state:
+    # Only a token-budgeted window of the history is sent to the model,
+    # plus the few memory facts relevant to the newest prompt
+    st.session_state["context"] = ContextManager(num_ctx=get_profiles().active().num_ctx,
+                                                 retriever=memory_index().snippets)
 
 # --- SIDEBAR TOOLS ---
 with st.sidebar:
     st.header("Tools")
+    st.caption("🟢 Model warm" if keep_alive.warm else "🟡 Model warming up...")
+    profiles = get_profiles()
+    chosen = st.selectbox("Model profile", profiles.names(), index=profiles.names().index(profiles.active().name))
+    if chosen != profiles.active().name:
+        profiles.switch(chosen)
+    # Every browser session shares this process' backend (one pooled client) and its
+    # scheduler: bounded concurrency, round robin between sessions (see scheduler.py)
+    queue = get_scheduler().stats()
+    if queue["queued"]:
+        st.caption(f"👥 {queue['running']} generating, {queue['queued']} waiting")
+    with st.expander("Scheduler"):
+        # Queue wait per priority class (interactive / tool / background)
+        st.json(get_scheduler().report(), expanded=False)
+    
+    # Generation metrics of the last request, updated live while streaming
+    metrics_slot = st.empty()
+    if "last_metrics" in st.session_state:
+        show_metrics(metrics_slot, st.session_state.last_metrics)
     
     # SAVE CONVERSATION
-    if st.button("💾 Save Chat to .txt"):
-        chat_text = ""
-        for msg in st.session_state.messages:
-            role = "User" if msg["role"] == "user" else "OMI"
-            chat_text += f"{role}: {msg['content']}\n\n"
-        
-        st.download_button(
-            label="Download Now",
-            data=chat_text,
-            file_name=f"omi_chat_{int(time.time())}.txt",
-            mime="text/plain"
-        )
+    # Written message by message to a temp file (chat_export.py); st.download_button still
+    # reads the finished file into memory to serve it, so this only saves the joining here
+    export_format = st.selectbox("Format", list(FORMATS), format_func=lambda f: f".{FORMATS[f].extension}")
+    if st.button("💾 Save Chat"):
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as out:
+            write_conversation(out, ((m["role"], m["content"], None) for m in st.session_state.messages),
+                               export_format, "OMI chat")
+            out.seek(0)
+            st.download_button(
+                label="Download Now",
+                data=out,
+                file_name=f"omi_chat_{int(time.time())}.{FORMATS[export_format].extension}",
+                mime=FORMATS[export_format].mime
+            )
     
     # CLEAR CHAT
     if st.button("🗑️ Clear History"):
         st.session_state["messages"] = []
+        st.session_state["history_shown"] = HISTORY_VISIBLE
+        st.session_state.context.reset()
         st.rerun()
 
 # --- DISPLAY CHAT HISTORY ---
-for msg in st.session_state.messages:
+# Only the newest messages are rendered on each rerun, so a long chat costs the
+# same per keystroke as a short one
+messages = st.session_state.messages
+hidden = max(0, len(messages) - st.session_state.history_shown)
+if hidden:
+    if st.button(f"⬆️ Show earlier messages ({hidden} hidden)"):
+        st.session_state["history_shown"] += HISTORY_PAGE
+        st.rerun()
+for msg in messages[hidden:]:
     with st.chat_message(msg["role"]):
+        # One element per finished message, the same one the live reply ends up as
         st.markdown(msg["content"])
 
 # --- CHAT INPUT & GENERATION ---
@@ -90,25 +166,71 @@ if prompt := st.chat_input("Type a message... (Cmd+V to paste)"):
 
     # 2. Generate AI Response
     with st.chat_message("assistant"):
+        # Finished markdown blocks go into the container once, only the open tail
+        # block is re-rendered in the placeholder. When the reply is done it is
+        # swapped for a single st.markdown, as history renders it on the next rerun.
+        response_slot = st.empty()
+        response_body = response_slot.container()
         message_placeholder = st.empty()
+        md_stream = MarkdownStream()
+        coalescer = ChunkCoalescer(STREAM_INTERVAL_MS)
         full_response = ""
+        final = None
+        metrics_shown_at = 0.0
         
-        # Stream from Ollama
-        try:
-            stream = ollama.chat(
-                model='OMI',  # Ensure you ran 'ollama create OMI' before!
-                messages=st.session_state.messages,
-                stream=True,
+        # Wait for a free slot (shows the queue position), then stream from Ollama
+        def show_position(ahead):
+            message_placeholder.markdown(
+                f"⏳ Waiting for the model... {ahead} request{'s' if ahead != 1 else ''} ahead of you"
+                if ahead else "⏳ Waiting for the model... you're next"
             )
-            
-            for chunk in stream:
+        
+        profile = get_profiles().active()
+        st.session_state.context.set_num_ctx(profile.num_ctx)
+        request = ChatRequest(
+            st.session_state.context.build(st.session_state.messages),
+            model=profile.model,  # Ensure you ran 'ollama create' for it before! (model_profiles.py create)
+            options=profile.options(),
+            keep_alive=KEEP_ALIVE,
+            source="streamlit",
+            session=st.session_state.session_id,
+            on_wait=show_position,
+        )
+        metrics = request.metrics
+        
+        try:
+            get_scheduler().check_rate(st.session_state.session_id)
+            for chunk in get_backend().stream_request(request):
                 content = chunk['message']['content']
+                metrics.chunk(content)
+                if chunk.get('done'):
+                    final = chunk
                 full_response += content
-                message_placeholder.markdown(full_response + "▌")
-                
-            message_placeholder.markdown(full_response)
+                # Tokens are batched, the page only updates every STREAM_INTERVAL_MS
+                coalescer.push(content)
+                if coalescer.delay_ms() > 0:
+                    continue
+                for block in md_stream.feed(coalescer.drain()):
+                    response_body.markdown(block)
+                message_placeholder.markdown(md_stream.tail() + "▌")
+                if time.perf_counter() - metrics_shown_at > 0.5:
+                    metrics_shown_at = time.perf_counter()
+                    show_metrics(metrics_slot, metrics)
+            
+            response_slot.markdown(full_response)
+            message_placeholder.empty()
+            metrics.finish(final)
+        except RateLimited as e:
+            metrics.finish(error=e)
+            message_placeholder.empty()
+            st.warning(str(e))
         except Exception as e:
+            metrics.finish(error=e)
             st.error(f"Error: {e}. Is Ollama running?")
+        
+        get_metrics_log().record(metrics)
+        st.session_state["last_metrics"] = metrics
+        show_metrics(metrics_slot, metrics)
 
     # 3. Save AI Message to History
     st.session_state.messages.append({"role": "assistant", "content": full_response})
\ No newline at end of file
@@ -1,49 +1,35 @@
 import sys
-import os
-import time
-import markdown
-import ollama
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
-                             QHBoxLayout, QTextBrowser, QLineEdit, QPushButton, 
-                             QFileDialog, QProgressBar, QFrame, QLabel, QGraphicsOpacityEffect)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QTimer, QUrl, QPoint, QRect
-from PyQt6.QtGui import (QIcon, QFont, QColor, QPalette, QPainter, QLinearGradient, 
-                         QRadialGradient, QPen, QBrush, QTextCursor, QTextCharFormat, QDesktopServices)
-
-# --- CUSTOM BROWSER  (FIXED MOUSE HANDLING) ---
-class ChatBrowser(QTextBrowser):
-    copy_requested = pyqtSignal(int)
+from startup_profile import StartupProfiler
+profiler = StartupProfiler()  # --profile-startup; must come before the heavy imports
 
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setOpenExternalLinks(False) 
-
-    def mouseReleaseEvent(self, event):
-        # check if mouse clicked on an anchor (link)
-        url_str = self.anchorAt(event.pos())
-        
-        if url_str:
-            # IT IS A LINK
-            if url_str.startswith("copy:"):
-                # It's our copy button!
-                try:
-                    index = int(url_str.split(":")[1])
-                    self.copy_requested.emit(index)
-                except ValueError:
-                    pass
-                # RETURN HERE to prevent QTextBrowser from trying to navigate
-                return 
-            
-            else:
-                # It's a real website link
-                QDesktopServices.openUrl(QUrl(url_str))
-                # RETURN HERE to prevent internal navigation
-                return
-
-        # If it wasn't a link, do normal behavior (text selection, etc.)
-        super().mouseReleaseEvent(event)
+# Only what the first frame needs is imported here. markdown and the HTTP
+# backend (httpx) are loaded once the window is on screen, see finish_startup().
+with profiler.phase("imports"):
+    import time
+    import threading
+    import importlib
+    from stream_coalescer import ChunkCoalescer, FLUSH_INTERVAL_MS
+    from md_stream import MarkdownStream
+    from transcript_view import TranscriptView
+    from context_manager import ContextManager
+    from memory_index import MemoryIndex
+    from chat_store import ChatStore, PAGE_SIZE
+    from message_store import MessageStore
+    from model_profiles import get_profiles
+    from speculative import Speculator, DEBOUNCE_MS, SEARCH_PREFIX
+    from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
+                                 QHBoxLayout, QLineEdit, QPushButton, 
+                                 QFileDialog, QProgressBar, QFrame, QLabel, QComboBox)
+    from PyQt6.QtCore import Qt, QObject, QEvent, pyqtSignal, QTimer, QPoint
+    from PyQt6.QtGui import (QFont, QColor, QPainter, QLinearGradient, 
+                             QRadialGradient, QPen, QBrush, QPixmap, QTextCursor)
 
 # --- ARC REACTOR WIDGET ---
+# Animation speed follows the app state, and everything stops while hidden
+ACTIVE_INTERVAL_MS = 30    # ~33 FPS while generating
+IDLE_INTERVAL_MS = 120     # ~8 FPS otherwise
+FRAME_BUDGET_MS = 2.0      # paintEvent should stay well under this
+
 class ArcReactorWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -51,13 +37,54 @@ class ArcReactorWidget(QWidget):
         self.rotation_angle = 0
         self.pulse_scale = 1.0
         self.pulse_direction = 1
+        self.active = False
+        self.paused = False
+        
+        # Sprite cache: every layer is drawn once into a pixmap, paintEvent only blits
+        self.sprite_ratio = None
+        self.glow_sprite = None
+        self.outer_frames = []
+        self.middle_frames = []
+        self.core_sprites = {}
+        
+        # Frame budget stats
+        self.reset_frame_stats()
         
         # Animation timer
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_animation)
-        self.timer.start(30)  # ~33 FPS
+        self.timer.start(IDLE_INTERVAL_MS)
+    
+    # --- State ---
+    def set_active(self, active):
+        self.active = active
+        self.apply_timer_state()
+    
+    def set_paused(self, paused):
+        self.paused = paused
+        self.apply_timer_state()
+    
+    def apply_timer_state(self):
+        if self.paused or not self.isVisible():
+            self.timer.stop()
+        else:
+            self.timer.start(ACTIVE_INTERVAL_MS if self.active else IDLE_INTERVAL_MS)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.apply_timer_state()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
         
     def update_animation(self):
+        # Skip work entirely while the window is covered / off screen
+        handle = self.window().windowHandle()
+        if handle is not None and not handle.isExposed():
+            self.ticks_skipped += 1
+            return
+        
         self.rotation_angle = (self.rotation_angle + 2) % 360
         
         # Pulsing effect
@@ -67,14 +94,49 @@ class ArcReactorWidget(QWidget):
             
         self.update()
     
-    def paintEvent(self, event):
-        painter = QPainter(self)
+    # --- Frame budget ---
+    def reset_frame_stats(self):
+        self.frames_painted = 0
+        self.ticks_skipped = 0
+        self.paint_ms_total = 0.0
+        self.paint_ms_max = 0.0
+        self.frames_over_budget = 0
+        self.stats_wall_start = time.perf_counter()
+        self.stats_cpu_start = time.process_time()
+    
+    def frame_stats(self):
+        wall = time.perf_counter() - self.stats_wall_start
+        cpu = time.process_time() - self.stats_cpu_start
+        frames = max(1, self.frames_painted)
+        return {
+            "frames": self.frames_painted,
+            "ticks_skipped": self.ticks_skipped,
+            "avg_paint_ms": self.paint_ms_total / frames,
+            "max_paint_ms": self.paint_ms_max,
+            "over_budget": self.frames_over_budget,
+            "budget_ms": FRAME_BUDGET_MS,
+            "fps": self.frames_painted / wall if wall else 0.0,
+            # Whole process, so this includes chat rendering too
+            "process_cpu_percent": 100.0 * cpu / wall if wall else 0.0,
+        }
+    
+    # --- Sprites ---
+    def new_sprite(self):
+        ratio = self.sprite_ratio
+        pixmap = QPixmap(int(self.width() * ratio), int(self.height() * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
+        return pixmap, painter
+    
+    def build_sprites(self):
+        self.sprite_ratio = self.devicePixelRatioF()
         center_x = self.width() // 2
         center_y = self.height() // 2
         
-        # Outer glow
+        # Outer glow (static)
+        self.glow_sprite, painter = self.new_sprite()
         for i in range(5, 0, -1):
             glow_gradient = QRadialGradient(center_x, center_y, 80 + i * 8)
             glow_gradient.setColorAt(0, QColor(100, 255, 150, 30 - i * 5))
@@ -83,56 +145,59 @@ class ArcReactorWidget(QWidget):
             painter.setPen(Qt.PenStyle.NoPen)
             painter.drawEllipse(center_x - (80 + i * 8), center_y - (80 + i * 8), 
                               (80 + i * 8) * 2, (80 + i * 8) * 2)
+        painter.end()
         
-        # Rotating outer ring
-        painter.save()
-        painter.translate(center_x, center_y)
-        painter.rotate(self.rotation_angle)
-        
-        # Draw triangular segments
-        for i in range(12):
-            angle = i * 30
-            painter.save()
-            painter.rotate(angle)
+        # Rotating outer ring: 12 segments -> repeats every 30 deg, 2 deg per tick = 15 frames
+        self.outer_frames = []
+        for frame in range(15):
+            pixmap, painter = self.new_sprite()
+            painter.translate(center_x, center_y)
+            painter.rotate(frame * 2)
             
             gradient = QLinearGradient(0, -70, 0, -50)
             gradient.setColorAt(0, QColor(0, 255, 100, 200))
             gradient.setColorAt(1, QColor(100, 255, 150, 100))
-            
             painter.setBrush(QBrush(gradient))
             painter.setPen(QPen(QColor(150, 255, 200), 1))
             
             # Triangle shape
             points = [QPoint(0, -70), QPoint(-8, -50), QPoint(8, -50)]
-            painter.drawPolygon(points)
-            painter.restore()
-        
-        painter.restore()
-        
-        # Middle ring (counter-rotating)
-        painter.save()
-        painter.translate(center_x, center_y)
-        painter.rotate(-self.rotation_angle * 1.5)
+            for i in range(12):
+                painter.drawPolygon(points)
+                painter.rotate(30)
+            painter.end()
+            self.outer_frames.append(pixmap)
         
-        for i in range(8):
-            angle = i * 45
-            painter.save()
-            painter.rotate(angle)
+        # Middle ring (counter-rotating): 8 segments -> repeats every 45 deg, 3 deg per tick = 15 frames
+        self.middle_frames = []
+        for frame in range(15):
+            pixmap, painter = self.new_sprite()
+            painter.translate(center_x, center_y)
+            painter.rotate(-frame * 3)
             
             gradient = QLinearGradient(0, -50, 0, -35)
             gradient.setColorAt(0, QColor(50, 200, 100, 180))
             gradient.setColorAt(1, QColor(100, 255, 150, 80))
-            
             painter.setBrush(QBrush(gradient))
             painter.setPen(QPen(QColor(150, 255, 200), 1))
             
-            painter.drawRect(-4, -50, 8, 15)
-            painter.restore()
+            for i in range(8):
+                painter.drawRect(-4, -50, 8, 15)
+                painter.rotate(45)
+            painter.end()
+            self.middle_frames.append(pixmap)
         
-        painter.restore()
+        # Core sprites are built lazily per radius (only a handful of sizes)
+        self.core_sprites = {}
+    
+    def core_sprite(self, scaled_radius):
+        pixmap = self.core_sprites.get(scaled_radius)
+        if pixmap is not None:
+            return pixmap
         
-        # Core circle with pulsing effect
-        scaled_radius = int(35 * self.pulse_scale)
+        center_x = self.width() // 2
+        center_y = self.height() // 2
+        pixmap, painter = self.new_sprite()
         
         # Core glow
         core_glow = QRadialGradient(center_x, center_y, scaled_radius + 15)
@@ -164,42 +229,147 @@ class ArcReactorWidget(QWidget):
         painter.setBrush(QBrush(center_spot))
         painter.setPen(Qt.PenStyle.NoPen)
         painter.drawEllipse(center_x - 15, center_y - 15, 30, 30)
+        painter.end()
+        
+        self.core_sprites[scaled_radius] = pixmap
+        return pixmap
+    
+    def paintEvent(self, event):
+        start = time.perf_counter()
+        
+        # Rebuild only if the screen scale changed (e.g. moved to a HiDPI monitor)
+        if self.sprite_ratio != self.devicePixelRatioF():
+            self.build_sprites()
+        
+        outer = self.outer_frames[(self.rotation_angle % 30) // 2]
+        middle = self.middle_frames[(self.rotation_angle * 3 // 2 % 45) // 3]
+        core = self.core_sprite(int(35 * self.pulse_scale))
+        
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.glow_sprite)
+        painter.drawPixmap(0, 0, outer)
+        painter.drawPixmap(0, 0, middle)
+        painter.drawPixmap(0, 0, core)
+        painter.end()
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.frames_painted += 1
+        self.paint_ms_total += elapsed_ms
+        self.paint_ms_max = max(self.paint_ms_max, elapsed_ms)
+        if elapsed_ms > FRAME_BUDGET_MS:
+            self.frames_over_budget += 1
 
-# --- WORKER THREAD (Backend Logic) ---
-class OllamaWorker(QThread):
-    new_chunk = pyqtSignal(str)
-    finished = pyqtSignal()
+# --- WORKER (Backend Logic) ---
+class OllamaWorker(QObject):
+    # Bridges the long-lived backend thread to the UI. Tokens go into the request's
+    # coalescer; chunk_ready only fires when the UI has to wake up.
+    chunk_ready = pyqtSignal()
+    finished = pyqtSignal(object)
     
-    def __init__(self, model, messages):
+    def __init__(self, model):
         super().__init__()
+        from ollama_backend import BackendWorker, get_backend
         self.model = model
-        self.messages = messages
+        self.backend = BackendWorker(get_backend())
 
-    def run(self):
-        try:
-            stream = ollama.chat(model=self.model, messages=self.messages, stream=True)
-            for chunk in stream:
-                content = chunk['message']['content']
-                self.new_chunk.emit(content)
-        except Exception as e:
-            self.new_chunk.emit(f"\n[Error: {str(e)}]")
-        finally:
-            self.finished.emit()
+    def submit(self, messages, coalescer, options=None, preempt=False):
+        from ollama_backend import ChatRequest, KEEP_ALIVE
+
+        def on_chunk(text):
+            if coalescer.push(text):
+                self.chunk_ready.emit()
+
+        def on_done(request, final, error):
+            if error is not None:
+                on_chunk(f"\n[Error: {str(error)}]")
+            self.finished.emit(request)
+
+        request = ChatRequest(messages, on_chunk, on_done, self.model, options, KEEP_ALIVE, source="native")
+        return self.backend.submit(request, preempt)
+
+    def cancel(self):
+        self.backend.cancel_all()
 
 # --- MAIN WINDOW ---
+METRICS_REFRESH_S = 0.5    # live TTFT / tok/s in the status bar
+EXPORT_FILTERS = {"Markdown (*.md)": "md", "HTML (*.html)": "html",
+                  "JSON Lines (*.jsonl)": "jsonl", "Text Files (*.txt)": "txt"}
 class OMIWindow(QMainWindow):
+    # Store callbacks arrive on the store thread, these bring them back to the UI thread
+    session_found = pyqtSignal(object)
+    page_loaded = pyqtSignal(object)
+    model_warmed = pyqtSignal(bool, float)
+    search_finished = pyqtSignal(object, str)
+    export_progress = pyqtSignal(int, int)
+    export_done = pyqtSignal(object)
+    profile_switched = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         
         self.setWindowTitle("OMI - No ethics allowed")
         self.resize(1200, 900)
         
-        # Data
-        self.messages = []
-        self.full_history_text = ""
+        # Data: every message lives once in the store, the transcript,
+        # copy and save read from it
+        self.messages = MessageStore()
         self.is_generating = False
         self.current_ai_response = ""
         
+        # Model + options come from the active profile and can be switched at runtime
+        self.profiles = get_profiles()
+        self.profile = self.profiles.active()
+        self.profiles.on_switch(self.profile_switched.emit)
+        self.profile_switched.connect(self.apply_profile)
+        
+        # Only a token-budgeted window of the history is sent to the model,
+        # plus the few memory facts / past turns relevant to the newest prompt
+        self.memory = MemoryIndex()
+        self.context = ContextManager(num_ctx=self.profile.num_ctx, retriever=self.memory.snippets)
+        
+        # Persistent history: written in the background, loaded a page at a time
+        self.store = ChatStore()
+        self.session = None
+        self.oldest_seq = 0
+        self.loading_page = False
+        self.session_found.connect(self.on_session_found)
+        self.page_loaded.connect(self.on_page_loaded)
+        
+        # Streaming: chunks are buffered and flushed at most once per frame
+        self.flush_interval_ms = FLUSH_INTERVAL_MS
+        self.coalescer = ChunkCoalescer(self.flush_interval_ms)
+        self.flush_scheduled = False
+        
+        # One long-lived backend worker; requests are queued and can be cancelled.
+        # Created by start_backend() once the window is showing.
+        self.worker = None
+        self.current_request = None
+        self.metrics_shown_at = 0.0
+        
+        # Load the model while the window paints, then keep it loaded between messages
+        self.keep_alive = None
+        self.model_warm = False
+        self.model_warmed.connect(self.on_model_warmed)
+        
+        # Incremental markdown: finished blocks are rendered once, only the tail is redone
+        self.md_stream = MarkdownStream()
+        self.tail_start = 0
+        
+        # Speculative work once typing pauses: "search ..." is searched ahead,
+        # anything else pre-fills the model with the prompt as it would be sent
+        self.speculator = Speculator(self.profile.model, self.profile.options())
+        self.speculate_timer = QTimer(self)
+        self.speculate_timer.setSingleShot(True)
+        self.speculate_timer.setInterval(DEBOUNCE_MS)
+        self.speculate_timer.timeout.connect(self.speculate)
+        self.pending_search = None
+        self.search_finished.connect(self.on_search_finished)
+        
+        # Exports stream from a background thread (chat_export.py)
+        self.export_job = None
+        self.export_progress.connect(self.on_export_progress)
+        self.export_done.connect(self.on_export_done)
+        
         # Main Layout
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -231,7 +401,7 @@ class OMIWindow(QMainWindow):
         header_layout.addWidget(subtitle_label)
         
         # Status indicator
-        self.status_label = QLabel("● ONLINE")
+        self.status_label = QLabel("● WARMING UP")
         self.status_label.setObjectName("Status")
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         header_layout.addWidget(self.status_label)
@@ -249,10 +419,11 @@ class OMIWindow(QMainWindow):
         chat_layout = QVBoxLayout(chat_container)
         chat_layout.setContentsMargins(30, 20, 30, 20)
         
-        # USE CUSTOM BROWSER HERE
-        self.chat_display = ChatBrowser()
+        # Virtualized transcript: one row per message, only visible rows are laid out
+        self.chat_display = TranscriptView(self.messages.shown, self.message_html)
         self.chat_display.copy_requested.connect(self.copy_response)
         self.chat_display.setStyleSheet("line-height: 1.5;")
+        self.chat_display.verticalScrollBar().valueChanged.connect(self.on_scroll)
         chat_layout.addWidget(self.chat_display)
         
         # Typing indicator
@@ -290,6 +461,7 @@ class OMIWindow(QMainWindow):
         self.input_field = QLineEdit()
         self.input_field.setPlaceholderText("Type a message...")
         self.input_field.returnPressed.connect(self.send_message)
+        self.input_field.textChanged.connect(self.speculate_timer.start)
         input_layout.addWidget(self.input_field)
         
         self.send_btn = QPushButton("➤")
@@ -297,6 +469,13 @@ class OMIWindow(QMainWindow):
         self.send_btn.clicked.connect(self.send_message)
         input_layout.addWidget(self.send_btn)
         
+        # Shown instead of the send button while a reply is streaming
+        self.stop_btn = QPushButton("■")
+        self.stop_btn.setFixedSize(45, 45)
+        self.stop_btn.clicked.connect(self.stop_generation)
+        self.stop_btn.hide()
+        input_layout.addWidget(self.stop_btn)
+        
         input_outer_layout.addWidget(input_container)
         
         # Footer Toolbar
@@ -311,8 +490,17 @@ class OMIWindow(QMainWindow):
         self.clear_btn.setObjectName("TextBtn")
         self.clear_btn.clicked.connect(self.clear_chat)
         
+        # Model profile (model_profiles.py); switching takes effect on the next message
+        self.profile_box = QComboBox()
+        self.profile_box.setObjectName("ProfileBox")
+        self.profile_box.addItems(self.profiles.names())
+        self.profile_box.setCurrentText(self.profile.name)
+        self.profile_box.currentTextChanged.connect(self.profiles.switch)
+        
         tool_layout.addWidget(self.save_btn)
         tool_layout.addStretch()
+        tool_layout.addWidget(self.profile_box)
+        tool_layout.addStretch()
         tool_layout.addWidget(self.clear_btn)
         
         input_outer_layout.addLayout(tool_layout)
@@ -321,6 +509,58 @@ class OMIWindow(QMainWindow):
         
         # Apply The Iron Man Theme
         self.apply_styles()
+        
+        # Reopen the last conversation (async, the window paints first)
+        self.store.latest_session(self.session_found.emit)
+
+    def finish_startup(self):
+        # Runs on the first event loop turn after show(): the window is already up
+        profiler.mark("window on screen")
+        self.start_backend()
+        # markdown is only needed for the first message, load it off the UI thread
+        threading.Thread(target=importlib.import_module, args=("markdown",), daemon=True).start()
+        profiler.finish()
+
+    def start_backend(self):
+        if self.worker is not None:
+            return
+        with profiler.phase("start backend"):
+            from ollama_backend import KeepAlive, get_backend
+            self.worker = OllamaWorker(self.profile.model)
+            self.worker.chunk_ready.connect(self.schedule_flush)
+            self.worker.finished.connect(self.on_generation_finished)
+            self.keep_alive = KeepAlive(get_backend(), self.profile.model, self.profile.options(),
+                                        on_warm=self.model_warmed.emit).start()
+
+    def apply_profile(self, profile):
+        # No restart: new requests use the new model / options, the keep-alive
+        # loads it now so the first message after the switch does not pay for it
+        self.profile = profile
+        self.context.set_num_ctx(profile.num_ctx)
+        self.speculator.model = profile.model
+        self.speculator.options = profile.options()
+        if self.profile_box.currentText() != profile.name:
+            self.profile_box.setCurrentText(profile.name)
+        if self.worker is not None:
+            self.worker.model = profile.model
+            self.model_warm = False
+            self.keep_alive.retarget(profile.model, profile.options())
+        if not self.is_generating:
+            self.status_label.setText(f"● LOADING {profile.name.upper()}")
+
+    def online_text(self):
+        return "● ONLINE · MODEL WARM" if self.model_warm else "● ONLINE"
+
+    def on_model_warmed(self, ok, seconds):
+        self.model_warm = ok
+        if not self.is_generating:
+            self.status_label.setText(self.online_text() if ok else "● ONLINE · MODEL COLD")
+
+    def changeEvent(self, event):
+        # Minimized windows get no hideEvent on their children, pause the reactor by hand
+        if event.type() == QEvent.Type.WindowStateChange:
+            self.arc_reactor.set_paused(self.isMinimized())
+        super().changeEvent(event)
 
     def apply_styles(self):
         # Dark Green Theme Palette
@@ -377,7 +617,7 @@ class OMIWindow(QMainWindow):
             }}
             
             /* Chat Display */
-            QTextBrowser {{
+            QListView {{
                 background-color: {chat_bg};
                 border: 2px solid {green_primary};
                 border-radius: 10px;
@@ -482,7 +722,16 @@ class OMIWindow(QMainWindow):
                 border: 1px solid {green_dark};
                 background: rgba(0, 255, 0, 0.1);
             }}
-            
+
+            QComboBox#ProfileBox {{
+                background-color: transparent;
+                color: #666666;
+                font-size: 11px;
+                border: 1px solid #333333;
+                border-radius: 8px;
+                padding: 6px 12px;
+            }}
+
             /* Loader */
             QProgressBar {{
                 background-color: transparent;
@@ -496,6 +745,7 @@ class OMIWindow(QMainWindow):
         """)
 
     def format_user_message(self, text):
+        import markdown
         html_content = markdown.markdown(text)
         # Right aligned, Dark Green bubble for USER
         return f"""
@@ -526,6 +776,13 @@ class OMIWindow(QMainWindow):
         </div>
         """
 
+    def message_html(self, row):
+        # A transcript row, rebuilt from the message store whenever it is rendered
+        text = self.messages.shown(row)
+        if self.messages.role(row) == "user":
+            return self.format_user_message(text)
+        return self.format_ai_header() + self.render_ai_markdown(text) + self.get_copy_button_html(row)
+
     def get_copy_button_html(self, index):
         # Creates a link that looks like a small button.
         # The href 'copy:{index}' tells our handler which message to copy.
@@ -546,16 +803,66 @@ class OMIWindow(QMainWindow):
         <br>
         """
 
+    # --- PERSISTENT HISTORY ---
+    def on_session_found(self, session):
+        if session is None or self.messages:
+            return
+        self.session = session
+        self.memory.active_session = session
+        self.oldest_seq = session.count
+        self.load_older_page()
+
+    def load_older_page(self):
+        if self.loading_page or self.session is None or self.oldest_seq <= 0:
+            return
+        self.loading_page = True
+        session = self.session
+        self.store.load_page(session.id, self.oldest_seq,
+                             lambda rows: self.page_loaded.emit((session, rows)), PAGE_SIZE)
+
+    def on_page_loaded(self, result):
+        session, rows = result
+        self.loading_page = False
+        if session is not self.session:
+            return  # chat was cleared while the page was loading
+        if not rows:
+            self.oldest_seq = 0
+            return
+        self.oldest_seq = rows[0][0]
+        
+        count = self.messages.prepend((role, content) for _, role, content in rows)
+        self.context.history_prepended(count)
+        self.chat_display.prepend_messages(count)
+
+    def on_scroll(self, value):
+        # Reaching the top pages in older messages
+        if value == self.chat_display.verticalScrollBar().minimum():
+            self.load_older_page()
+
+    def persist_message(self, role, content):
+        if self.session is None:
+            self.session = self.store.new_session()
+            self.memory.active_session = self.session
+        self.store.append(self.session, role, content)
+
+    def closeEvent(self, event):
+        self.speculator.shutdown()
+        if self.worker is not None:
+            self.keep_alive.stop()
+            self.worker.cancel()
+        self.store.close()
+        super().closeEvent(event)
+
     # NEW FUNCTION TO HANDLE THE SIGNAL FROM CHAT BROWSER
     def copy_response(self, index):
         try:
-            content = self.messages[index]['content']
+            content = self.messages.content(index)
             QApplication.clipboard().setText(content)
             
             # Feedback
             self.status_label.setText("● COPIED TO CLIPBOARD")
             self.status_label.setStyleSheet("color: #ffffff;")
-            QTimer.singleShot(2000, lambda: self.status_label.setText("● ONLINE"))
+            QTimer.singleShot(2000, lambda: self.status_label.setText(self.online_text()))
             QTimer.singleShot(2000, lambda: self.status_label.setStyleSheet("color: #00ff00;"))
         except Exception as e:
             print(f"Copy error: {e}")
@@ -567,101 +874,254 @@ class OMIWindow(QMainWindow):
     
     def send_message(self):
         text = self.input_field.text().strip()
-        if not text or self.is_generating:
+        if not text:
             return
-
-        # 1. Show User Message on the RIGHT
-        self.chat_display.append(self.format_user_message(text))
         
-        self.messages.append({"role": "user", "content": text})
-        self.full_history_text += f"OM: {text}\n\n"
+        # Whatever was speculated for the text in flight is stale now
+        self.speculate_timer.stop()
+        self.speculator.submitted()
         
-        self.chat_display.verticalScrollBar().setValue(
-            self.chat_display.verticalScrollBar().maximum()
-        )
+        # A new prompt preempts the running one instead of waiting for it
+        if self.is_generating:
+            self.stop_generation()
+
+        # 1. Show User Message on the RIGHT
+        self.messages.append("user", text)
+        self.chat_display.append_message()
+        self.persist_message("user", text)
         
-        # Reset Input
+        # Reset Input (stays enabled so a new prompt can preempt this one)
         self.input_field.clear()
-        self.input_field.setDisabled(True)
-        self.send_btn.setDisabled(True)
+        self.send_btn.hide()
+        self.stop_btn.show()
         self.is_generating = True
         
         self.typing_indicator.show()
         self.typing_timer.start(500)
         self.progress.show()
         self.status_label.setText("● PROCESSING")
+        self.arc_reactor.set_active(True)
         
         self.current_ai_response = ""
+        self.metrics_shown_at = 0.0
         
-        self.worker = OllamaWorker("OMI", self.messages)
-        self.worker.new_chunk.connect(self.update_ai_response)
-        self.worker.finished.connect(self.on_generation_finished)
-        self.worker.start()
+        if text.lower().startswith(SEARCH_PREFIX):
+            # Search first (off the UI thread), the model gets the results as the prompt
+            query = text[len(SEARCH_PREFIX):].strip()
+            self.pending_search = query
+            self.status_label.setText("● SEARCHING")
+            self.start_backend()
+            prefetched = self.speculator.take_search(query)
+            threading.Thread(target=self.run_search, args=(query, prefetched),
+                             name="search", daemon=True).start()
+            return
+        self.submit_to_model()
+
+    def submit_to_model(self):
+        self.coalescer = ChunkCoalescer(self.flush_interval_ms)
+        self.start_backend()
+        self.current_request = self.worker.submit(
+            self.context.build(self.messages), self.coalescer, self.profile.options(), preempt=True
+        )
+
+    def run_search(self, query, prefetched):
+        import web_search
+        try:
+            data = web_search.get_results(query, prefetched=prefetched)
+        except Exception as e:
+            data = f"System: Search failed. Error: {e}"
+        self.search_finished.emit(query, data)
+
+    def on_search_finished(self, query, data):
+        # Stopped or replaced by a newer prompt while searching
+        if query is not self.pending_search:
+            return
+        self.pending_search = None
+        # The transcript keeps "search ...", the model sees the results
+        self.messages.amend_last(
+            f"I searched for '{query}'. Here are the results:\n{data}\n\nPlease summarize these findings.")
+        self.status_label.setText("● PROCESSING")
+        self.submit_to_model()
+
+    def speculate(self):
+        # Debounced textChanged: typing paused, get a head start on the likely prompt
+        if self.is_generating:
+            return
+        self.start_backend()
+        self.speculator.update(self.input_field.text(),
+                               lambda text: self.context.build(self.messages.plus("user", text),
+                                                               speculative=True))
+
+    def stop_generation(self):
+        if not self.is_generating:
+            return
+        # Closes the HTTP stream right away; whatever arrived so far is kept
+        self.current_request = None
+        self.pending_search = None
+        self.worker.cancel()
+        self.finish_ai_message()
+        self.status_label.setText("● STOPPED")
+        QTimer.singleShot(2000, lambda: self.status_label.setText(self.online_text()))
+
+    def schedule_flush(self):
+        # Wake-up from the worker: flush once the frame interval has passed
+        if self.flush_scheduled:
+            return
+        self.flush_scheduled = True
+        QTimer.singleShot(self.coalescer.delay_ms(), self.flush_ai_response)
+
+    def flush_ai_response(self):
+        self.flush_scheduled = False
+        text = self.coalescer.drain()
+        if text:
+            self.update_ai_response(text)
+            self.update_live_metrics()
+
+    def update_live_metrics(self):
+        # TTFT + running tok/s in the status bar, a few times per second at most
+        now = time.perf_counter()
+        if self.current_request is None or now - self.metrics_shown_at < METRICS_REFRESH_S:
+            return
+        self.metrics_shown_at = now
+        self.status_label.setText(f"● STREAMING · {self.current_request.metrics.summary()}")
+
+    def render_ai_markdown(self, src):
+        import markdown
+        return markdown.markdown(src, extensions=['fenced_code'])
+
+    def splice_ai_response(self, blocks, tail):
+        # Replace the old tail with the newly finished blocks + the new tail.
+        # Everything before tail_start is final and never touched again.
+        cursor = QTextCursor(self.chat_display.live_document())
+        cursor.setPosition(self.tail_start)
+        cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+        
+        for block in blocks:
+            cursor.insertHtml(self.render_ai_markdown(block))
+            cursor.insertBlock()
+        self.tail_start = cursor.position()
+        
+        if tail:
+            cursor.insertHtml(self.render_ai_markdown(tail))
+        self.chat_display.live_changed(self.current_ai_response)
+
+    def start_ai_message(self):
+        self.typing_indicator.hide()
+        self.typing_timer.stop()
+        
+        # The reply gets its own row; it starts in a fresh block right after the header
+        cursor = QTextCursor(self.chat_display.begin_live(self.format_ai_header()))
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertBlock()
+        self.tail_start = cursor.position()
+        self.md_stream = MarkdownStream()
 
     def update_ai_response(self, chunk):
         if not self.current_ai_response:
-            self.typing_indicator.hide()
-            self.typing_timer.stop()
-            self.chat_display.append(self.format_ai_header())
-            
-            cursor = self.chat_display.textCursor()
-            cursor.movePosition(QTextCursor.MoveOperation.End)
-            fmt = QTextCharFormat()
-            fmt.setForeground(QColor("#00ff88"))
-            fmt.setFontPointSize(12)
-            cursor.setCharFormat(fmt)
-            self.chat_display.setTextCursor(cursor)
+            self.start_ai_message()
         
         self.current_ai_response += chunk
-        self.chat_display.insertPlainText(chunk)
-        self.chat_display.verticalScrollBar().setValue(
-            self.chat_display.verticalScrollBar().maximum()
-        )
+        blocks = self.md_stream.feed(chunk)
+        self.splice_ai_response(blocks, self.md_stream.tail())
+
+    def on_generation_finished(self, request):
+        # Requests that were stopped / preempted were already finished by stop_generation
+        if request is not self.current_request:
+            return
+        self.current_request = None
+        self.finish_ai_message()
+        if request.metrics.status == "ok":
+            self.status_label.setText(f"{self.online_text()} · {request.metrics.summary()}")
+            self.status_label.setToolTip(request.metrics.details())
 
-    def on_generation_finished(self):
+    def finish_ai_message(self):
+        # Push out whatever is still sitting in the buffer
+        self.flush_ai_response()
+        if self.current_ai_response:
+            self.splice_ai_response(self.md_stream.close(), "")
+        else:
+            self.start_ai_message()
+        
         # Save the message to history first
-        self.messages.append({"role": "assistant", "content": self.current_ai_response})
-        self.full_history_text += f"OMI: {self.current_ai_response}\n\n"
+        self.messages.append("assistant", self.current_ai_response)
+        self.persist_message("assistant", self.current_ai_response)
         
         # Determine the index of the message we just added
         # It is the last item in the list, so index = len - 1
         msg_index = len(self.messages) - 1
         
-        # Append the COPY button
-        self.chat_display.append(self.get_copy_button_html(msg_index))
+        # Append the COPY button and freeze the row
+        cursor = QTextCursor(self.chat_display.live_document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertHtml(self.get_copy_button_html(msg_index))
+        self.chat_display.end_live()
         
         self.typing_indicator.hide()
         self.typing_timer.stop()
-        self.input_field.setDisabled(False)
-        self.send_btn.setDisabled(False)
+        self.stop_btn.hide()
+        self.send_btn.show()
         self.input_field.setFocus()
         self.progress.hide()
-        self.status_label.setText("● ONLINE")
+        self.status_label.setText(self.online_text())
+        self.arc_reactor.set_active(False)
         self.is_generating = False
-        
-        self.chat_display.verticalScrollBar().setValue(
-            self.chat_display.verticalScrollBar().maximum()
-        )
 
     def save_chat(self):
-        file_path, _ = QFileDialog.getSaveFileName(
-            self, "Save Chat Log", "OMI_log.txt", "Text Files (*.txt)"
+        from chat_export import export_messages, export_session
+        if self.export_job is not None:
+            return
+        file_path, chosen = QFileDialog.getSaveFileName(
+            self, "Save Chat Log", "OMI_log.md", ";;".join(EXPORT_FILTERS)
         )
-        if file_path:
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(self.full_history_text)
+        if not file_path:
+            return
+        # Written message by message on the export thread, the UI keeps going
+        fmt = EXPORT_FILTERS[chosen]
+        on_done = lambda job, error: self.export_done.emit(error)
+        if self.session is not None and self.session.id is not None:
+            # The whole conversation comes from the store, not just the pages loaded here;
+            # messages whose append is still queued come from memory
+            self.export_job = export_session(file_path, self.session.id, fmt, self.messages.items(),
+                                             self.oldest_seq, self.store.path,
+                                             on_progress=self.export_progress.emit, on_done=on_done)
+        else:
+            self.export_job = export_messages(file_path, self.messages.items(), fmt, "OMI chat",
+                                              len(self.messages), on_progress=self.export_progress.emit,
+                                              on_done=on_done)
+
+    def on_export_progress(self, done, total):
+        if not self.is_generating:
+            self.status_label.setText(f"● SAVING {done}/{total}")
+
+    def on_export_done(self, error):
+        self.export_job = None
+        self.status_label.setText(f"● SAVE FAILED: {error}" if error else "● SAVED")
+        QTimer.singleShot(2000, lambda: self.status_label.setText(self.online_text()))
 
     def clear_chat(self):
-        self.messages = []
-        self.full_history_text = ""
+        # The old conversation stays in the store, the next message starts a new session.
+        # A reply still streaming is finished (and stored) first, so it can't land in the new chat.
+        self.stop_generation()
+        self.messages.clear()
+        self.context.reset()
+        self.session = None
+        self.memory.active_session = None
+        self.oldest_seq = 0
         self.chat_display.clear()
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    with profiler.phase("QApplication"):
+        app = QApplication(sys.argv)
+        
+        font = QFont("Segoe UI", 10)
+        app.setFont(font)
     
-    font = QFont("Segoe UI", 10)
-    app.setFont(font)
+    with profiler.phase("build window"):
+        window = OMIWindow()
+    with profiler.phase("show window"):
+        window.show()
     
-    window = OMIWindow()
-    window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    # Everything that is not needed for the first frame happens after it
+    QTimer.singleShot(0, window.finish_startup)
+    sys.exit(app.exec())
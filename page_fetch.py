@@ -0,0 +1,201 @@
+"""
+Fetch and extract search result pages.
+Downloads the top-N result URLs concurrently over one pooled HTTP client
+(with a per-host limit and timeouts), extracts the readable text while the
+bytes stream in, stops at a byte cap, and chunks the text for the prompt.
+"""
+
+import codecs
+import concurrent.futures
+import threading
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import httpx
+
+from context_manager import estimate_tokens
+
+# --- CONFIG ---
+FETCH_TIMEOUT = 6.0         # per page, connect + read
+TOTAL_DEADLINE = 8.0        # for the whole batch
+MAX_BYTES = 512 * 1024      # stop reading a page after this much HTML
+MAX_PER_HOST = 2
+CHUNK_TOKENS = 400
+MAX_CHUNKS_PER_PAGE = 3
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) OMI-AI"
+
+SKIP_TAGS = {"script", "style", "noscript", "nav", "footer", "header", "aside", "form",
+             "svg", "iframe", "button", "select", "template"}
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "pre", "blockquote",
+              "h1", "h2", "h3", "h4", "h5", "h6", "tr", "br", "table", "dd", "dt"}
+VOID_TAGS = {"br", "img", "hr", "input", "meta", "link", "source", "wbr", "area", "col", "embed"}
+
+
+class TextExtractor(HTMLParser):
+    # Fed chunk by chunk while downloading; keeps only visible body text
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skip_stack = []    # open SKIP_TAGS; text is dropped while non-empty
+        self.title = ""
+        self.in_title = False
+        self.blocks = []
+        self.current = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == "br":
+                self.end_block()
+            return
+        if tag == "title":
+            self.in_title = True
+        # Only skip tags are tracked: <li>, <p> etc. may legally go unclosed
+        if tag in SKIP_TAGS:
+            self.skip_stack.append(tag)
+        elif tag in BLOCK_TAGS and not self.skip_stack:
+            self.end_block()
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        if tag == "title":
+            self.in_title = False
+        if tag in self.skip_stack:
+            # Closes the innermost open one (and anything left unclosed inside it)
+            while self.skip_stack.pop() != tag:
+                pass
+        elif tag in BLOCK_TAGS and not self.skip_stack:
+            self.end_block()
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif not self.skip_stack:
+            self.current.append(data)
+
+    def end_block(self):
+        text = " ".join("".join(self.current).split())
+        self.current = []
+        # Menus and buttons are short; real content is sentences
+        if len(text) > 40 or (text.endswith((".", "?", "!", ":")) and len(text) > 15):
+            self.blocks.append(text)
+
+    def text(self):
+        self.end_block()
+        return "\n".join(self.blocks)
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, max_chunks=MAX_CHUNKS_PER_PAGE):
+    # Paragraph-aligned chunks of at most ~max_tokens each
+    chunks = []
+    current = []
+    used = 0
+    for paragraph in text.split("\n"):
+        if not paragraph.strip():
+            continue
+        cost = estimate_tokens(paragraph)
+        if current and used + cost > max_tokens:
+            chunks.append("\n".join(current))
+            if len(chunks) >= max_chunks:
+                return chunks
+            current, used = [], 0
+        if cost > max_tokens:
+            # One huge paragraph: cut it by characters
+            paragraph = paragraph[:max_tokens * 4]
+            cost = max_tokens
+        current.append(paragraph)
+        used += cost
+    if current and len(chunks) < max_chunks:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class PageFetcher:
+    def __init__(self, timeout=FETCH_TIMEOUT, max_bytes=MAX_BYTES, max_per_host=MAX_PER_HOST):
+        self.max_bytes = max_bytes
+        self.max_per_host = max_per_host
+        self.client = httpx.Client(
+            timeout=httpx.Timeout(timeout),
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+        )
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+    def host_limit(self, url):
+        host = urlsplit(url).hostname or ""
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def fetch(self, url):
+        # -> {"url", "title", "text", "bytes", "seconds"}; raises on network errors
+        start = time.perf_counter()
+        extractor = TextExtractor()
+        received = 0
+        with self.host_limit(url):
+            with self.client.stream("GET", url) as response:
+                response.raise_for_status()
+                kind = response.headers.get("content-type", "")
+                if "html" not in kind and "text" not in kind:
+                    raise ValueError(f"not a text page ({kind or 'unknown type'})")
+                # Bytes are counted before decoding, so MAX_BYTES really is bytes
+                decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+                for data in response.iter_bytes():
+                    data = data[:self.max_bytes - received]     # a network chunk can be big
+                    extractor.feed(decoder.decode(data))
+                    received += len(data)
+                    if received >= self.max_bytes:
+                        break
+        extractor.close()
+        return {
+            "url": url,
+            "title": " ".join(extractor.title.split()),
+            "text": extractor.text(),
+            "bytes": received,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def fetch_all(self, urls, deadline=TOTAL_DEADLINE):
+        # Concurrent fetch; pages that fail or miss the deadline are left out.
+        # Returns pages in the same order as `urls`.
+        futures = {self._executor.submit(self.fetch, url): i for i, url in enumerate(urls)}
+        done, _ = concurrent.futures.wait(futures, timeout=deadline)
+        pages = []
+        for future in sorted(done, key=lambda f: futures[f]):
+            try:
+                page = future.result()
+            except Exception as e:
+                print(f"   (could not read {urls[futures[future]]}: {e})")
+                continue
+            if page["text"]:
+                pages.append(page)
+        return pages
+
+    def close(self):
+        self.client.close()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = PageFetcher()
+        return _fetcher
+
+
+def format_pages(pages):
+    output = ""
+    for i, page in enumerate(pages, 1):
+        for j, chunk in enumerate(chunk_text(page["text"]), 1):
+            output += f"\n--- PAGE {i} PART {j}: {page['title'] or page['url']} ---\n"
+            output += f"Link:  {page['url']}\n"
+            output += f"{chunk}\n"
+    return output
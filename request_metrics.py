@@ -0,0 +1,186 @@
+"""
+Per-request generation metrics.
+Time to first token and wall time are measured on our side; decode speed,
+prompt-eval speed and token counts come from the stats Ollama puts in the
+final stream chunk; context length also uses an estimate of the messages sent. Every finished request is appended to a rotating JSONL
+log (~/.omi/metrics.jsonl) so slowdowns from context growth or model swaps
+show up over time.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+from context_manager import estimate_message
+
+# --- CONFIG ---
+METRICS_PATH = os.path.join(os.path.expanduser("~"), ".omi", "metrics.jsonl")
+MAX_BYTES = 1024 * 1024     # rotate at 1 MB
+BACKUP_COUNT = 3            # metrics.jsonl.1 .. .3
+
+
+def _seconds(ns):
+    return ns / 1e9 if ns else 0.0
+
+
+class RequestMetrics:
+    def __init__(self, model=None, source="", messages=None):
+        self.model = model
+        self.source = source            # which front end sent it
+        # Estimated size of the messages sent; prompt_tokens alone misses the KV-cached part
+        self.prompt_estimate = sum(estimate_message(m) for m in messages or () if isinstance(m, dict))
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.end = None
+        self.chunks = 0                 # Ollama streams one token per chunk
+        self.queue_s = 0.0              # time spent waiting for a scheduler slot
+        self.status = "running"
+        self.error = None
+        self.prompt_tokens = 0          # 0 when the whole prompt came from the KV cache
+        self.prompt_eval_s = 0.0
+        self.eval_tokens = 0
+        self.eval_s = 0.0
+        self.load_s = 0.0
+        self.cached = False             # replayed from the response cache
+
+    def chunk(self, content):
+        if not content:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+
+    def finish(self, final=None, error=None, cancelled=False):
+        self.end = time.perf_counter()
+        if error is not None:
+            self.status, self.error = "error", str(error)
+        else:
+            self.status = "cancelled" if cancelled else "ok"
+        if final:
+            self.prompt_tokens = final.get("prompt_eval_count") or 0
+            self.prompt_eval_s = _seconds(final.get("prompt_eval_duration"))
+            self.eval_tokens = final.get("eval_count") or 0
+            self.eval_s = _seconds(final.get("eval_duration"))
+            self.load_s = _seconds(final.get("load_duration"))
+            self.cached = bool(final.get("cached"))
+        return self
+
+    # --- Derived numbers ---
+    @property
+    def ttft(self):
+        return self.first_token_at - self.start if self.first_token_at is not None else None
+
+    @property
+    def wall(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    @property
+    def decode_rate(self):
+        if self.eval_s and not self.cached:
+            return self.eval_tokens / self.eval_s
+        # Still streaming (or no stats): estimate from the chunks seen so far
+        if self.first_token_at is not None and self.chunks > 1:
+            return (self.chunks - 1) / max(1e-6, time.perf_counter() - self.first_token_at)
+        return None
+
+    @property
+    def prompt_rate(self):
+        return self.prompt_tokens / self.prompt_eval_s if self.prompt_eval_s else None
+
+    @property
+    def context_tokens(self):
+        # Everything in the window after this reply: the exact count when Ollama evaluated
+        # the whole prompt, the estimate when part of it came from the KV cache
+        return max(self.prompt_tokens, self.prompt_estimate) + self.eval_tokens
+
+    def as_dict(self):
+        def r(value, digits=3):
+            return round(value, digits) if value is not None else None
+        return {
+            "ts": round(self.timestamp, 3),
+            "source": self.source,
+            "model": self.model,
+            "status": self.status,
+            "ttft_s": r(self.ttft),
+            "wall_s": r(self.wall),
+            "decode_tok_s": r(self.decode_rate, 1),
+            "prompt_tok_s": r(self.prompt_rate, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "eval_tokens": self.eval_tokens,
+            "context_tokens": self.context_tokens,
+            "load_s": r(self.load_s),
+            "queue_s": r(self.queue_s),
+            "cached": self.cached,
+            "error": self.error,
+        }
+
+    def summary(self):
+        # One line for a status bar
+        parts = []
+        if self.ttft is not None:
+            parts.append(f"TTFT {self.ttft:.2f}s")
+        if self.decode_rate is not None and not self.cached:
+            parts.append(f"{self.decode_rate:.1f} tok/s")
+        if self.cached:
+            parts.append("cached")
+        if self.end is not None:
+            if self.context_tokens:
+                parts.append(f"ctx {self.context_tokens}")
+            parts.append(f"{self.wall:.1f}s")
+        return " · ".join(parts)
+
+    def details(self):
+        # Multi-line breakdown (tooltip / sidebar)
+        d = self.as_dict()
+        lines = [
+            f"Time to first token: {d['ttft_s'] if d['ttft_s'] is not None else '-'} s",
+            f"Decode: {d['decode_tok_s'] or '-'} tok/s ({self.eval_tokens} tokens)",
+            f"Prompt eval: {d['prompt_tok_s'] or '-'} tok/s ({self.prompt_tokens} tokens)",
+            f"Context: {self.context_tokens} tokens",
+            f"Wall time: {d['wall_s']} s",
+        ]
+        if self.cached:
+            lines.insert(0, "Replayed from the response cache")
+        if self.queue_s >= 0.05:
+            lines.append(f"Queued: {d['queue_s']} s")
+        if self.load_s >= 0.5:
+            lines.append(f"Model load: {d['load_s']} s")
+        return "\n".join(lines)
+
+
+class MetricsLog:
+    # Append-only JSONL with size-based rotation (the logging module does the rotating)
+    def __init__(self, path=METRICS_PATH, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        self.path = path
+        self.logger = logging.getLogger(f"omi.metrics.{path}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        if not self.logger.handlers:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self.logger.addHandler(handler)
+            except OSError as e:
+                print(f"Metrics log disabled: {e}")
+
+    def record(self, metrics):
+        self.logger.info(json.dumps(metrics.as_dict()))
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_metrics_log():
+    global _log
+    with _log_lock:
+        if _log is None:
+            _log = MetricsLog()
+        return _log
@@ -0,0 +1,154 @@
+"""
+Exact-match cache for model replies (opt-in: OMI_RESPONSE_CACHE=1).
+Keyed by a hash of the model, the full message list and the generation
+options. A hit is replayed as a normal chunk stream, so callers cannot tell it
+apart from a live reply apart from the "cached" flag on the final chunk.
+Sampled replies are not reproducible, so by default only requests with
+temperature 0 or a fixed seed are cached (OMI_RESPONSE_CACHE=always caches
+everything). The file is bounded by size, least recently used entries go first.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# --- CONFIG ---
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".omi", "response_cache.db")
+MODE = os.environ.get("OMI_RESPONSE_CACHE", "").lower()     # "", "1" or "always"
+MAX_BYTES = int(os.environ.get("OMI_RESPONSE_CACHE_MB", "50")) * 1024 * 1024
+REPLAY_CHUNK = re.compile(r"\s*\S+|\s+")    # replay word by word, like a token stream
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replies (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    final TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS replies_by_access ON replies(accessed);
+"""
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, mode=MODE, max_bytes=MAX_BYTES):
+        self.path = path
+        self.enabled = mode in ("1", "true", "yes", "on", "always")
+        self.always = mode == "always"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        self.conn = None
+
+    def _connect(self):
+        # Opened on first use, so a disabled cache never touches the disk
+        if self.conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+        return self.conn
+
+    def cacheable(self, options):
+        # Only deterministic requests: greedy decoding or a fixed seed
+        options = options or {}
+        if self.always:
+            return True
+        seed = options.get("seed")
+        return options.get("temperature") == 0 or (seed is not None and seed != -1)
+
+    def key(self, model, messages, options):
+        blob = json.dumps({"model": model, "messages": messages, "options": options or {}},
+                          sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def lookup(self, model, messages, options):
+        # -> (key, entry or None); key is None when this request must not be cached
+        if not self.enabled:
+            return None, None
+        if not self.cacheable(options):
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+        key = self.key(model, messages, options)
+        with self._lock:
+            row = self._connect().execute("SELECT content, final FROM replies WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return key, None
+            self.hits += 1
+            self.conn.execute("UPDATE replies SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return key, (row[0], json.loads(row[1]))
+
+    def store(self, key, content, final):
+        stats = {k: v for k, v in final.items() if k != "message"}
+        final_json = json.dumps(stats)
+        size = len(content.encode("utf-8")) + len(final_json)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO replies (key, content, final, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content, final_json, size, now, now),
+            )
+            # Size bound: drop least recently used entries until the total fits
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM replies").fetchone()[0]
+            if total > self.max_bytes:
+                rows = conn.execute("SELECT key, size FROM replies ORDER BY accessed").fetchall()
+                for old_key, old_size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM replies WHERE key = ?", (old_key,))
+                    total -= old_size
+            conn.commit()
+
+    def replay(self, entry, model):
+        # Yields the same chunk dicts as a live /api/chat stream
+        content, final = entry
+        for piece in REPLAY_CHUNK.findall(content):
+            yield {"model": model, "message": {"role": "assistant", "content": piece}, "done": False}
+        yield dict(final, model=model, message={"role": "assistant", "content": ""}, done=True, cached=True)
+
+    def stats(self):
+        with self._lock:
+            entries, size = (0, 0)
+            if self.conn is not None:
+                entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM replies").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM replies")
+            self.conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,245 @@
+"""
+Central scheduler for everything that runs on the local model.
+At most `max_concurrent` generations run at once. Jobs have a priority class:
+interactive (someone is waiting for the reply), tool (LLM calls made on behalf
+of a tool, e.g. summarizing fetched pages) and background (running summaries,
+warmup, speculative work). Higher classes always start first; an interactive
+job that finds every slot busy preempts the lowest running job below it.
+Within a class, waiting jobs are queued per session and sessions take turns
+(round robin), so one user sending a burst of prompts cannot starve everyone
+else. Per-session rate limiting is available separately (check_rate).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- CONFIG ---
+MAX_CONCURRENT = int(os.environ.get("OMI_MAX_CONCURRENT", "1"))   # match OLLAMA_NUM_PARALLEL
+RATE_LIMIT = 10             # requests per session ...
+RATE_WINDOW = 60.0          # ... per this many seconds
+POLL_INTERVAL = 0.5         # how often waiters get a queue position update
+HISTORY_SIZE = 500          # finished jobs kept for report()
+
+# Priority classes, lower number = more important
+INTERACTIVE = 0
+TOOL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", TOOL: "tool", BACKGROUND: "background"}
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many requests, try again in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Preempted(Exception):
+    # Raised inside a job whose slot was taken by an interactive one
+    pass
+
+
+class Ticket:
+    def __init__(self, session, priority=INTERACTIVE, name="", on_preempt=None):
+        self.session = session
+        self.priority = priority
+        self.name = name
+        self.on_preempt = on_preempt    # how to stop the job (e.g. close its HTTP stream)
+        self.submitted = time.perf_counter()
+        self.started = None             # perf_counter() when it got a slot
+        self.finished = None
+        self.preempted = False
+        self.done = False
+        self._event = threading.Event()
+
+    @property
+    def queue_wait(self):
+        return (self.started or time.perf_counter()) - self.submitted
+
+    @property
+    def run_time(self):
+        return (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+
+    def wait(self, timeout=None):
+        # True once the ticket holds a slot
+        return self._event.wait(timeout)
+
+    def preempt(self):
+        self.preempted = True
+        if self.on_preempt:
+            try:
+                self.on_preempt()
+            except Exception as e:
+                print(f"Preempt error: {e}")
+
+
+class FairScheduler:
+    def __init__(self, max_concurrent=MAX_CONCURRENT, rate_limit=RATE_LIMIT, rate_window=RATE_WINDOW):
+        self.max_concurrent = max(1, max_concurrent)
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.running = set()
+        self.queues = {}            # priority -> {session: deque of waiting tickets}
+        self.turns = {}             # priority -> deque of sessions with waiting tickets (round robin)
+        self.history = {}           # session -> deque of recent request times
+        self.finished = deque(maxlen=HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    # --- Rate limit ---
+    def check_rate(self, session, limit=None, window=None):
+        # Counts one request for `session`; raises RateLimited when it is over the limit
+        limit = self.rate_limit if limit is None else limit
+        window = self.rate_window if window is None else window
+        if not limit:
+            return
+        now = time.monotonic()
+        with self._lock:
+            recent = self.history.setdefault(session, deque())
+            while recent and now - recent[0] > window:
+                recent.popleft()
+            if len(recent) >= limit:
+                raise RateLimited(window - (now - recent[0]))
+            recent.append(now)
+
+    # --- Queueing ---
+    def submit(self, session, priority=INTERACTIVE, name="", on_preempt=None):
+        # -> Ticket, possibly already holding a slot
+        ticket = Ticket(session, priority, name, on_preempt)
+        with self._lock:
+            sessions = self.queues.setdefault(priority, {})
+            if session not in sessions:
+                sessions[session] = deque()
+                self.turns.setdefault(priority, deque()).append(session)
+            sessions[session].append(ticket)
+            self._dispatch()
+            victim = self._victim(ticket)
+        if victim is not None:
+            # Its release() hands the slot to us (highest class goes first)
+            victim.preempt()
+        return ticket
+
+    def _victim(self, ticket):
+        # An interactive job that has to wait takes the slot of the least important running job
+        if ticket.started is not None or ticket.priority != INTERACTIVE:
+            return None
+        candidates = [t for t in self.running
+                      if t.priority > ticket.priority and t.on_preempt and not t.preempted]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda t: (t.priority, t.started))
+
+    def _dispatch(self):
+        # Free slots go to the most important class first, round robin between its sessions
+        for priority in sorted(self.queues):
+            sessions = self.queues[priority]
+            turns = self.turns[priority]
+            while len(self.running) < self.max_concurrent and turns:
+                session = turns.popleft()
+                ticket = sessions[session].popleft()
+                if sessions[session]:
+                    turns.append(session)
+                else:
+                    del sessions[session]
+                ticket.started = time.perf_counter()
+                self.running.add(ticket)
+                ticket._event.set()
+
+    def release(self, ticket):
+        # Finished, failed, preempted or abandoned while waiting: give the slot / place back
+        with self._lock:
+            if ticket.done:
+                return
+            ticket.done = True
+            ticket.finished = time.perf_counter()
+            if ticket in self.running:
+                self.running.discard(ticket)
+                self.finished.append(ticket)
+            else:
+                sessions = self.queues.get(ticket.priority, {})
+                queue = sessions.get(ticket.session)
+                if queue and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del sessions[ticket.session]
+                        self.turns[ticket.priority].remove(ticket.session)
+            self._dispatch()
+
+    def position(self, ticket):
+        # How many queued jobs will start before this one (0 = next, or already running)
+        with self._lock:
+            sessions = self.queues.get(ticket.priority, {})
+            queue = sessions.get(ticket.session)
+            if ticket.started is not None or not queue or ticket not in queue:
+                return 0
+            # Every waiting job of a more important class goes first
+            ahead = sum(len(q) for p, s in self.queues.items() if p < ticket.priority for q in s.values())
+            index = queue.index(ticket)
+            turns = self.turns[ticket.priority]
+            turn = turns.index(ticket.session)
+            # Round robin: sessions before ours in the rotation get index + 1 turns first,
+            # the ones after ours (and our own earlier tickets) get index turns
+            for i, session in enumerate(turns):
+                ahead += min(len(sessions[session]), index + (1 if i < turn else 0))
+            return ahead
+
+    @contextmanager
+    def slot(self, session=None, priority=INTERACTIVE, name="", on_wait=None, on_preempt=None,
+             poll=POLL_INTERVAL):
+        # with scheduler.slot(session_id, on_wait=show_position) as ticket: ...generate...
+        # on_wait(position) is called while queued, from the calling thread.
+        # Raising out of on_wait (e.g. the user went away) gives the place back.
+        # Jobs with on_preempt can be stopped for an interactive job; check ticket.preempted.
+        ticket = self.submit(session, priority, name, on_preempt)
+        try:
+            while not ticket.wait(poll):
+                if on_wait:
+                    on_wait(self.position(ticket))
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        with self._lock:
+            queued = {PRIORITY_NAMES.get(p, p): sum(len(q) for q in s.values()) for p, s in self.queues.items()}
+            return {
+                "running": len(self.running),
+                "queued": sum(queued.values()),
+                "queued_by_class": queued,
+                "sessions_waiting": len({s for sessions in self.queues.values() for s in sessions}),
+                "max_concurrent": self.max_concurrent,
+            }
+
+    def report(self):
+        # Queue wait per finished job, summarized per priority class
+        with self._lock:
+            jobs = list(self.finished)
+        summary = {}
+        for priority, label in PRIORITY_NAMES.items():
+            waits = [t.queue_wait for t in jobs if t.priority == priority]
+            if not waits:
+                continue
+            summary[label] = {
+                "jobs": len(waits),
+                "preempted": sum(1 for t in jobs if t.priority == priority and t.preempted),
+                "wait_avg_s": round(sum(waits) / len(waits), 3),
+                "wait_max_s": round(max(waits), 3),
+            }
+        recent = [{"name": t.name, "class": PRIORITY_NAMES.get(t.priority, t.priority),
+                   "wait_s": round(t.queue_wait, 3), "run_s": round(t.run_time, 3), "preempted": t.preempted}
+                  for t in jobs[-10:]]
+        return {"classes": summary, "recent": recent}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    # Process-wide scheduler: every caller of the local model queues here
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+        return _scheduler
@@ -0,0 +1,147 @@
+"""
+On-disk cache for web search results.
+Keyed by provider + normalized query + result count. Fresh entries are served
+straight from disk, entries past their TTL (but not too old) are served stale
+while a background thread refreshes them, and the file is bounded LRU-style.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# --- CONFIG ---
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".omi", "search_cache.db")
+TTL = 6 * 3600          # fresh for 6 hours
+STALE_TTL = 24 * 3600   # after that, served stale (and refreshed) for up to a day
+MAX_ENTRIES = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_access ON results(accessed);
+"""
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    def __init__(self, path=CACHE_PATH, ttl=TTL, stale_ttl=STALE_TTL, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Every statement is short and runs under self._lock, so one shared connection is fine
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def key(self, provider, query, num_results):
+        return f"{provider}|{num_results}|{normalize_query(query)}"
+
+    def get_or_fetch(self, provider, query, num_results, fetch):
+        # fetch(query, num_results) -> JSON-serializable results. Exceptions and empty
+        # results (often a rate limit or a flaky provider, not a real answer) are not cached.
+        key = self.key(provider, query, num_results)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                age = now - row[1]
+                if age < self.stale_ttl:
+                    self.conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                    self.conn.commit()
+                    if age < self.ttl:
+                        self.hits += 1
+                    else:
+                        self.stale_hits += 1
+                        self._refresh_later(key, query, num_results, fetch)
+                    return json.loads(row[0])
+            self.misses += 1
+
+        results = fetch(query, num_results)
+        if results:
+            self._store(key, results)
+        return results
+
+    def _refresh_later(self, key, query, num_results, fetch):
+        # Stale-while-revalidate; one refresh per key at a time
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, query, num_results, fetch), daemon=True).start()
+
+    def _refresh(self, key, query, num_results, fetch):
+        try:
+            results = fetch(query, num_results)
+            # An empty refresh keeps the stale entry until it expires
+            if results:
+                self._store(key, results)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            print(f"Search refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, results):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(results), now, now),
+            )
+            # LRU bound: drop the least recently used entries beyond max_entries
+            self.conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM results")
+            self.conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+        return _cache
@@ -0,0 +1,113 @@
+"""
+Speculative work while the user is still typing.
+Front ends call update() once typing pauses (debounced). Text starting with
+"search " pre-runs the web search, anything else pre-fills the model's KV cache
+with the prompt as it will be sent (history window + the text so far), as a
+one-token background job. On submit, a prefetched search for the same query
+is handed over instead of searching again; speculation for anything else is
+cancelled / discarded.
+"""
+
+import concurrent.futures
+import hashlib
+import json
+import threading
+
+# --- CONFIG ---
+DEBOUNCE_MS = 400           # quiet time after the last keystroke before speculating
+MIN_CHARS = 3
+SEARCH_PREFIX = "search "
+
+
+class Speculator:
+    def __init__(self, model=None, options=None, backend=None):
+        self.model = model
+        self.options = dict(options or {})
+        self.backend = backend
+        self.search_query = None    # normalized query of the prefetch in flight / done
+        self.search_future = None
+        self.prefill_key = None
+        self.prefill_request = None
+        self.stats = {"searches": 0, "search_hits": 0, "prefills": 0, "cancelled": 0}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculate")
+        self._lock = threading.Lock()
+
+    def update(self, text, build_messages):
+        # build_messages(text) -> the messages the front end would send if `text` were submitted
+        # Prefix checked before trailing spaces go: "search " is a search, "search" may become one
+        text = text.lstrip()
+        lowered = text.lower()
+        if lowered.startswith(SEARCH_PREFIX):
+            query = text[len(SEARCH_PREFIX):].strip()
+            if len(query) >= MIN_CHARS:
+                self.cancel_prefill()
+                self.prefetch_search(query)
+        elif SEARCH_PREFIX.startswith(lowered):
+            return    # still typing the prefix: neither a search nor a prompt yet
+        elif len(text.rstrip()) >= MIN_CHARS:
+            self.prefill(build_messages(text.rstrip()))
+
+    # --- Search ---
+    def prefetch_search(self, query):
+        from search_cache import normalize_query
+        import web_search
+        normalized = normalize_query(query)
+        with self._lock:
+            if normalized == self.search_query:
+                return
+            # Anything prefetched for an older spelling is simply dropped
+            # (it still lands in the search cache)
+            self.search_query = normalized
+            self.search_future = self._executor.submit(web_search.search_all, query)
+            self.stats["searches"] += 1
+
+    def take_search(self, query):
+        # -> future of web_search.search_all(query) if we prefetched exactly this query, else None
+        from search_cache import normalize_query
+        with self._lock:
+            future, prefetched = self.search_future, self.search_query
+            self.search_future = self.search_query = None
+            if future is not None and prefetched == normalize_query(query):
+                self.stats["search_hits"] += 1
+                return future
+        return None
+
+    # --- Model prefill ---
+    def prefill(self, messages):
+        from ollama_backend import ChatRequest, KEEP_ALIVE, get_backend
+        from scheduler import BACKGROUND
+        key = hashlib.sha1(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            if key == self.prefill_key:
+                return
+        # The previous prefill goes first: cancelling also forgets its key
+        self.cancel_prefill()
+        # Same options as the real request (a different num_ctx would reload the model),
+        # one token of output: the point is the prompt eval, not the answer.
+        # Not a user request, so it stays out of the metrics log.
+        request = ChatRequest(messages, model=self.model or "OMI", options=dict(self.options, num_predict=1),
+                              keep_alive=KEEP_ALIVE, source="speculative", priority=BACKGROUND,
+                              use_cache=False, record_metrics=False)
+        with self._lock:
+            self.prefill_key = key
+            self.prefill_request = request
+            self.stats["prefills"] += 1
+        backend = self.backend or get_backend()
+        self._executor.submit(backend.run, request)
+
+    def cancel_prefill(self):
+        with self._lock:
+            request, self.prefill_request = self.prefill_request, None
+            self.prefill_key = None
+        if request is not None and request.metrics.end is None:
+            request.cancel()
+            self.stats["cancelled"] += 1
+
+    def submitted(self):
+        # The real request is about to go out: stop prefilling (the scheduler would
+        # preempt it anyway) and forget the last prefix
+        self.cancel_prefill()
+
+    def shutdown(self):
+        self.cancel_prefill()
+        self._executor.shutdown(wait=False)
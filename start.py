@@ -1,56 +1,177 @@
-from interpreter import interpreter
-import google_tool
+from startup_profile import StartupProfiler
+profiler = StartupProfiler()  # --profile-startup; must come before the heavy imports
+
+import importlib
 import os
-import sys
+import threading
+from context_manager import ContextManager, estimate_tokens, ollama_summarizer, REPLY_RESERVE
+from memory_index import MemoryIndex
+from model_profiles import get_profiles
 
 # --- CONFIG ---
-interpreter.llm.api_base = "http://localhost:11434"
-interpreter.llm.model = "ollama/OMI"
-interpreter.llm.api_key = "fake-key"
-interpreter.offline = True
-interpreter.auto_run = True 
-
-# --- MEMORY ---
-try:
-    with open("memory.md", "r") as f: mem = f.read()
-except: mem = ""
+# Also read the top N result pages on 'search' (0 = snippets only)
+FETCH_PAGES = int(os.environ.get("OMI_FETCH_PAGES", "0"))
 
-interpreter.system_message = f"""
+SYSTEM_MESSAGE = f"""
 You are OMI. User: {os.getlogin()}. OS: Arch Linux.
-Memory: {mem}
 
 INSTRUCTIONS:
-You are a summarizer and helper. 
+You are a summarizer and helper.
 If the user provides search results, summarize them clearly.
 If the user asks for code, write it.
 """
 
+# --- MODEL PROFILE ---
+# Which model to use comes from the active profile ('profile <name>' switches).
+# interpreter only sends the model name, so a profile's options reach it through
+# the Modelfile the profile was created from (python model_profiles.py create <name>).
+profiles = get_profiles()
+
+# --- BACKGROUND LOADING ---
+# `interpreter` takes seconds to import. The prompt shows up right away and
+# the import (plus the model warmup) runs while the user is typing.
+loaded = {}
+
+def load_interpreter():
+    with profiler.phase("import interpreter"):
+        from interpreter import interpreter
+    interpreter.llm.api_base = "http://localhost:11434"
+    interpreter.llm.model = f"ollama/{profiles.active().model}"
+    interpreter.llm.api_key = "fake-key"
+    interpreter.offline = True
+    interpreter.auto_run = True
+    interpreter.llm.context_window = profiles.active().num_ctx
+    interpreter.llm.max_tokens = REPLY_RESERVE
+    interpreter.system_message = SYSTEM_MESSAGE
+    loaded["interpreter"] = interpreter
+
+def start_warmup():
+    # Load the model while the banner prints and keep it loaded between prompts.
+    # No num_ctx here: interpreter sends the Modelfile defaults and a mismatch would reload.
+    with profiler.phase("start warmup"):
+        from ollama_backend import KeepAlive, get_backend
+        loaded["keep_alive"] = KeepAlive(get_backend(), profiles.active().model).start()
+
+def load_in_background():
+    try:
+        start_warmup()
+    except Exception as e:
+        print(f"Warmup unavailable: {e}")
+    load_interpreter()
+    # Only warms the module cache, so the first 'search' doesn't pay for the import
+    with profiler.phase("import web_search"):
+        importlib.import_module("web_search")
+
+loader = threading.Thread(target=load_in_background, name="loader", daemon=True)
+loader.start()
+
+def get_interpreter():
+    if "interpreter" not in loaded:
+        with profiler.phase("wait for interpreter"):
+            loader.join()
+        if "interpreter" not in loaded:
+            raise RuntimeError("open-interpreter failed to load")
+    return loaded["interpreter"]
+
+# --- MEMORY ---
+# memory.md is no longer pasted in whole: the context manager injects the
+# top-k relevant facts / past turns for each prompt (see memory_index.py)
+memory = MemoryIndex()
+
+# --- CONTEXT ---
+# interpreter only ever sees a token-budgeted window, the full history stays here.
+# Summaries go out without options, like interpreter's requests, so they never reload the model.
+context = ContextManager(
+    num_ctx=profiles.active().num_ctx,
+    reserve=REPLY_RESERVE + estimate_tokens(SYSTEM_MESSAGE),
+    summarizer=lambda summary, messages: ollama_summarizer(summary, messages, profile_options=False),
+    message_factory=lambda role, content: {"role": role, "type": "message", "content": content},
+    retriever=memory.snippets,
+)
+history = []
+
+def chat(prompt):
+    from scheduler import get_scheduler
+    interpreter = get_interpreter()
+    window = context.build(history, pending=prompt)
+    interpreter.messages = window
+    # interpreter talks to Ollama itself (litellm); holding an interactive slot
+    # still makes background jobs (summaries, warmup) step aside meanwhile
+    with get_scheduler().slot("terminal", name="interpreter"):
+        interpreter.chat(prompt)
+    history.extend(interpreter.messages[len(window):])
+
+def switch_profile(name):
+    # No restart: the next prompt goes to the new model, the keep-alive loads it now
+    profile = profiles.switch(name)
+    context.set_num_ctx(profile.num_ctx)
+    if "interpreter" in loaded:
+        loaded["interpreter"].llm.model = f"ollama/{profile.model}"
+        loaded["interpreter"].llm.context_window = profile.num_ctx
+    if "keep_alive" in loaded:
+        loaded["keep_alive"].retarget(profile.model)
+    print(f"   (profile: {profile.describe()})")
+
+def summarize_large(query, search_data):
+    # Too much material for one prompt: map-reduce it, stream the answer ourselves
+    from summarize_pipeline import SummaryPipeline, budget_for
+    profile = profiles.active()
+    # No options, same as interpreter: the Modelfile defaults, no reload
+    pipeline = SummaryPipeline(model=profile.model, options={}, final_budget=budget_for(profile.num_ctx))
+    print("   (large result set: summarizing in parts...)")
+    answer = []
+    for text in pipeline.run(query, search_data):
+        print(text, end="", flush=True)
+        answer.append(text)
+    print(f"\n   ({pipeline.report()})\n")
+    history.append({"role": "user", "type": "message", "content": f"search {query}"})
+    history.append({"role": "assistant", "type": "message", "content": "".join(answer)})
+
 print(f"  [OMI-AI Online] Mode: Middleware")
-print("  (Type 'search <topic>' to browse the web, or just chat)\n")
+print("  (Type 'search <topic>' to browse the web, 'profile [name]' to switch models, or just chat)\n")
+profiler.mark("prompt ready")
+
+if profiler.enabled:
+    # Report the prompt-ready time, then wait for the background loading too
+    loader.join()
+    profiler.finish()
 
 # --- THE SMART LOOP ---
 while True:
     try:
         user_input = input("(omi) > ")
-        
+
         # 1. EXIT COMMAND
         if user_input.lower() in ['exit', 'quit']:
             break
 
-        # 2. INTERCEPT SEARCH COMMANDS
+        # 2. MODEL PROFILES
+        elif user_input.lower() == "profile":
+            for name in profiles.names():
+                marker = "*" if name == profiles.active().name else " "
+                print(f"  {marker} {profiles.get(name).describe()}")
+        elif user_input.lower().startswith("profile "):
+            switch_profile(user_input[8:].strip())
+
+        # 3. INTERCEPT SEARCH COMMANDS
         elif user_input.lower().startswith("search "):
-            query = user_input[7:] 
-            # Run the tool directly via Python (No AI involvement)
-            search_data = google_tool.get_results(query)
-            
-            # Feed results to AI
-            prompt = f"I searched for '{query}'. Here are the results:\n{search_data}\n\nPlease summarize these findings."
-            interpreter.chat(prompt)
-            
-        # 3. NORMAL CHAT.
+            import web_search
+            query = user_input[7:]
+            # Google + DuckDuckGo in parallel, capped at web_search.DEADLINE (No AI involvement)
+            search_data = web_search.get_results(query, fetch_pages=FETCH_PAGES)
+
+            # Feed results to AI. What fits in one prompt depends on the active profile's num_ctx.
+            from summarize_pipeline import budget_for
+            if estimate_tokens(search_data) > budget_for(profiles.active().num_ctx):
+                summarize_large(query, search_data)
+            else:
+                prompt = f"I searched for '{query}'. Here are the results:\n{search_data}\n\nPlease summarize these findings."
+                chat(prompt)
+
+        # 4. NORMAL CHAT.
         else:
-            interpreter.chat(user_input)
-            
+            chat(user_input)
+
     except KeyboardInterrupt:
         print("\nUse 'exit' to quit.")
         continue
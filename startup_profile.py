@@ -0,0 +1,84 @@
+"""
+Startup profiler for --profile-startup.
+Times every module imported for the first time (inclusive of its own imports)
+and named startup phases, then prints a report to stderr.
+Import this before anything heavy, it can only see imports that happen after it.
+"""
+
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+FLAG = "--profile-startup"
+TOP_IMPORTS = 20
+
+
+class StartupProfiler:
+    def __init__(self, enabled=None):
+        self.enabled = FLAG in sys.argv if enabled is None else enabled
+        if self.enabled:
+            sys.argv.remove(FLAG)   # keep it away from Qt / Streamlit argument parsing
+        self.t0 = time.perf_counter()
+        self.phases = []        # (name, start, end) relative to t0
+        self.marks = []         # (name, time) relative to t0
+        self.imports = []       # (name, seconds, depth, thread)
+        self.reported = False
+        self._local = threading.local()
+        self._original_import = builtins.__import__
+        if self.enabled:
+            builtins.__import__ = self._import
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            self.imports.append((name, time.perf_counter() - start, depth,
+                                 threading.current_thread().name))
+
+    def now(self):
+        return time.perf_counter() - self.t0
+
+    @contextmanager
+    def phase(self, name):
+        start = self.now()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.phases.append((name, start, self.now()))
+
+    def mark(self, name):
+        if self.enabled:
+            self.marks.append((name, self.now()))
+
+    def report(self):
+        lines = [f"=== startup profile ({self.now() * 1000:.0f} ms since start) ==="]
+        lines.append("phases:")
+        for name, start, end in self.phases:
+            lines.append(f"  {name:<32} {start * 1000:8.1f} -> {end * 1000:8.1f} ms  ({(end - start) * 1000:7.1f} ms)")
+        for name, at in self.marks:
+            lines.append(f"  @ {name:<30} {at * 1000:8.1f} ms")
+
+        top_level = [i for i in self.imports if i[2] == 0]
+        lines.append(f"imports: {len(self.imports)} modules, "
+                     f"{sum(i[1] for i in top_level) * 1000:.1f} ms in top-level imports")
+        for name, seconds, depth, thread in sorted(self.imports, key=lambda i: -i[1])[:TOP_IMPORTS]:
+            where = "" if thread == "MainThread" else f"  [{thread}]"
+            lines.append(f"  {'  ' * min(depth, 4)}{name:<{36 - 2 * min(depth, 4)}} {seconds * 1000:8.1f} ms{where}")
+        return "\n".join(lines)
+
+    def finish(self):
+        # Print once and stop hooking imports
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        builtins.__import__ = self._original_import
+        print(self.report(), file=sys.stderr)
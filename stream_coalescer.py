@@ -0,0 +1,59 @@
+"""
+Chunk coalescing for streamed replies.
+The worker pushes every token in here, the UI drains it at most once per frame.
+"""
+
+import threading
+import time
+
+# ~60 FPS. Anything faster is wasted work for the text widget.
+FLUSH_INTERVAL_MS = 16
+
+
+class ChunkCoalescer:
+    def __init__(self, interval_ms=FLUSH_INTERVAL_MS):
+        self.interval_ms = interval_ms
+        self.chunks_received = 0
+        self.flushes = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake_pending = False
+        self._last_flush = 0.0
+
+    def push(self, chunk):
+        # Called from the worker thread.
+        # Returns True when the consumer needs a wake-up (nothing scheduled yet),
+        # so the worker only emits a signal once per flush instead of once per token.
+        if not chunk:
+            return False
+        with self._lock:
+            self._buffer.append(chunk)
+            self.chunks_received += 1
+            if self._wake_pending:
+                return False
+            self._wake_pending = True
+            return True
+
+    def delay_ms(self):
+        # How long the consumer should wait before flushing to respect the interval
+        elapsed = (time.monotonic() - self._last_flush) * 1000
+        return max(0, int(self.interval_ms - elapsed))
+
+    def drain(self):
+        # Called from the UI thread. Returns everything buffered as one string.
+        with self._lock:
+            self._wake_pending = False
+            if not self._buffer:
+                return ""
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self.flushes += 1
+        self._last_flush = time.monotonic()
+        return text
+
+    def stats(self):
+        return {
+            "chunks_received": self.chunks_received,
+            "flushes": self.flushes,
+            "interval_ms": self.interval_ms,
+        }
@@ -0,0 +1,196 @@
+"""
+Map-reduce summarization for material that does not fit in one prompt.
+The material (search results, fetched pages) is split into token-bounded
+chunks, each chunk is condensed into notes concurrently (bounded parallelism,
+"tool" priority in the scheduler), the notes are merged level by level until
+they fit, and the final answer is streamed. Material that already fits goes
+straight to the final step. Every stage is timed.
+"""
+
+import concurrent.futures
+import re
+import time
+
+from context_manager import NUM_CTX, REPLY_RESERVE, WORD, estimate_tokens
+
+# --- CONFIG ---
+CHUNK_TOKENS = 1500         # material per map call
+NOTES_TOKENS = 300          # num_predict for map / reduce calls
+FAN_IN = 4                  # notes merged per reduce call
+FINAL_PROMPT_TOKENS = 300   # the final prompt's own text around the material
+
+SECTION = re.compile(r"(?=\n--- (?:RESULT|PAGE) )")
+PARAGRAPH = re.compile(r"\n\s*\n")
+SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+MAP_PROMPT = (
+    "Topic: {topic}\n\n"
+    "Extract everything in the material below that helps with this topic: facts, names, "
+    "numbers, commands, links. Write short notes, no introduction.\n\nMaterial:\n{text}"
+)
+REDUCE_PROMPT = (
+    "Topic: {topic}\n\n"
+    "Merge these notes into one set of notes. Drop duplicates, keep every distinct fact.\n\n{text}"
+)
+FINAL_PROMPT = "I searched for '{topic}'. Here are the results:\n{text}\n\nPlease summarize these findings."
+
+
+def budget_for(num_ctx=NUM_CTX):
+    # Room for material in the final prompt, for a model with this context window
+    return num_ctx - REPLY_RESERVE - FINAL_PROMPT_TOKENS
+
+
+def split_text(text, max_tokens=CHUNK_TOKENS):
+    # Sections, then paragraphs, then sentences, then a hard cut: packed into chunks <= max_tokens
+    pieces = []
+    for section in SECTION.split(text):
+        for paragraph in PARAGRAPH.split(section):
+            if estimate_tokens(paragraph) <= max_tokens:
+                pieces.append(paragraph)
+                continue
+            for sentence in SENTENCE.split(paragraph):
+                while estimate_tokens(sentence) > max_tokens:
+                    cut = max_tokens * 4
+                    while cut > 1 and estimate_tokens(sentence[:cut]) > max_tokens:
+                        cut = cut * 3 // 4  # dense text (many short words) counts more per char
+                    pieces.append(sentence[:cut])
+                    sentence = sentence[cut:]
+                pieces.append(sentence)
+
+    # Characters and words add up exactly across the joins (per-piece estimates don't,
+    # the separators and rounding push the joined chunk over), so track those
+    chunks, current, chars, words = [], [], 0, 0
+    for piece in pieces:
+        piece = piece.strip()
+        if not piece:
+            continue
+        piece_words = len(WORD.findall(piece))
+        joined_chars = chars + len(piece) + (2 if current else 0)
+        if current and max(joined_chars // 4, int((words + piece_words) * 0.75)) > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, chars, words = [], 0, 0
+            joined_chars = len(piece)
+        current.append(piece)
+        chars = joined_chars
+        words += piece_words
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class SummaryPipeline:
+    def __init__(self, backend=None, model=None, parallel=None, chunk_tokens=CHUNK_TOKENS,
+                 fan_in=FAN_IN, final_budget=None, options=None):
+        if backend is None:
+            from ollama_backend import get_backend
+            backend = get_backend()
+        if parallel is None:
+            from scheduler import get_scheduler
+            parallel = get_scheduler().max_concurrent
+        self.backend = backend
+        self.model = model
+        self.parallel = max(1, parallel)
+        self.chunk_tokens = chunk_tokens
+        self.fan_in = max(2, fan_in)
+        self.options = dict({"num_ctx": NUM_CTX} if options is None else options)
+        # By default: whatever the num_ctx the requests go out with leaves for material
+        if final_budget is None:
+            final_budget = budget_for(self.options.get("num_ctx", NUM_CTX))
+        self.final_budget = final_budget
+        self.timings = {}
+        self.counts = {}
+        self.errors = []
+
+    # --- Stages ---
+    def condense(self, prompt):
+        from scheduler import TOOL
+        options = dict(self.options, num_predict=NOTES_TOKENS)
+        response = self.backend.chat([{"role": "user", "content": prompt}], self.model, options, priority=TOOL)
+        return response["message"]["content"].strip()
+
+    def condense_all(self, prompts):
+        # Bounded parallel map; a failed call loses that chunk, not the whole answer
+        results = [None] * len(prompts)
+        with concurrent.futures.ThreadPoolExecutor(self.parallel, thread_name_prefix="summarize") as pool:
+            futures = {pool.submit(self.condense, p): i for i, p in enumerate(prompts)}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    self.errors.append(str(e))
+        notes = [r for r in results if r]
+        if not notes:
+            raise RuntimeError(f"summarization failed: {self.errors[0] if self.errors else 'no output'}")
+        return notes
+
+    def map(self, topic, chunks):
+        return self.condense_all([MAP_PROMPT.format(topic=topic, text=c) for c in chunks])
+
+    def reduce(self, topic, notes):
+        # Merge notes in groups of up to fan_in (and chunk_tokens) until they fit the final prompt
+        levels = 0
+        while len(notes) > 1 and sum(estimate_tokens(n) for n in notes) > self.final_budget:
+            groups, current, used = [], [], 0
+            for note in notes:
+                cost = estimate_tokens(note)
+                if current and (len(current) >= self.fan_in or used + cost > self.chunk_tokens):
+                    groups.append(current)
+                    current, used = [], 0
+                current.append(note)
+                used += cost
+            groups.append(current)
+            if all(len(g) == 1 for g in groups):
+                break   # nothing left to merge pairwise, let the final prompt take it
+            merged = self.condense_all([REDUCE_PROMPT.format(topic=topic, text="\n\n---\n\n".join(g))
+                                        for g in groups if len(g) > 1])
+            notes = merged + [g[0] for g in groups if len(g) == 1]
+            levels += 1
+        self.counts["reduce_levels"] = levels
+        return notes
+
+    def final(self, topic, text, prompt=FINAL_PROMPT):
+        from scheduler import INTERACTIVE
+        messages = [{"role": "user", "content": prompt.format(topic=topic, text=text)}]
+        for chunk in self.backend.stream_chat(messages, self.model, self.options, priority=INTERACTIVE):
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                yield content
+
+    def run(self, topic, material):
+        # Generator of answer text. Timings / counts are filled in as the stages finish.
+        self.timings, self.counts, self.errors = {}, {}, []
+        start = time.perf_counter()
+        text = material
+        if estimate_tokens(material) > self.final_budget:
+            chunks = split_text(material, self.chunk_tokens)
+            self.counts["chunks"] = len(chunks)
+            self.timings["split"] = time.perf_counter() - start
+
+            stage = time.perf_counter()
+            notes = self.map(topic, chunks)
+            self.timings["map"] = time.perf_counter() - stage
+
+            stage = time.perf_counter()
+            notes = self.reduce(topic, notes)
+            self.timings["reduce"] = time.perf_counter() - stage
+            text = "\n\n".join(notes)
+        else:
+            self.counts["chunks"] = 0   # small enough, no map / reduce
+
+        stage = time.perf_counter()
+        first = True
+        for content in self.final(topic, text):
+            if first:
+                self.timings["final_first_token"] = time.perf_counter() - stage
+                first = False
+            yield content
+        self.timings["final"] = time.perf_counter() - stage
+        self.timings["total"] = time.perf_counter() - start
+
+    def report(self):
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()]
+        if self.counts.get("chunks"):
+            parts.append(f"{self.counts['chunks']} chunks, {self.counts.get('reduce_levels', 0)} reduce levels")
+        if self.errors:
+            parts.append(f"{len(self.errors)} failed calls")
+        return " · ".join(parts)
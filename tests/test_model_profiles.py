@@ -0,0 +1,142 @@
+"""
+model_profiles against a stub backend whose decode speed follows the mock
+server's CurveConfig: AutoTuner picks the curve's best setting, ProfileManager.tune
+stores it, and Modelfiles survive a parse / render round trip.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "bench")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from mock_ollama import CurveConfig
+from model_profiles import AutoTuner, ProfileManager, default_profile
+from modelfile import load_modelfile, parse_modelfile, render_modelfile
+
+
+class StubBackend:
+    # run(request) finishes the request's metrics with Ollama-style stats at the
+    # curve's speed for the request options. Options listed in `failing` error out.
+    def __init__(self, config, failing=()):
+        self.config = config
+        self.failing = list(failing)
+        self.requests = []
+
+    def run(self, request):
+        self.requests.append(request)
+        options = request.options
+        if any(all(options.get(k) == v for k, v in bad.items()) for bad in self.failing):
+            request.metrics.finish(error="model failed to load")
+            return
+        tokens = options["num_predict"]
+        request.metrics.finish({"done": True, "eval_count": tokens, "prompt_eval_count": 20,
+                                "eval_duration": int(tokens / self.config.eval_rate(options) * 1e9),
+                                "prompt_eval_duration": int(20 / self.config.prompt_eval_rate * 1e9)})
+
+
+class AutoTunerTest(unittest.TestCase):
+    def setUp(self):
+        self.config = CurveConfig(cores=6, best_batch=256)
+        self.backend = StubBackend(self.config)
+
+    def test_picks_the_fastest_candidate(self):
+        tuner = AutoTuner(default_profile(), self.backend, runs=2, tokens=16)
+        candidates = tuner.candidates([3, 6, 12], [128, 256, 512])
+        best, results = tuner.run(candidates)
+        self.assertEqual(best["options"], {"num_thread": 6, "num_batch": 256})
+        self.assertAlmostEqual(best["tok_s"], self.config.eval_rate(best["options"]), delta=0.5)
+        self.assertEqual(len(results), len(candidates))
+        # One load request plus `runs` measured ones per candidate, never from the response cache
+        self.assertEqual(len(self.backend.requests), len(candidates) * 3)
+        self.assertTrue(all(not r.use_cache for r in self.backend.requests))
+        self.assertTrue(all(r.options["num_predict"] == 16 for r in self.backend.requests))
+
+    def test_candidates_keep_the_profile_options(self):
+        profile = default_profile()
+        tuner = AutoTuner(profile, self.backend, runs=1)
+        tuner.run([{"num_thread": 4, "num_batch": 512}])
+        options = self.backend.requests[0].options
+        self.assertEqual(options["num_ctx"], profile.num_ctx)
+        self.assertEqual((options["num_thread"], options["num_batch"]), (4, 512))
+
+    def test_failed_candidates_are_reported_not_chosen(self):
+        backend = StubBackend(self.config, failing=[{"num_thread": 6}])
+        tuner = AutoTuner(default_profile(), backend, runs=1)
+        seen = []
+        best, results = tuner.run(tuner.candidates([3, 6], [256]), on_result=seen.append)
+        self.assertEqual(best["options"], {"num_thread": 3, "num_batch": 256})
+        self.assertEqual(results[1], {"options": {"num_thread": 6, "num_batch": 256},
+                                      "error": "model failed to load"})
+        self.assertEqual(seen, results)
+
+    def test_nothing_measured(self):
+        backend = StubBackend(self.config, failing=[{}])
+        tuner = AutoTuner(default_profile(), backend, runs=1)
+        best, results = tuner.run(tuner.candidates([2], [512]))
+        self.assertIsNone(best)
+        self.assertIn("error", results[0])
+
+
+class ProfileManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "profiles.json")
+        self.manager = ProfileManager(self.path)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_tune_stores_the_best_setting(self):
+        config = CurveConfig(cores=4, best_batch=512)
+        switched = []
+        self.manager.on_switch(switched.append)
+        profile, best = self.manager.tune("omi", [2, 4, 8], [256, 512], backend=StubBackend(config))
+        self.assertEqual(best["options"], {"num_thread": 4, "num_batch": 512})
+        self.assertEqual((profile.parameters["num_thread"], profile.parameters["num_batch"]), (4, 512))
+        self.assertAlmostEqual(profile.tuned["tok_s"], best["tok_s"])
+        self.assertEqual(len(profile.tuned["results"]), 6)
+        # The active profile changed: listeners hear about it, and it is saved
+        self.assertEqual(switched, [profile])
+        reloaded = ProfileManager(self.path).active()
+        self.assertEqual(reloaded.options(), profile.options())
+
+    def test_tune_without_a_measurement_raises(self):
+        before = dict(self.manager.active().parameters)
+        with self.assertRaises(RuntimeError):
+            self.manager.tune("omi", [2], [512], backend=StubBackend(CurveConfig(), failing=[{}]))
+        self.assertEqual(self.manager.active().parameters, before)
+        self.assertIsNone(self.manager.active().tuned)
+
+
+class ModelfileTest(unittest.TestCase):
+    def test_repo_modelfile_round_trip(self):
+        spec = load_modelfile()
+        self.assertEqual(spec["parameters"]["stop"], ["<|im_start|>", "<|im_end|>"])
+        self.assertEqual(spec["parameters"]["temperature"], 0.85)
+        self.assertEqual(parse_modelfile(render_modelfile(spec)), spec)
+
+    def test_values_that_need_quotes(self):
+        spec = {"from": "./model.gguf", "template": None, "system": "Be brief.",
+                "parameters": {"num_ctx": 8192, "top_p": 0.9, "stop": ["<|im_end|>", "User:"], "seed": "with space"}}
+        self.assertEqual(parse_modelfile(render_modelfile(spec)), spec)
+
+    def test_profile_modelfile_overrides_parameters(self):
+        profile = default_profile()
+        profile.base = "./Other.Q8_0.gguf"
+        profile.parameters.update(num_ctx=8192, num_thread=6)
+        spec = parse_modelfile(profile.modelfile())
+        repo = load_modelfile()
+        self.assertEqual(spec["from"], "./Other.Q8_0.gguf")
+        self.assertEqual((spec["template"], spec["system"]), (repo["template"], repo["system"]))
+        self.assertEqual(spec["parameters"], dict(repo["parameters"], num_ctx=8192, num_thread=6))
+
+
+if __name__ == "__main__":
+    unittest.main()
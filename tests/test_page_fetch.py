@@ -0,0 +1,196 @@
+"""
+page_fetch against a local http.server on a thread: the per-host limit, the
+byte cap, non-text pages, the overall deadline, text extraction (skipped
+regions with unclosed / void tags) and chunk_text boundaries.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from context_manager import estimate_tokens
+from page_fetch import PageFetcher, TextExtractor, chunk_text
+
+ARTICLE = "<p>This paragraph is real article text, long enough to count as content.</p>"
+
+
+def extract(html, pieces=1):
+    # Fed in `pieces` parts, like a download arriving in chunks
+    extractor = TextExtractor()
+    step = max(1, len(html) // pieces)
+    for i in range(0, len(html), step):
+        extractor.feed(html[i:i + step])
+    extractor.close()
+    return extractor.text()
+
+
+class Handler(BaseHTTPRequestHandler):
+    # /page/<n>: small article. /slow/<seconds>: article after a delay, counting
+    # how many are in flight. /big: 20000 bytes of two-byte characters. /image: a PNG.
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, body, kind="text/html; charset=utf-8"):
+        self.send_response(200)
+        self.send_header("Content-Type", kind)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass    # the client gave up (byte cap / deadline)
+
+    def do_GET(self):
+        if self.path.startswith("/slow/"):
+            cls = type(self)
+            with cls.lock:
+                cls.active += 1
+                cls.peak = max(cls.peak, cls.active)
+            time.sleep(float(self.path[6:]))
+            with cls.lock:
+                cls.active -= 1
+            self.send(f"<html><body>{ARTICLE}</body></html>".encode())
+        elif self.path == "/big":
+            self.send(("<html><body><p>" + "é" * 10000 + "</p></body></html>").encode())
+        elif self.path == "/image":
+            self.send(b"\x89PNG\r\n\x1a\n" + b"\0" * 100, "image/png")
+        else:
+            self.send(f"<html><head><title>Page {self.path}</title></head><body>{ARTICLE}</body></html>".encode())
+
+
+class PageFetcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.active = Handler.peak = 0
+        self.fetcher = PageFetcher(timeout=5.0, max_per_host=2)
+
+    def tearDown(self):
+        self.fetcher.close()
+
+    def test_fetch_extracts_title_and_text(self):
+        page = self.fetcher.fetch(f"{self.base}/page/1")
+        self.assertEqual(page["title"], "Page /page/1")
+        self.assertIn("real article text", page["text"])
+
+    def test_per_host_limit(self):
+        pages = self.fetcher.fetch_all([f"{self.base}/slow/0.3" for _ in range(6)], deadline=10)
+        self.assertEqual(len(pages), 6)
+        self.assertEqual(Handler.peak, 2)
+
+    def test_byte_cap_counts_bytes_not_characters(self):
+        fetcher = PageFetcher(timeout=5.0, max_bytes=1001)
+        try:
+            page = fetcher.fetch(f"{self.base}/big")
+        finally:
+            fetcher.close()
+        self.assertEqual(page["bytes"], 1001)
+        # "é" is two bytes in UTF-8: about 500 characters fit in 1001 bytes
+        self.assertLess(len(page["text"]), 520)
+        self.assertGreater(len(page["text"]), 450)
+
+    def test_non_text_pages_are_rejected(self):
+        with self.assertRaises(ValueError):
+            self.fetcher.fetch(f"{self.base}/image")
+        pages = self.fetcher.fetch_all([f"{self.base}/image", f"{self.base}/page/2"], deadline=5)
+        self.assertEqual([p["url"] for p in pages], [f"{self.base}/page/2"])
+
+    def test_slow_pages_are_dropped_at_the_deadline(self):
+        urls = [f"{self.base}/slow/3", f"{self.base}/page/3", f"{self.base}/slow/0.01"]
+        start = time.perf_counter()
+        pages = self.fetcher.fetch_all(urls, deadline=1.0)
+        self.assertLess(time.perf_counter() - start, 2.0)
+        # In `urls` order, without the slow one
+        self.assertEqual([p["url"] for p in pages], urls[1:])
+
+
+class TextExtractorTest(unittest.TestCase):
+    def test_script_style_and_nav_are_skipped(self):
+        text = extract("<html><head><style>p { color: red }</style><script>var x = '<p>not text</p>';</script>"
+                       f"</head><body><nav>Home About Contact and a long menu entry nobody reads</nav>{ARTICLE}"
+                       "<footer>Copyright notice for the whole site, all rights reserved.</footer></body></html>")
+        self.assertEqual(text, "This paragraph is real article text, long enough to count as content.")
+
+    def test_unclosed_tags_inside_skipped_regions(self):
+        # <li> and <p> may legally go unclosed; they must not keep the skip open
+        html = ("<header><p>Tagline of the site that nobody needs in a prompt</header>"
+                "<nav><ul><li>Home<li>About<li>Contact</ul></nav>"
+                f"<article><h1>Title</h1>{ARTICLE}</article>")
+        for pieces in (1, 7, len(html)):
+            self.assertEqual(extract(html, pieces), "This paragraph is real article text, long enough to count "
+                             "as content.", pieces)
+
+    def test_unclosed_skip_tag_is_closed_by_its_parent(self):
+        html = ("<aside><form><button>Subscribe to the newsletter for more news</aside>"
+                f"{ARTICLE}")
+        self.assertIn("real article text", extract(html))
+        self.assertNotIn("Subscribe", extract(html))
+
+    def test_void_tags_do_not_open_anything(self):
+        html = (f"<nav><img src='logo.png'><br>Menu entry that is long enough to be kept</nav>"
+                f"<p>First line of the article that is long enough.<br>Second line that is long enough too.</p>"
+                "<hr><input type='text'>" + ARTICLE)
+        text = extract(html)
+        self.assertNotIn("Menu", text)
+        self.assertEqual(text.split("\n"), ["First line of the article that is long enough.",
+                                            "Second line that is long enough too.",
+                                            "This paragraph is real article text, long enough to count as content."])
+
+    def test_nested_skip_tags(self):
+        html = ("<nav><div><nav>inner menu</nav>still in the outer nav, long enough to be kept</div></nav>"
+                + ARTICLE)
+        self.assertEqual(extract(html), "This paragraph is real article text, long enough to count as content.")
+
+    def test_stray_end_tag_is_ignored(self):
+        self.assertIn("real article text", extract("</nav></script>" + ARTICLE))
+
+
+class ChunkTextTest(unittest.TestCase):
+    def test_chunks_are_paragraph_aligned_and_bounded(self):
+        paragraphs = [f"Paragraph {i} " + "with some words in it " * (5 + i % 7) for i in range(60)]
+        chunks = chunk_text("\n".join(paragraphs), max_tokens=100, max_chunks=100)
+        for chunk in chunks:
+            self.assertLessEqual(sum(estimate_tokens(line) for line in chunk.split("\n")), 100)
+        # Nothing split or lost, in order
+        self.assertEqual("\n".join(chunks).split("\n"), paragraphs)
+
+    def test_max_chunks(self):
+        text = "\n".join("A line of text that costs a few tokens." for _ in range(200))
+        self.assertEqual(len(chunk_text(text, max_tokens=50, max_chunks=3)), 3)
+
+    def test_huge_paragraph_is_cut(self):
+        chunks = chunk_text("short first paragraph\n" + "y" * 10000 + "\nlast", max_tokens=100, max_chunks=10)
+        self.assertEqual(chunks[0], "short first paragraph")
+        self.assertEqual(chunks[1], "y" * 400)
+        self.assertEqual(chunks[-1], "last")
+
+    def test_empty_text(self):
+        self.assertEqual(chunk_text(""), [])
+        self.assertEqual(chunk_text("\n\n"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
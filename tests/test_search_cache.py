@@ -0,0 +1,151 @@
+"""
+search_cache.SearchCache against a stub fetch: key normalization, TTL,
+stale-while-revalidate, LRU trimming, stats() and what never gets cached.
+Ages are simulated by moving timestamps back in the database, no sleeping.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from search_cache import SearchCache
+
+
+class StubFetch:
+    # fetch(query, num_results) that records its calls and returns canned results
+    def __init__(self, results=None):
+        self.calls = []
+        self.results = results
+
+    def __call__(self, query, num_results):
+        self.calls.append((query, num_results))
+        if self.results is not None:
+            return self.results
+        return [{"title": f"{query} #{len(self.calls)}", "url": "http://example.com"}]
+
+
+class SearchCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = SearchCache(os.path.join(self.folder.name, "search.db"), ttl=60, stale_ttl=600,
+                                 max_entries=3)
+
+    def tearDown(self):
+        self.cache.conn.close()
+        self.folder.cleanup()
+
+    def age(self, seconds):
+        # Every entry was created and last used `seconds` earlier
+        with self.cache._lock:
+            self.cache.conn.execute("UPDATE results SET created = created - ?, accessed = accessed - ?",
+                                    (seconds, seconds))
+            self.cache.conn.commit()
+
+    def wait_for_refresh(self, count=1, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while self.cache.stats()["refreshes"] < count:
+            if time.monotonic() > deadline:
+                self.fail("background refresh did not finish")
+            time.sleep(0.01)
+
+    def test_query_is_normalized(self):
+        fetch = StubFetch()
+        first = self.cache.get_or_fetch("ddg", "Arch  Linux", 5, fetch)
+        self.assertEqual(self.cache.get_or_fetch("ddg", "  arch linux ", 5, fetch), first)
+        self.assertEqual(len(fetch.calls), 1)
+
+    def test_provider_and_count_are_part_of_the_key(self):
+        fetch = StubFetch()
+        self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.cache.get_or_fetch("google", "arch", 5, fetch)
+        self.cache.get_or_fetch("ddg", "arch", 10, fetch)
+        self.assertEqual(len(fetch.calls), 3)
+
+    def test_fresh_entry_is_served_from_cache(self):
+        fetch = StubFetch()
+        first = self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.age(59)
+        self.assertEqual(self.cache.get_or_fetch("ddg", "arch", 5, fetch), first)
+        self.assertEqual(len(fetch.calls), 1)
+
+    def test_expired_entry_is_fetched_again(self):
+        fetch = StubFetch()
+        self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.age(601)
+        second = self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.assertEqual(second[0]["title"], "arch #2")
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_stale_entry_is_served_then_refreshed(self):
+        fetch = StubFetch()
+        first = self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.age(120)
+        # Old results right away, the fetch happens in the background
+        self.assertEqual(self.cache.get_or_fetch("ddg", "arch", 5, fetch), first)
+        self.wait_for_refresh()
+        self.assertEqual(len(fetch.calls), 2)
+        refreshed = self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.assertEqual(refreshed[0]["title"], "arch #2")
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["stale_hits"], stats["misses"]), (1, 1, 1))
+
+    def test_least_recently_used_entries_are_trimmed(self):
+        fetch = StubFetch()
+        for query in ("a", "b", "c"):
+            self.cache.get_or_fetch("ddg", query, 5, fetch)
+        self.age(10)
+        self.cache.get_or_fetch("ddg", "a", 5, fetch)      # a is now the most recently used
+        self.cache.get_or_fetch("ddg", "d", 5, fetch)      # pushes out b, the oldest of the rest
+        self.assertEqual(self.cache.stats()["entries"], 3)
+        calls = len(fetch.calls)
+        self.cache.get_or_fetch("ddg", "b", 5, fetch)
+        self.assertEqual(len(fetch.calls), calls + 1)
+
+    def test_stats(self):
+        fetch = StubFetch()
+        self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.cache.get_or_fetch("ddg", "linux", 5, fetch)
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["stale_hits"], 0)
+        self.assertEqual(stats["entries"], 2)
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+    def test_empty_results_are_not_cached(self):
+        fetch = StubFetch(results=[])
+        self.assertEqual(self.cache.get_or_fetch("ddg", "nothing", 5, fetch), [])
+        self.cache.get_or_fetch("ddg", "nothing", 5, fetch)
+        self.assertEqual(len(fetch.calls), 2)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_empty_refresh_keeps_the_stale_entry(self):
+        first = self.cache.get_or_fetch("ddg", "arch", 5, StubFetch())
+        self.age(120)
+        empty = StubFetch(results=[])
+        self.assertEqual(self.cache.get_or_fetch("ddg", "arch", 5, empty), first)
+        self.wait_for_refresh()
+        self.assertEqual(self.cache.get_or_fetch("ddg", "arch", 5, empty), first)
+
+    def test_errors_are_not_cached(self):
+        def failing(query, num_results):
+            raise RuntimeError("offline")
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_fetch("ddg", "arch", 5, failing)
+        fetch = StubFetch()
+        self.cache.get_or_fetch("ddg", "arch", 5, fetch)
+        self.assertEqual(len(fetch.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+summarize_pipeline against a stub backend (chat / stream_chat, no server):
+split_text bounds, map order with a failed chunk, reduce levels, the
+straight-to-final path, the streamed answer and the timing report.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from context_manager import NUM_CTX, estimate_tokens
+from summarize_pipeline import REPLY_RESERVE, FINAL_PROMPT_TOKENS, SummaryPipeline, budget_for, split_text
+
+
+class StubBackend:
+    # Map calls answer "notes <first word of the chunk>", reduce calls answer `merged`.
+    # A chunk containing FAIL raises. The final answer streams ANSWER word by word.
+    ANSWER = "The short answer is yes ."
+
+    def __init__(self, merged="merged notes"):
+        self.merged = merged
+        self.prompts = []
+        self.final_messages = None
+        self._lock = threading.Lock()
+
+    def chat(self, messages, model=None, options=None, keep_alive=None, priority=None, session=None):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.prompts.append(prompt)
+        if "FAIL" in prompt:
+            raise RuntimeError("model error")
+        if prompt.startswith("Topic:") and "Merge these notes" in prompt:
+            content = self.merged
+        else:
+            material = prompt.split("Material:\n", 1)[1]
+            content = f"notes {material.split()[0]}"
+        return {"message": {"role": "assistant", "content": content}, "done": True}
+
+    def stream_chat(self, messages, model=None, options=None, keep_alive=None, request=None, priority=None,
+                    session=None, on_wait=None):
+        self.final_messages = messages
+        for word in self.ANSWER.split(" "):
+            yield {"message": {"content": word + " "}, "done": False}
+        yield {"message": {"content": ""}, "done": True}
+
+    def reduce_calls(self):
+        return [p for p in self.prompts if "Merge these notes" in p]
+
+
+def pipeline(backend, **kwargs):
+    kwargs.setdefault("parallel", 2)
+    return SummaryPipeline(backend, model="stub", **kwargs)
+
+
+class SplitTextTest(unittest.TestCase):
+    def test_chunks_stay_within_the_bound(self):
+        sections = "".join(f"\n--- RESULT {i} ---\n" + "A short sentence about things. " * 40 for i in range(6))
+        run_on = "x" * 5000     # no paragraph or sentence break at all: hard cut
+        dense = "a " * 3000     # many words per character: the cut has to be shorter
+        for max_tokens in (50, 200, 1500):
+            chunks = split_text(sections + "\n\n" + run_on + "\n\n" + dense, max_tokens)
+            self.assertGreater(len(chunks), 1)
+            for chunk in chunks:
+                self.assertTrue(chunk.strip())
+                self.assertLessEqual(estimate_tokens(chunk), max_tokens, (max_tokens, chunk[:60]))
+
+    def test_nothing_is_lost(self):
+        words = [f"w{i}" for i in range(3000)]
+        text = "\n\n".join(" ".join(words[i:i + 50]) + "." for i in range(0, len(words), 50))
+        chunks = split_text(text, 100)
+        self.assertEqual(" ".join(chunks).replace(".", " ").split(), words)
+
+    def test_small_text_is_one_chunk(self):
+        self.assertEqual(split_text("one paragraph.\n\nanother one.", 100), ["one paragraph.\n\nanother one."])
+
+
+class SummaryPipelineTest(unittest.TestCase):
+    def test_map_keeps_chunk_order_when_a_call_fails(self):
+        backend = StubBackend()
+        p = pipeline(backend, parallel=4)
+        notes = p.map("topic", [f"chunk{i} text" if i != 2 else "FAIL chunk2" for i in range(6)])
+        self.assertEqual(notes, ["notes chunk0", "notes chunk1", "notes chunk3", "notes chunk4", "notes chunk5"])
+        self.assertEqual(len(p.errors), 1)
+
+    def test_map_fails_when_every_call_fails(self):
+        p = pipeline(StubBackend())
+        with self.assertRaises(RuntimeError):
+            p.map("topic", ["FAIL a", "FAIL b"])
+
+    def test_reduce_merges_level_by_level(self):
+        # Every merge is still over budget, so 8 notes -> 4 -> 2 -> 1
+        backend = StubBackend(merged="word " * 100)
+        p = pipeline(backend, fan_in=2, final_budget=50)
+        notes = p.reduce("topic", ["note " * 40] * 8)
+        self.assertEqual(len(notes), 1)
+        self.assertEqual(p.counts["reduce_levels"], 3)
+        self.assertEqual(len(backend.reduce_calls()), 4 + 2 + 1)
+
+    def test_reduce_stops_once_notes_fit(self):
+        backend = StubBackend(merged="short")
+        p = pipeline(backend, fan_in=4, final_budget=50)
+        notes = p.reduce("topic", ["note " * 40] * 8)
+        self.assertEqual(notes, ["short", "short"])
+        self.assertEqual(p.counts["reduce_levels"], 1)
+
+    def test_reduce_breaks_when_every_group_holds_one_note(self):
+        # Each note alone is over chunk_tokens: nothing can be merged pairwise
+        backend = StubBackend()
+        p = pipeline(backend, fan_in=4, chunk_tokens=10, final_budget=50)
+        big = ["note " * 40, "other " * 40, "third " * 40]
+        self.assertEqual(p.reduce("topic", big), big)
+        self.assertEqual(p.counts["reduce_levels"], 0)
+        self.assertEqual(backend.reduce_calls(), [])
+
+    def test_material_that_fits_goes_straight_to_the_final_step(self):
+        backend = StubBackend()
+        p = pipeline(backend, final_budget=500)
+        answer = "".join(p.run("arc reactor", "Some small search result."))
+        self.assertEqual(answer, StubBackend.ANSWER + " ")
+        self.assertEqual(backend.prompts, [])       # no map / reduce calls
+        self.assertEqual(p.counts["chunks"], 0)
+        self.assertIn("Some small search result.", backend.final_messages[0]["content"])
+        self.assertEqual(set(p.timings), {"final_first_token", "final", "total"})
+
+    def test_large_material_is_mapped_then_answered(self):
+        backend = StubBackend(merged="merged")
+        p = pipeline(backend, chunk_tokens=100, final_budget=5, fan_in=4)
+        material = "\n\n".join(f"para{i} " + "filler text here. " * 30 for i in range(10))
+        streamed = list(p.run("topic", material))
+        # The answer arrives in pieces, in order
+        self.assertGreater(len(streamed), 1)
+        self.assertEqual("".join(streamed), StubBackend.ANSWER + " ")
+        self.assertEqual(p.counts["chunks"], len(split_text(material, 100)))
+        self.assertGreaterEqual(p.counts["reduce_levels"], 1)
+        self.assertEqual(set(p.timings), {"split", "map", "reduce", "final_first_token", "final", "total"})
+        report = p.report()
+        for key in ("split", "map", "reduce", "final_first_token", "final", "total"):
+            self.assertIn(f"{key} ", report)
+        self.assertIn(f"{p.counts['chunks']} chunks", report)
+
+    def test_report_counts_failed_calls(self):
+        backend = StubBackend()
+        p = pipeline(backend, chunk_tokens=60, final_budget=10 ** 6)
+        p.map("topic", ["FAIL x", "fine y"])
+        self.assertIn("1 failed calls", p.report())
+
+    def test_final_budget_follows_num_ctx(self):
+        self.assertEqual(budget_for(8192), 8192 - REPLY_RESERVE - FINAL_PROMPT_TOKENS)
+        p = pipeline(StubBackend(), options={"num_ctx": 8192})
+        self.assertEqual(p.final_budget, budget_for(8192))
+        self.assertEqual(pipeline(StubBackend(), final_budget=77).final_budget, 77)
+
+    def test_empty_options_stay_empty(self):
+        # start.py sends none, like interpreter, so the Modelfile defaults apply
+        self.assertEqual(pipeline(StubBackend(), options={}).options, {})
+        self.assertEqual(pipeline(StubBackend()).options, {"num_ctx": NUM_CTX})
+
+
+if __name__ == "__main__":
+    unittest.main()
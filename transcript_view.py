@@ -0,0 +1,272 @@
+"""
+Virtualized chat transcript.
+One list row per message. Only rows that are actually painted get a laid-out
+QTextDocument, and documents for rows that scrolled away are evicted (LRU).
+Rows hold nothing themselves: HTML and plain text are built from the caller's
+message store when a row is rendered, so a long session costs no HTML copies.
+"""
+
+from collections import OrderedDict
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QUrl, QTimer, QPointF, QRectF, pyqtSignal
+from PyQt6.QtGui import QTextDocument, QAbstractTextDocumentLayout, QPalette, QColor, QDesktopServices
+
+# How many rendered messages are kept around. Visible rows are always the most recent.
+DOCUMENT_CACHE_SIZE = 64
+# Rough guesses used for rows that were never laid out
+CHARS_PER_PIXEL = 0.12
+LINE_HEIGHT = 22
+
+HtmlRole = Qt.ItemDataRole.UserRole + 1
+TextRole = Qt.ItemDataRole.UserRole + 2
+
+
+class TranscriptModel(QAbstractListModel):
+    def __init__(self, text_of, html_of, parent=None):
+        super().__init__(parent)
+        self.count = 0
+        self.text_of = text_of      # text_of(row) -> plain text of a finished message
+        self.html_of = html_of      # html_of(row) -> rendered HTML of a finished message
+        self.live_row = None
+        self.live_text = ""
+
+    def text(self, row):
+        return self.live_text if row == self.live_row else self.text_of(row)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.count
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == HtmlRole:
+            return self.html_of(index.row())
+        if role in (TextRole, Qt.ItemDataRole.DisplayRole):
+            return self.text(index.row())
+        return None
+
+    def append_row(self):
+        row = self.count
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.count += 1
+        self.endInsertRows()
+        return row
+
+    def prepend_rows(self, count):
+        self.beginInsertRows(QModelIndex(), 0, count - 1)
+        self.count += count
+        if self.live_row is not None:
+            self.live_row += count
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.count = 0
+        self.live_row = None
+        self.live_text = ""
+        self.endResetModel()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.text_color = QColor("#00ff88")
+
+    def sizeHint(self, option, index):
+        width = self.view.content_width()
+        return QSize(width, self.view.row_height(index.row(), width))
+
+    def paint(self, painter, option, index):
+        width = option.rect.width()
+        doc = self.view.document_for(index.row(), width)
+
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        painter.setClipRect(QRectF(0, 0, width, option.rect.height()))
+        ctx = QAbstractTextDocumentLayout.PaintContext()
+        ctx.palette.setColor(QPalette.ColorRole.Text, self.text_color)
+        doc.documentLayout().draw(painter, ctx)
+        painter.restore()
+
+        # The row may have been sized from an estimate, fix it now that we know
+        self.view.confirm_height(index.row(), width, doc)
+
+
+class TranscriptView(QListView):
+    copy_requested = pyqtSignal(int)
+
+    def __init__(self, text_of, html_of, parent=None):
+        super().__init__(parent)
+        self.transcript_model = TranscriptModel(text_of, html_of, self)
+        self.setModel(self.transcript_model)
+        self.setItemDelegate(MessageDelegate(self))
+
+        self.setUniformItemSizes(False)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setMouseTracking(True)
+
+        self.documents = OrderedDict()   # row -> QTextDocument (LRU)
+        self.heights = {}                # row -> (width, height, exact)
+        self.live_row = None             # row currently being streamed into
+        self.live_doc = None
+        self.last_width = 0
+
+    # --- Layout helpers ---
+    def content_width(self):
+        return max(100, self.viewport().width() - 2 * self.spacing())
+
+    def build_document(self, html):
+        doc = QTextDocument()
+        doc.setDefaultFont(self.font())
+        doc.setHtml(html)
+        return doc
+
+    def document_for(self, row, width):
+        if row == self.live_row:
+            doc = self.live_doc
+        else:
+            doc = self.documents.get(row)
+            if doc is None:
+                doc = self.build_document(self.transcript_model.html_of(row))
+                self.documents[row] = doc
+                # Evict whatever was rendered longest ago (offscreen by now)
+                while len(self.documents) > DOCUMENT_CACHE_SIZE:
+                    self.documents.popitem(last=False)
+            else:
+                self.documents.move_to_end(row)
+
+        if doc.textWidth() != width:
+            doc.setTextWidth(width)
+        return doc
+
+    def row_height(self, row, width):
+        cached = self.heights.get(row)
+        if cached and cached[0] == width:
+            return cached[1]
+
+        doc = self.live_doc if row == self.live_row else self.documents.get(row)
+        if doc is not None:
+            doc.setTextWidth(width)
+            height = int(doc.size().height())
+            self.heights[row] = (width, height, True)
+            return height
+
+        # Never rendered: cheap estimate, corrected on first paint
+        text = self.transcript_model.text(row)
+        chars_per_line = max(20, int(width * CHARS_PER_PIXEL))
+        lines = 4 + text.count("\n") + len(text) // chars_per_line
+        height = lines * LINE_HEIGHT
+        self.heights[row] = (width, height, False)
+        return height
+
+    def confirm_height(self, row, width, doc):
+        height = int(doc.size().height())
+        cached = self.heights.get(row)
+        if cached and cached[0] == width and cached[1] == height:
+            return
+        self.heights[row] = (width, height, True)
+        # Never relayout from inside a paint event
+        QTimer.singleShot(0, lambda: self.itemDelegate().sizeHintChanged.emit(self.transcript_model.index(row)))
+
+    def resizeEvent(self, event):
+        if self.content_width() != self.last_width:
+            self.last_width = self.content_width()
+            self.heights.clear()
+        super().resizeEvent(event)
+
+    # --- Messages ---
+    def append_message(self):
+        # The message is already in the caller's store
+        row = self.transcript_model.append_row()
+        self.scrollToBottom()
+        return row
+
+    def prepend_messages(self, count):
+        # `count` older messages were paged in at the front of the caller's store
+        if not count:
+            return
+        bar = self.verticalScrollBar()
+        from_bottom = bar.maximum() - bar.value()
+
+        # Row-keyed caches move down with their rows
+        self.documents = OrderedDict((row + count, doc) for row, doc in self.documents.items())
+        self.heights = {row + count: height for row, height in self.heights.items()}
+        if self.live_row is not None:
+            self.live_row += count
+        self.transcript_model.prepend_rows(count)
+
+        # Keep the same messages on screen once the new rows are laid out
+        QTimer.singleShot(0, lambda: bar.setValue(bar.maximum() - from_bottom))
+
+    def begin_live(self, html):
+        # Start a message whose document is edited in place while streaming
+        self.live_doc = self.build_document(html)
+        self.live_row = self.transcript_model.append_row()
+        self.transcript_model.live_row = self.live_row
+        self.transcript_model.live_text = ""
+        self.scrollToBottom()
+        return self.live_doc
+
+    def live_document(self):
+        return self.live_doc
+
+    def live_changed(self, text):
+        row = self.live_row
+        self.transcript_model.live_text = text
+        self.heights.pop(row, None)
+        self.itemDelegate().sizeHintChanged.emit(self.transcript_model.index(row))
+        self.scrollToBottom()
+
+    def end_live(self):
+        # Freeze the streamed document into a normal (evictable) row.
+        # The message is in the caller's store by now: once the document is
+        # evicted, html_of / text_of rebuild the row from it.
+        row, doc = self.live_row, self.live_doc
+        self.live_row = None
+        self.live_doc = None
+        self.transcript_model.live_row = None
+        self.transcript_model.live_text = ""
+        self.documents[row] = doc
+        self.heights.pop(row, None)
+        self.itemDelegate().sizeHintChanged.emit(self.transcript_model.index(row))
+        self.scrollToBottom()
+
+    def clear(self):
+        self.documents.clear()
+        self.heights.clear()
+        self.live_row = None
+        self.live_doc = None
+        self.transcript_model.clear()
+
+    # --- Links (copy button + real links) ---
+    def anchor_at(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return None, None
+        rect = self.visualRect(index)
+        doc = self.document_for(index.row(), rect.width())
+        anchor = doc.documentLayout().anchorAt(QPointF(pos - rect.topLeft()))
+        return index, anchor
+
+    def mouseMoveEvent(self, event):
+        _, anchor = self.anchor_at(event.position().toPoint())
+        if anchor:
+            self.viewport().setCursor(Qt.CursorShape.PointingHandCursor)
+        else:
+            self.viewport().unsetCursor()
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        index, anchor = self.anchor_at(event.position().toPoint())
+        if anchor:
+            if anchor.startswith("copy:"):
+                # One row per message, so the row is the message index
+                self.copy_requested.emit(index.row())
+            else:
+                QDesktopServices.openUrl(QUrl(anchor))
+            return
+        super().mouseReleaseEvent(event)
@@ -0,0 +1,139 @@
+"""
+Unified web search.
+Asks every available provider at the same time, keeps whatever arrived before
+the deadline, dedupes by canonical URL and merges the rankings (reciprocal rank
+fusion). A provider that misses the deadline keeps running in the background
+and still fills the search cache for next time.
+"""
+
+import concurrent.futures
+import sys
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from search_cache import get_cache
+
+# --- CONFIG ---
+DEADLINE = 4.0      # seconds for the whole fan-out
+RRF_K = 60          # standard reciprocal rank fusion constant
+TRACKING_PREFIXES = ("utm_",)     # utm_source, utm_medium, ...
+TRACKING_PARAMS = {"fbclid", "gclid", "ref", "ved", "sa", "usg"}  # exact names only: not safe=, sample=
+
+# Providers whose library is not installed are simply skipped
+PROVIDERS = {}
+try:
+    import google_tool
+    PROVIDERS["google"] = google_tool.fetch_results
+except ImportError:
+    pass
+try:
+    import internet_tool
+    PROVIDERS["duckduckgo"] = internet_tool.fetch_results
+except ImportError:
+    pass
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+
+
+def canonical_url(url):
+    # Same page, different spelling: scheme, www., trailing slash, tracking params, fragment
+    parts = urlsplit((url or "").strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/") or "/"
+    params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+              if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+    query = urlencode(sorted(params))
+    return f"{host}{path}" + (f"?{query}" if query else "")
+
+
+def merge_results(ranked_lists, num_results):
+    # ranked_lists: {provider: [result, ...]} -> one list, best first
+    merged = {}
+    for provider, results in ranked_lists.items():
+        for rank, result in enumerate(results):
+            # No URL to go by (e.g. an instant answer): the same title counts as the
+            # same result, nothing at all means it can't be merged and is dropped
+            if (result.get("url") or "").strip():
+                key = canonical_url(result["url"])
+            elif (result.get("title") or "").strip():
+                key = "title:" + " ".join(result["title"].lower().split())
+            else:
+                continue
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {"result": dict(result, providers=[]), "score": 0.0}
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+            entry["result"]["providers"].append(provider)
+            # Keep the longest summary any provider gave us
+            if len(result.get("summary") or "") > len(entry["result"].get("summary") or ""):
+                entry["result"]["summary"] = result.get("summary")
+    best = sorted(merged.values(), key=lambda e: e["score"], reverse=True)
+    return [e["result"] for e in best[:num_results]]
+
+
+def search_all(query, num_results=3, deadline=DEADLINE, providers=None):
+    # Returns (results, report). The report says which providers answered in time.
+    providers = PROVIDERS if providers is None else providers
+    cache = get_cache()
+    start = time.perf_counter()
+    futures = {
+        _executor.submit(cache.get_or_fetch, name, query, num_results, fetch): name
+        for name, fetch in providers.items()
+    }
+    done, late = concurrent.futures.wait(futures, timeout=deadline)
+
+    ranked_lists = {}
+    report = {"answered": [], "failed": {}, "late": sorted(futures[f] for f in late)}
+    for future in done:
+        name = futures[future]
+        try:
+            ranked_lists[name] = future.result()
+            report["answered"].append(name)
+        except Exception as e:
+            report["failed"][name] = str(e)
+    report["seconds"] = time.perf_counter() - start
+    return merge_results(ranked_lists, num_results), report
+
+
+def format_results(results):
+    output = ""
+    for i, r in enumerate(results, 1):
+        output += f"\n--- RESULT {i} ---\n"
+        output += f"Title: {r.get('title')}\n"
+        output += f"Link:  {r.get('url')}\n"
+        output += f"Summary: {r.get('summary')}\n"
+    return output
+
+
+def get_results(query, num_results=3, deadline=DEADLINE, fetch_pages=0, prefetched=None):
+    # fetch_pages > 0 also downloads the top N result pages and adds their text.
+    # prefetched: a future of search_all(query) started while the user was typing (speculative.py)
+    print(f"\n🔎 System: Searching {' + '.join(PROVIDERS) or 'nothing'} for '{query}'...")
+    if not PROVIDERS:
+        return "System: Search failed. Error: no search provider installed."
+    if prefetched is not None:
+        results, report = prefetched.result()
+    else:
+        results, report = search_all(query, num_results, deadline)
+    if report["late"]:
+        print(f"   (skipped slow provider: {', '.join(report['late'])})")
+    if not results:
+        if report["failed"]:
+            errors = "; ".join(f"{k}: {v}" for k, v in report["failed"].items())
+            return f"System: Search failed. Error: {errors}"
+        return "System: No results found."
+    output = format_results(results)
+
+    if fetch_pages:
+        from page_fetch import get_fetcher, format_pages
+        urls = [r["url"] for r in results[:fetch_pages] if r.get("url")]
+        print(f"   (reading {len(urls)} pages...)")
+        output += format_pages(get_fetcher().fetch_all(urls))
+    return output
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        print(get_results(" ".join(sys.argv[1:])))